@@ -5,6 +5,45 @@ import json
 from datetime import datetime
 import base64
 from io import StringIO
+import os
+import copy
+import threading
+import time
+import uuid
+import re
+import math
+import functools
+import hmac
+import ipaddress
+import atexit
+import bisect
+import heapq
+import itertools
+import contextlib
+import inspect
+import tracemalloc
+import pickle
+import tempfile
+import shutil
+import weakref
+import difflib
+import io
+import multiprocessing
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from collections import ChainMap, deque
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+import pdf_evidence
 
 # Set page configuration
 st.set_page_config(
@@ -14,8 +53,148 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Opt-in performance profiler
+# Decorators and sections are no-ops unless the profiler was switched on
+# before this rerun started, so the disabled path costs a single flag check.
+# tracemalloc is process-wide (it slows every session and its deltas include
+# other threads' allocations), so memory tracing is an admin setting.
+PROFILER_ENABLED = bool(st.session_state.get('profiler_enabled', False))
+PROFILER_TRACE_MEMORY = os.environ.get("NOS_PROFILER_TRACE_MEMORY", "0") == "1"
+PROFILER_MAX_SPANS = 20000
+_PROFILE_ORIGIN = time.perf_counter()
+_PROFILE_RECORDS = {}
+_PROFILE_SPANS = []
+
+class _TracemallocGuard:
+    """Reference-counted tracemalloc so concurrent profiled sessions do not stop each other"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = 0
+        self._started = False
+
+    def acquire(self):
+        with self._lock:
+            if self._users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started = True
+            self._users += 1
+
+    def release(self):
+        with self._lock:
+            self._users = max(0, self._users - 1)
+            if self._users == 0 and self._started:
+                tracemalloc.stop()
+                self._started = False
+
+@st.cache_resource
+def get_tracemalloc_guard():
+    return _TracemallocGuard()
+
+class _ProfiledSection:
+    """Context manager recording wall time and traced memory delta of a named section"""
+    __slots__ = ('name', 'start', 'memory')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        memory_delta = tracemalloc.get_traced_memory()[0] - self.memory if tracemalloc.is_tracing() else 0
+        record = _PROFILE_RECORDS.get(self.name)
+        if record is None:
+            record = _PROFILE_RECORDS[self.name] = {'calls': 0, 'seconds': 0.0, 'memory_bytes': 0}
+        record['calls'] += 1
+        record['seconds'] += elapsed
+        record['memory_bytes'] += memory_delta
+        if len(_PROFILE_SPANS) < PROFILER_MAX_SPANS:
+            _PROFILE_SPANS.append((self.name, self.start - _PROFILE_ORIGIN, elapsed, memory_delta))
+        return False
+
+_NULL_SECTION = contextlib.nullcontext()
+
+def profile_section(name):
+    """Time a block of the page; returns a shared no-op context when profiling is off"""
+    if not PROFILER_ENABLED:
+        return _NULL_SECTION
+    return _ProfiledSection(name)
+
+def profiled(func):
+    """Decorator timing every call of a helper; leaves the function untouched when profiling is off"""
+    if not PROFILER_ENABLED:
+        return func
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _ProfiledSection(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+def start_profiling():
+    if PROFILER_ENABLED and PROFILER_TRACE_MEMORY:
+        get_tracemalloc_guard().acquire()
+
+def stop_profiling():
+    if PROFILER_ENABLED and PROFILER_TRACE_MEMORY:
+        get_tracemalloc_guard().release()
+
+def export_profile_trace():
+    """Current rerun's spans in Chrome trace event format (chrome://tracing, Perfetto)"""
+    events = [{
+        'name': name,
+        'ph': 'X',
+        'ts': round(start * 1e6, 1),
+        'dur': round(duration * 1e6, 1),
+        'pid': 1,
+        'tid': 1,
+        'args': {'memory_delta_bytes': memory_delta}
+    } for name, start, duration, memory_delta in _PROFILE_SPANS]
+    return json.dumps({
+        'traceEvents': events,
+        'summary': _PROFILE_RECORDS,
+        'page': st.session_state.get('current_page'),
+        'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }, indent=2)
+
+def render_profiler_panel():
+    """Collapsible sidebar panel with per-section timings of this rerun"""
+    with st.sidebar.expander("⏱️ Performance Profiler"):
+        enabled = st.checkbox("Enable profiling", value=PROFILER_ENABLED,
+                              help="Records wall time, call counts and memory per section on each rerun")
+        if enabled != PROFILER_ENABLED:
+            st.session_state.profiler_enabled = enabled
+            st.rerun()
+        
+        if PROFILER_ENABLED and _PROFILE_RECORDS:
+            profile_df = pd.DataFrame([
+                {
+                    'Section': name,
+                    'Calls': record['calls'],
+                    'Time (ms)': round(record['seconds'] * 1000, 2),
+                    'Memory Δ (KB)': round(record['memory_bytes'] / 1024, 1)
+                }
+                for name, record in _PROFILE_RECORDS.items()
+            ]).sort_values('Time (ms)', ascending=False)
+            if not PROFILER_TRACE_MEMORY:
+                profile_df = profile_df.drop(columns='Memory Δ (KB)')
+            st.dataframe(profile_df, use_container_width=True, hide_index=True)
+            if PROFILER_TRACE_MEMORY:
+                st.caption("Memory deltas are process-wide and include other sessions' allocations.")
+            st.download_button(
+                label="📥 Download JSON Trace",
+                data=export_profile_trace(),
+                file_name=f"nos_profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                mime="application/json"
+            )
+
 # Enhanced CSS styling
-st.markdown("""
+with profile_section("css_injection"):
+    st.markdown("""
 <style>
     .main-header {
         background: linear-gradient(135deg, #2c3e50 0%, #3498db 100%);
@@ -96,9 +275,96 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+class StudyList(list):
+    """Portfolio container that the session memory manager can spill and refill in place.
+
+    caches are dropped on a spill and rebuilt on demand; history (the session's undo
+    history) is spilled with the studies its steps refer to and restored with them.
+    """
+    spillable = True
+
+    def __init__(self, studies=(), caches=(), history=None):
+        super().__init__(studies)
+        self.caches = list(caches)
+        self.history = history
+
+UNDO_HISTORY_LIMIT = int(os.environ.get("NOS_UNDO_LIMIT", "100"))
+
+class UndoHistory:
+    """Bounded undo/redo stacks of portfolio edits.
+
+    An edit is ('insert' | 'remove', [(position, study), ...]) or ('replace', [(position, old, new), ...]).
+    Edits hold the study dicts themselves rather than copies: stored studies are replaced, never
+    edited in place, so a step costs memory in proportion to the studies it touched.
+    """
+
+    def __init__(self, limit=UNDO_HISTORY_LIMIT):
+        self.undo = deque(maxlen=limit)
+        self.redo = []
+        self._open_step = None
+
+    def record(self, label, edit):
+        if self._open_step is not None:
+            self._open_step[1].append(edit)
+            return
+        self.undo.append((label, [edit]))
+        self.redo.clear()
+
+    @contextlib.contextmanager
+    def step(self, label):
+        """Group every edit recorded inside the block into one undo step"""
+        if self._open_step is not None:
+            yield
+            return
+        self._open_step = (label, [])
+        try:
+            yield
+        finally:
+            step, self._open_step = self._open_step, None
+            if step[1]:
+                self.undo.append(step)
+                self.redo.clear()
+
+    def clear(self):
+        self.undo.clear()
+        self.redo.clear()
+
+    def restore(self, undo, redo):
+        """Refill the stacks in place after a spill, oldest step first"""
+        self.undo.extend(undo)
+        self.redo.extend(redo)
+
 # Initialize session state
-if 'studies' not in st.session_state:
-    st.session_state.studies = []
+# Scripts re-execute on every rerun, so StudyList is re-created each time;
+# recognise an existing container by its marker attribute, not isinstance.
+# Everything derived from the portfolio (score frame and cube, similarity matrix,
+# encodings, duplicate index, ...) lives in derived_caches, so a spill drops it too;
+# the undo history cannot be rebuilt, so a spill saves it alongside the studies.
+if 'card_cache' not in st.session_state:
+    st.session_state.card_cache = {}
+if 'derived_caches' not in st.session_state:
+    st.session_state.derived_caches = {}
+if 'undo_history' not in st.session_state:
+    st.session_state.undo_history = UndoHistory()
+if 'studies' not in st.session_state or not getattr(st.session_state.studies, 'spillable', False):
+    st.session_state.studies = StudyList(st.session_state.get('studies', ()),
+                                         caches=[st.session_state.card_cache, st.session_state.derived_caches],
+                                         history=st.session_state.undo_history)
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if 'portfolio_revision' not in st.session_state:
+    st.session_state.portfolio_revision = 0
+if 'project' not in st.session_state:
+    st.session_state.project = "Scratch (this session only)"
+if 'project_version' not in st.session_state:
+    st.session_state.project_version = 0
+if 'live_channel' not in st.session_state:
+    st.session_state.live_channel = ""
+    st.session_state.live_cursor = 0
+if 'assessment_queue' not in st.session_state:
+    st.session_state.assessment_queue = []
+    st.session_state.reviewer_roster_rows = []
+    st.session_state.queue_version = 0
 
 # Newcastle-Ottawa Scale criteria
 NOS_CRITERIA = {
@@ -337,81 +603,187 @@ NOS_CRITERIA = {
         }
     }
 }
-def calculate_total_stars(assessment, study_type):
-    """Calculate total stars for an assessment"""
-    total_stars = 0
-    criteria = NOS_CRITERIA[study_type]
+
+# Rubric definitions
+# Additional appraisal tools are JSON files in RUBRIC_DIR; each file adds (or replaces)
+# one study type with the same domain/criterion layout as NOS_CRITERIA plus its quality thresholds.
+RUBRIC_DIR = os.environ.get("NOS_RUBRIC_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rubrics"))
+
+QUALITY_THRESHOLDS = {
+    "Cohort Studies": {"good": 7, "fair": 5},
+    "Case-Control Studies": {"good": 7, "fair": 5},
+    "Cross-Sectional Studies": {"good": 6, "fair": 4}
+}
+
+def _criterion_max_stars(criterion):
+    return criterion.get('max_stars', max(criterion['stars'].values(), default=0))
+
+def validate_rubric(definition, source):
+    """Check a rubric definition and normalise its star tables; raises ValueError naming the problem"""
+    def fail(message):
+        raise ValueError(f"{source}: {message}")
     
-    for domain_name, domain in criteria.items():
+    if not isinstance(definition, dict) or not isinstance(definition.get('name'), str) or not definition['name']:
+        fail("rubric needs a non-empty 'name'")
+    domains = definition.get('domains')
+    if not isinstance(domains, dict) or not domains:
+        fail("rubric needs at least one domain")
+    
+    criteria_seen = set()
+    normalised = {}
+    for domain_name, domain in domains.items():
+        if not isinstance(domain, dict) or not domain:
+            fail(f"domain '{domain_name}' has no criteria")
+        normalised[domain_name] = {}
         for criterion_name, criterion in domain.items():
-            if criterion_name in assessment:
-                selected_option = assessment[criterion_name]
-                if selected_option in criterion["stars"]:
-                    stars = criterion["stars"][selected_option]
-                    if criterion_name == "comparability" and "max_stars" in criterion:
-                        if selected_option == "most_important":
-                            total_stars += 1
-                        elif selected_option == "additional_factor":
-                            total_stars += 2
-                    else:
-                        total_stars += stars
+            if criterion_name in criteria_seen:
+                fail(f"criterion '{criterion_name}' is defined twice")
+            criteria_seen.add(criterion_name)
+            options = criterion.get('options') if isinstance(criterion, dict) else None
+            if not isinstance(criterion.get('question') if isinstance(criterion, dict) else None, str):
+                fail(f"criterion '{criterion_name}' needs a 'question'")
+            if not isinstance(options, dict) or not options:
+                fail(f"criterion '{criterion_name}' needs a non-empty 'options' mapping")
+            stars = criterion.get('stars', {})
+            if not isinstance(stars, dict):
+                fail(f"criterion '{criterion_name}' needs 'stars' as a mapping of option to stars")
+            unknown = set(stars) - set(options)
+            if unknown:
+                fail(f"criterion '{criterion_name}' awards stars to unknown options {sorted(unknown)}")
+            if any(not isinstance(value, int) or value < 0 for value in stars.values()):
+                fail(f"criterion '{criterion_name}' star values must be non-negative integers")
+            compiled = dict(criterion, stars={option: stars.get(option, 0) for option in options})
+            if not isinstance(_criterion_max_stars(compiled), int):
+                fail(f"criterion '{criterion_name}' max_stars must be an integer")
+            if _criterion_max_stars(compiled) < max(compiled['stars'].values()):
+                fail(f"criterion '{criterion_name}' max_stars is below its highest-scoring option")
+            normalised[domain_name][criterion_name] = compiled
+    
+    max_stars = sum(_criterion_max_stars(c) for domain in normalised.values() for c in domain.values())
+    thresholds = definition.get('thresholds', {})
+    if not isinstance(thresholds, dict):
+        fail("'thresholds' must be a mapping with 'good' and 'fair'")
+    good, fair = thresholds.get('good'), thresholds.get('fair')
+    if not all(isinstance(value, int) for value in (good, fair)) or not 0 <= fair <= good <= max_stars:
+        fail(f"thresholds need integer 'good' and 'fair' with 0 <= fair <= good <= {max_stars}")
+    return definition['name'], normalised, {"good": good, "fair": fair}
+
+def _rubric_signature(directory):
+    if not os.path.isdir(directory):
+        return ()
+    return tuple(sorted((name, os.path.getmtime(os.path.join(directory, name)))
+                        for name in os.listdir(directory) if name.endswith(".json")))
+
+@st.cache_data(show_spinner=False)
+def load_rubric_definitions(directory, signature):
+    """Parse and validate rubric files; the (file, mtime) signature refreshes the cache on edits"""
+    rubrics, errors = {}, []
+    for filename, _ in signature:
+        try:
+            with open(os.path.join(directory, filename), encoding="utf-8") as handle:
+                name, domains, thresholds = validate_rubric(json.load(handle), filename)
+        except (OSError, ValueError) as exc:
+            errors.append(str(exc))
+            continue
+        rubrics[name] = {'domains': domains, 'thresholds': thresholds, 'source': filename}
+    return rubrics, errors
+
+RUBRIC_SIGNATURE = _rubric_signature(RUBRIC_DIR)
+RUBRIC_FILES, RUBRIC_ERRORS = load_rubric_definitions(RUBRIC_DIR, RUBRIC_SIGNATURE)
+for _rubric_name, _rubric in RUBRIC_FILES.items():
+    NOS_CRITERIA[_rubric_name] = _rubric['domains']
+    QUALITY_THRESHOLDS[_rubric_name] = _rubric['thresholds']
+
+@st.cache_resource
+def get_compiled_rubrics(signature):
+    """Process-wide compiled rubrics; a new rubric file signature starts a fresh table"""
+    return {}
+
+# Looked up once per rerun: compile_rubric runs per study, so it must stay a plain dict lookup
+_COMPILED_RUBRICS = get_compiled_rubrics(RUBRIC_SIGNATURE)
+
+def compile_rubric(study_type):
+    """Flatten a rubric into the lookup tables the scorers run over, once per process"""
+    rubric = _COMPILED_RUBRICS.get(study_type)
+    if rubric is None:
+        rubric = _COMPILED_RUBRICS[study_type] = _compile_rubric(study_type)
+    return rubric
+
+def _compile_rubric(study_type):
+    domains = NOS_CRITERIA[study_type]
+    program = []
+    domain_max = []
+    for domain_index, domain in enumerate(domains.values()):
+        domain_max.append(sum(_criterion_max_stars(criterion) for criterion in domain.values()))
+        program.extend((name, criterion['stars'], domain_index) for name, criterion in domain.items())
+    return {
+        'domains': tuple(domains),
+        'program': tuple(program),
+        'domain_max': tuple(domain_max),
+        'outcome_domains': frozenset(idx for idx, name in enumerate(domains) if name in OUTCOME_DOMAINS),
+        'max_stars': sum(domain_max),
+        'thresholds': QUALITY_THRESHOLDS[study_type]
+    }
+
+def get_max_stars(study_type):
+    return compile_rubric(study_type)['max_stars']
+
+@profiled
+def calculate_total_stars(assessment, study_type):
+    """Calculate total stars for an assessment"""
+    get = assessment.get
+    return sum(stars.get(get(name), 0) for name, stars, _ in compile_rubric(study_type)['program'])
+
+def describe_rubric_bands():
+    """Guide text for star maxima and Good/Fair/Poor bands, grouping study types that share them"""
+    def grouped(value):
+        groups = {}
+        for study_type in NOS_CRITERIA:
+            groups.setdefault(value(compile_rubric(study_type)), []).append(study_type.replace(" Studies", ""))
+        return "; ".join(f"{text} for {', '.join(types)}" for text, types in groups.items())
     
-    return total_stars
+    return {
+        'max': grouped(lambda rubric: f"{rubric['max_stars']} stars"),
+        'good': grouped(lambda rubric: f"≥{rubric['thresholds']['good']} stars"),
+        'fair': grouped(lambda rubric: f"{rubric['thresholds']['fair']}-{rubric['thresholds']['good'] - 1} stars"),
+        'poor': grouped(lambda rubric: f"<{rubric['thresholds']['fair']} stars"),
+        'good_range': grouped(lambda rubric: f"{rubric['thresholds']['good']}-{rubric['max_stars']} stars")
+    }
+
+def describe_domain_max(study_type):
+    """{domain: maximum stars} of a rubric, for the guide"""
+    rubric = compile_rubric(study_type)
+    return dict(zip(rubric['domains'], rubric['domain_max']))
 
 def get_quality_rating(total_stars, study_type):
     """Determine quality rating based on total stars"""
-    if study_type in ["Cohort Studies", "Case-Control Studies"]:
-        max_stars = 9
-        if total_stars >= 7:
-            return "Good Quality", "#28a745"
-        elif total_stars >= 5:
-            return "Fair Quality", "#ffc107"
-        else:
-            return "Poor Quality", "#dc3545"
-    else:  # Cross-sectional
-        max_stars = 8
-        if total_stars >= 6:
-            return "Good Quality", "#28a745"
-        elif total_stars >= 4:
-            return "Fair Quality", "#ffc107"
-        else:
-            return "Poor Quality", "#dc3545"
+    thresholds = compile_rubric(study_type)['thresholds']
+    if total_stars >= thresholds['good']:
+        return "Good Quality", "#28a745"
+    elif total_stars >= thresholds['fair']:
+        return "Fair Quality", "#ffc107"
+    else:
+        return "Poor Quality", "#dc3545"
 
+@profiled
 def calculate_domain_scores(study):
     """Calculate detailed domain scores"""
-    study_type = study['study_type']
-    assessment = study['assessment']
-    criteria = NOS_CRITERIA[study_type]
+    rubric = compile_rubric(study['study_type'])
+    get = study['assessment'].get
+    domain_stars = [0] * len(rubric['domains'])
+    for name, stars, domain_index in rubric['program']:
+        domain_stars[domain_index] += stars.get(get(name), 0)
     
-    domain_scores = {}
-    
-    for domain_name, domain in criteria.items():
-        domain_stars = 0
-        max_domain_stars = len(domain)
-        if domain_name == "Comparability":
-            max_domain_stars = 2
-        
-        for criterion_name, criterion in domain.items():
-            if criterion_name in assessment:
-                selected_option = assessment[criterion_name]
-                if selected_option in criterion["stars"]:
-                    stars = criterion["stars"][selected_option]
-                    if criterion_name == "comparability" and "max_stars" in criterion:
-                        if selected_option == "most_important":
-                            domain_stars += 1
-                        elif selected_option == "additional_factor":
-                            domain_stars += 2
-                    else:
-                        domain_stars += stars
-        
-        domain_scores[domain_name] = {
-            'stars': domain_stars,
-            'max_stars': max_domain_stars,
-            'percentage': (domain_stars / max_domain_stars * 100) if max_domain_stars > 0 else 0
+    return {
+        domain_name: {
+            'stars': stars,
+            'max_stars': max_stars,
+            'percentage': (stars / max_stars * 100) if max_stars > 0 else 0
         }
-    
-    return domain_scores
+        for domain_name, stars, max_stars in zip(rubric['domains'], domain_stars, rubric['domain_max'])
+    }
 
+@profiled
 def create_robvis_visualization(studies_data):
     """Create robvis-style visualization using HTML/CSS"""
     if not studies_data:
@@ -438,8 +810,7 @@ def create_robvis_visualization(studies_data):
         </div>
     '''
     
-    for study in studies_data:
-        quality = study['quality_rating']
+    for study, quality in zip(studies_data, quality_labels(studies_data)):
         stars = study['total_stars']
         star_text = "★" * stars
         
@@ -473,7 +844,7 @@ def create_robvis_visualization(studies_data):
                 {display_name}
             </span>
             <span style="font-size: 14px;">
-                {quality} ({stars}/9) {star_text}
+                {quality} ({stars}/{get_max_stars(study['study_type'])}) {star_text}
             </span>
         </div>
         '''
@@ -481,6 +852,7 @@ def create_robvis_visualization(studies_data):
     html_content += '</div>'
     return html_content
 
+@profiled
 def create_domain_heatmap(studies_data):
     """Create domain-wise heatmap visualization"""
     if not studies_data:
@@ -567,6 +939,7 @@ def create_domain_heatmap(studies_data):
     html_content += '</tbody></table></div>'
     return html_content
 
+@profiled
 def generate_summary_statistics(studies_data):
     """Generate comprehensive summary statistics"""
     if not studies_data:
@@ -578,8 +951,8 @@ def generate_summary_statistics(studies_data):
     star_distribution = {}
     domain_performance = {}
     
-    for study in studies_data:
-        quality_counts[study['quality_rating']] += 1
+    for study, quality in zip(studies_data, quality_labels(studies_data)):
+        quality_counts[quality] += 1
         
         study_type = study['study_type']
         study_types[study_type] = study_types.get(study_type, 0) + 1
@@ -615,12 +988,14 @@ def generate_summary_statistics(studies_data):
         'study_types': study_types,
         'star_distribution': star_distribution,
         'domain_averages': domain_averages,
-        'overall_quality_score': sum(study['total_stars'] for study in studies_data) / (total_studies * 9) * 100 if total_studies > 0 else 0
+        'overall_quality_score': sum(study['total_stars'] for study in studies_data) / sum(get_max_stars(study['study_type']) for study in studies_data) * 100 if total_studies > 0 else 0
     }
 
+@profiled
 def create_study_summary_card(study):
     """Create an enhanced study summary card"""
-    quality_rating, color = get_quality_rating(study['total_stars'], study['study_type'])
+    quality_rating = study_quality(study)
+    color = QUALITY_COLORS[quality_rating]
     domain_scores = calculate_domain_scores(study)
     
     domain_mini_chart = ""
@@ -651,10 +1026,10 @@ def create_study_summary_card(study):
                     {quality_rating}
                 </div>
                 <div style="font-size: 18px; margin-bottom: 5px;">
-                    {'★' * study['total_stars']}{'☆' * (9 - study['total_stars'])}
+                    {'★' * study['total_stars']}{'☆' * (get_max_stars(study['study_type']) - study['total_stars'])}
                 </div>
                 <div style="font-size: 12px; color: #6c757d;">
-                    {study['total_stars']}/9 stars
+                    {study['total_stars']}/{get_max_stars(study['study_type'])} stars
                 </div>
             </div>
         </div>
@@ -688,6 +1063,26 @@ def create_study_summary_card(study):
     
     return card_html
 
+def publication_table_row(study, domain_scores, quality):
+    """One row of the publication-ready table"""
+    authors = study['authors']
+    if ',' in authors:
+        first_author = authors.split(',')[0].strip()
+        author_display = f"{first_author} et al."
+    else:
+        author_display = authors
+    
+    return {
+        'Reference': f"{author_display} ({study['publication_year']})",
+        'Study Design': study['study_type'],
+        'Selection': f"{domain_scores.get('Selection', {}).get('stars', 'N/A')}/{domain_scores.get('Selection', {}).get('max_stars', 'N/A')}",
+        'Comparability': f"{domain_scores.get('Comparability', {}).get('stars', 'N/A')}/{domain_scores.get('Comparability', {}).get('max_stars', 'N/A')}",
+        'Outcome/Exposure': f"{domain_scores.get('Outcome', domain_scores.get('Exposure', {})).get('stars', 'N/A')}/{domain_scores.get('Outcome', domain_scores.get('Exposure', {})).get('max_stars', 'N/A')}",
+        'Total Score': f"{study['total_stars']}/{get_max_stars(study['study_type'])}",
+        'Quality Assessment': quality
+    }
+
+@profiled
 def create_publication_ready_table(studies_data):
     """Create a publication-ready summary table"""
     if not studies_data:
@@ -695,38 +1090,20 @@ def create_publication_ready_table(studies_data):
     
     table_data = []
     
-    for study in studies_data:
-        domain_scores = calculate_domain_scores(study)
-        
-        authors = study['authors']
-        if ',' in authors:
-            first_author = authors.split(',')[0].strip()
-            author_display = f"{first_author} et al."
-        else:
-            author_display = authors
-        
-        row = {
-            'Reference': f"{author_display} ({study['publication_year']})",
-            'Study Design': study['study_type'],
-            'Selection': f"{domain_scores.get('Selection', {}).get('stars', 'N/A')}/{domain_scores.get('Selection', {}).get('max_stars', 'N/A')}",
-            'Comparability': f"{domain_scores.get('Comparability', {}).get('stars', 'N/A')}/{domain_scores.get('Comparability', {}).get('max_stars', 'N/A')}",
-            'Outcome/Exposure': f"{domain_scores.get('Outcome', domain_scores.get('Exposure', {})).get('stars', 'N/A')}/{domain_scores.get('Outcome', domain_scores.get('Exposure', {})).get('max_stars', 'N/A')}",
-            'Total Score': f"{study['total_stars']}/9",
-            'Quality Assessment': study['quality_rating']
-        }
-        
-        table_data.append(row)
+    for study, quality in zip(studies_data, quality_labels(studies_data)):
+        table_data.append(publication_table_row(study, calculate_domain_scores(study), quality))
     
     return pd.DataFrame(table_data)
-def show_assessment_form(study_type):
-    """Enhanced assessment form with improved UX"""
+@profiled
+def show_assessment_form(study_type, evidence=None):
+    """Enhanced assessment form with improved UX; evidence is a (document, PassageIndex) pair"""
     st.markdown(f"### 🔍 Assessment Criteria for {study_type}")
     
     assessment = {}
     criteria = NOS_CRITERIA[study_type]
     
     # Create tabs for each domain
-    domain_tabs = st.tabs(list(criteria.keys()))
+    domain_tabs = timed_tabs(list(criteria.keys()), key=f"domain_tabs_{study_type}")
     
     for tab_idx, (domain_name, domain) in enumerate(criteria.items()):
         with domain_tabs[tab_idx]:
@@ -751,8 +1128,6 @@ def show_assessment_form(study_type):
                 option_keys = []
                 for key, description in criterion['options'].items():
                     stars = criterion['stars'].get(key, 0)
-                    if criterion_name == "comparability" and key == "additional_factor":
-                        stars = 2
                     
                     star_display = "★" * stars if stars > 0 else "☆"
                     risk_level = "🟢 Low Risk" if stars > 0 else "🔴 High Risk"
@@ -767,29 +1142,60 @@ def show_assessment_form(study_type):
                     selected_idx = st.radio(
                         f"Select assessment for: {criterion['question']}",
                         range(len(options_display)),
-                        format_func=lambda x: options_display[x],
+                        format_func=lambda x, labels=options_display: labels[x],
                         key=f"{criterion_name}_{domain_name}",
-                        help="Select the option that best describes this study"
+                        help="Select the option that best describes this study",
+                        on_change=time_criterion_answer, args=(criterion_name,)
                     )
                 
                 with col2:
                     # Show immediate feedback
                     selected_option = option_keys[selected_idx]
                     stars = criterion['stars'].get(selected_option, 0)
-                    if criterion_name == "comparability" and selected_option == "additional_factor":
-                        stars = 2
                     
                     if stars > 0:
                         st.success(f"✅ {stars} star{'s' if stars > 1 else ''}")
                     else:
                         st.error("❌ 0 stars")
                 
+                if evidence is not None:
+                    render_criterion_evidence(evidence, study_type, domain_name, criterion_name, criterion)
+                
                 assessment[criterion_name] = option_keys[selected_idx]
                 
                 st.markdown("---")
     
     return assessment
 
+def show_timed_assessment(study_type, outcomes, evidence=None):
+    """Criterion answers, outcome answers and progress, kept outside the save form so every answer is timed"""
+    assessment = show_assessment_form(study_type, evidence)
+    outcome_answers = show_outcome_assessment_form(study_type, outcomes)
+    st.markdown(create_assessment_progress_bar(assessment, study_type), unsafe_allow_html=True)
+    return assessment, outcome_answers
+
+def track_fragment_activity(fragment):
+    """Keep the session busy and recently seen while a fragment reruns on its own.
+
+    Fragment reruns skip main(), so without this a reviewer working through a long
+    form would look idle and could have the portfolio spilled mid-assessment.
+    """
+    @functools.wraps(fragment)
+    def run(*args, **kwargs):
+        if st.session_state.get('full_rerun_active'):
+            return fragment(*args, **kwargs)
+        session_memory = get_session_memory()
+        session_memory.activate(st.session_state.session_id, st.session_state.studies)
+        try:
+            return fragment(*args, **kwargs)
+        finally:
+            session_memory.release(st.session_state.session_id)
+    return run
+
+if hasattr(st, "fragment"):
+    # Answering a criterion reruns only this section, not the whole page
+    show_timed_assessment = st.fragment(track_fragment_activity(show_timed_assessment))
+
 def create_assessment_progress_bar(assessment, study_type):
     """Create a progress bar for assessment completion"""
     criteria = NOS_CRITERIA[study_type]
@@ -821,6 +1227,7 @@ def create_assessment_progress_bar(assessment, study_type):
     
     return progress_html
 
+@profiled
 def create_risk_assessment_summary(studies_data):
     """Create a comprehensive risk assessment summary"""
     if not studies_data:
@@ -925,6 +1332,7 @@ def create_risk_assessment_summary(studies_data):
     
     return summary_html
 
+@profiled
 def create_methodological_recommendations(studies_data):
     """Generate methodological recommendations based on assessment"""
     if not studies_data:
@@ -968,6 +1376,21 @@ def create_methodological_recommendations(studies_data):
         </div>
         '''
     
+    # Criterion-level weaknesses
+    weaknesses = top_criterion_weaknesses(studies_data)
+    if weaknesses:
+        rec_html += '''
+        <div style="background: #fff3cd; padding: 15px; border-radius: 5px; margin-bottom: 15px; border-left: 4px solid #ffc107;">
+            <h5 style="color: #856404; margin-bottom: 10px;">🧬 Criteria Most Often Failing</h5>
+            <ul style="margin: 0; color: #856404;">
+        '''
+        for share, study_type, question, n_studies in weaknesses:
+            rec_html += f"<li>{question} ({study_type}): no star in {share * 100:.0f}% of {n_studies} studies</li>"
+        rec_html += '''
+            </ul>
+        </div>
+        '''
+    
     # Overall recommendations
     if stats['overall_quality_score'] >= 75:
         rec_html += '''
@@ -1000,6 +1423,38 @@ def create_methodological_recommendations(studies_data):
     rec_html += '</div>'
     return rec_html
 
+def detailed_export_row(study, domain_scores, row_number, quality):
+    """One row of the detailed export: study fields, domain scores and every criterion response"""
+    base_row = {
+        'Study_ID': row_number,
+        'Study_Name': study['study_name'],
+        'First_Author': study['authors'].split(',')[0] if study['authors'] else '',
+        'All_Authors': study['authors'],
+        'Publication_Year': study['publication_year'],
+        'Journal': study['journal'],
+        'DOI': study.get('doi', ''),
+        'Study_Type': study['study_type'],
+        'Assessment_Date': study['assessment_date'],
+        'Total_Stars': study['total_stars'],
+        'Max_Possible_Stars': get_max_stars(study['study_type']),
+        'Quality_Rating': quality,
+        'Quality_Percentage': (study['total_stars'] / get_max_stars(study['study_type'])) * 100,
+        'Notes': study.get('notes', '')
+    }
+    
+    # Add domain scores
+    for domain_name, scores in domain_scores.items():
+        base_row[f'{domain_name}_Stars'] = scores['stars']
+        base_row[f'{domain_name}_Max_Stars'] = scores['max_stars']
+        base_row[f'{domain_name}_Percentage'] = scores['percentage']
+    
+    # Add individual criterion responses
+    for criterion, response in study['assessment'].items():
+        base_row[f'NOS_{criterion}'] = response
+    
+    return base_row
+
+@profiled
 def export_to_csv_enhanced(studies_data):
     """Enhanced CSV export with detailed domain analysis"""
     if not studies_data:
@@ -1007,105 +1462,4177 @@ def export_to_csv_enhanced(studies_data):
     
     export_data = []
     
-    for study in studies_data:
-        domain_scores = calculate_domain_scores(study)
-        
-        base_row = {
-            'Study_ID': len(export_data) + 1,
-            'Study_Name': study['study_name'],
-            'First_Author': study['authors'].split(',')[0] if study['authors'] else '',
-            'All_Authors': study['authors'],
-            'Publication_Year': study['publication_year'],
-            'Journal': study['journal'],
-            'DOI': study.get('doi', ''),
-            'Study_Type': study['study_type'],
-            'Assessment_Date': study['assessment_date'],
-            'Total_Stars': study['total_stars'],
-            'Max_Possible_Stars': 9 if study['study_type'] in ["Cohort Studies", "Case-Control Studies"] else 8,
-            'Quality_Rating': study['quality_rating'],
-            'Quality_Percentage': (study['total_stars'] / (9 if study['study_type'] in ["Cohort Studies", "Case-Control Studies"] else 8)) * 100,
-            'Notes': study.get('notes', '')
-        }
-        
-        # Add domain scores
-        for domain_name, scores in domain_scores.items():
-            base_row[f'{domain_name}_Stars'] = scores['stars']
-            base_row[f'{domain_name}_Max_Stars'] = scores['max_stars']
-            base_row[f'{domain_name}_Percentage'] = scores['percentage']
-        
-        # Add individual criterion responses
-        for criterion, response in study['assessment'].items():
-            base_row[f'NOS_{criterion}'] = response
-        
-        export_data.append(base_row)
+    for study, quality in zip(studies_data, quality_labels(studies_data)):
+        export_data.append(detailed_export_row(study, calculate_domain_scores(study), len(export_data) + 1, quality))
     
     return pd.DataFrame(export_data)
-def main():
-    # Enhanced Header
-    st.markdown("""
-    <div class="main-header">
-        <h1>📊 Newcastle-Ottawa Scale Assessment Tool</h1>
-        <h3>Advanced Systematic Risk of Bias Assessment for Observational Studies</h3>
-        <p style="margin: 10px 0 0 0; opacity: 0.9; font-size: 14px;">
-            Version 2.0 | Publication-Ready Assessments | Enhanced Analytics
-        </p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # Developer information
-    st.markdown("""
-    <div class="developer-info">
-        <div style="display: grid; grid-template-columns: 2fr 1fr; gap: 20px; align-items: center;">
-            <div>
-                <strong>🎓 Developed by:</strong> Muhammad Nabeel Saddique<br>
-                <strong>📚 Institution:</strong> 4th Year MBBS Student, King Edward Medical University, Lahore, Pakistan<br>
-                <strong>🔬 Research Focus:</strong> Systematic Review, Meta-Analysis, Evidence-Based Medicine<br>
-                <strong>🏢 Founder:</strong> Nibras Research Academy - Mentoring young researchers in systematic reviews<br>
-                <strong>🛠️ Research Tools Expertise:</strong> Rayyan, Zotero, EndNote, WebPlotDigitizer, Meta-Converter, RevMan, MetaXL, Jamovi, CMA, OpenMeta, R Studio
-            </div>
-            <div style="text-align: center; background: white; padding: 15px; border-radius: 8px;">
-                <div style="font-size: 24px; font-weight: bold; color: #3498db;">
-                    {len(st.session_state.studies)}
-                </div>
-                <div style="font-size: 12px; color: #6c757d;">
-                    Studies Assessed
-                </div>
-            </div>
-        </div>
-    </div>
-    """.format(len=len), unsafe_allow_html=True)
+
+# Portfolio mutations and live change notifications
+LIVE_EVENT_BACKLOG = int(os.environ.get("NOS_LIVE_EVENT_BACKLOG", "5000"))
+LIVE_POLL_SECONDS = float(os.environ.get("NOS_LIVE_POLL_SECONDS", "5"))
+
+class ChangeBroker:
+    """In-process publish/subscribe channel shared by all reviewer sessions.
+
+    Each named channel keeps the latest copy of every study published to it
+    plus a bounded backlog of study-level events, so a session only has to
+    replay the events it has not seen yet.
+    """
+
+    def __init__(self, max_events=LIVE_EVENT_BACKLOG):
+        self._lock = threading.Lock()
+        self._max_events = max_events
+        self._channels = {}
+
+    def _channel(self, channel):
+        if channel not in self._channels:
+            self._channels[channel] = {
+                'seq': 0,
+                'events': deque(maxlen=self._max_events),
+                'studies': {}
+            }
+        return self._channels[channel]
+
+    def publish(self, channel, kind, study=None, origin=None):
+        """Publish a create/update/delete/clear event and return its sequence number"""
+        payload = copy.deepcopy(study) if study is not None else None
+        with self._lock:
+            state = self._channel(channel)
+            state['seq'] += 1
+            study_id = payload['study_id'] if payload else None
+            if kind == 'clear':
+                state['studies'].clear()
+            elif kind == 'delete':
+                state['studies'].pop(study_id, None)
+            else:
+                state['studies'][study_id] = payload
+            state['events'].append({
+                'seq': state['seq'],
+                'kind': kind,
+                'study_id': study_id,
+                'study': payload,
+                'origin': origin,
+                'timestamp': time.time()
+            })
+            return state['seq']
+
+    def latest_seq(self, channel):
+        with self._lock:
+            return self._channel(channel)['seq']
+
+    def events_since(self, channel, seq):
+        """Return (events, complete); complete is False when the backlog was truncated"""
+        with self._lock:
+            events = self._channel(channel)['events']
+            complete = not events or events[0]['seq'] <= seq + 1
+            return [event for event in events if event['seq'] > seq], complete
+
+    def snapshot(self, channel):
+        """Return (seq, studies) for a full resynchronisation"""
+        with self._lock:
+            state = self._channel(channel)
+            return state['seq'], copy.deepcopy(list(state['studies'].values()))
+
+@st.cache_resource
+def get_change_broker():
+    """Process-wide broker shared by every session of this server"""
+    return ChangeBroker()
+
+def ensure_study_ids(studies):
+    """Give legacy records a stable identifier"""
+    for study in studies:
+        if 'study_id' not in study:
+            study['study_id'] = uuid.uuid4().hex
+
+def drop_stored_labels(studies):
+    """Remove quality labels saved by earlier versions; labels are derived from the stars when shown"""
+    for study in studies:
+        study.pop('quality_rating', None)
+
+def rescore_restored_studies(records):
+    """Usable studies of a backup, with stars recomputed from their answers under the loaded rubrics.
+
+    Stored totals and labels are not trusted: the file may be hand-edited or come from other
+    rubric versions.  Returns (studies, number whose stored total differed).
+    """
+    studies, corrected = [], 0
+    for record in records:
+        if not (isinstance(record, dict) and record.get('study_type') in NOS_CRITERIA
+                and isinstance(record.get('assessment'), dict)
+                and isinstance(record.get('outcome_assessments', {}), dict)):
+            continue
+        study = dict(record, total_stars=calculate_total_stars(record['assessment'], record['study_type']))
+        study.pop('quality_rating', None)
+        corrected += study['total_stars'] != record.get('total_stars')
+        studies.append(study)
+    return studies, corrected
+
+def invalidate_study_views(study_ids=None):
+    """Drop cached cards for the given studies (all when None) and bump the portfolio revision"""
+    if study_ids is None:
+        st.session_state.card_cache.clear()
+    else:
+        for study_id in study_ids:
+            st.session_state.card_cache.pop(study_id, None)
+    if 'adjudication_queue' in st.session_state:
+        st.session_state.adjudication_queue.mark_dirty(study_ids)
+    st.session_state.portfolio_revision += 1
+
+def live_channel_key():
+    """Broker channel for this session; channels are scoped to the open project"""
+    if not st.session_state.live_channel:
+        return ""
+    return f"{st.session_state.project}/{st.session_state.live_channel}"
+
+def _publish_changes(pairs):
+    channel = live_channel_key()
+    if not channel:
+        return
+    broker = get_change_broker()
+    if len(pairs) > 1 and not st.session_state.studies:
+        changes = [('clear', None)]
+    else:
+        changes = [('delete', old) if new is None else ('create' if old is None else 'update', new)
+                   for old, new in pairs]
+    for kind, study in changes:
+        st.session_state.live_cursor = broker.publish(channel, kind, study, origin=st.session_state.session_id)
+
+def _portfolio_changed(pairs):
+    """Common bookkeeping after any local mutation of the portfolio.
+
+    pairs holds the (old, new) versions of every affected study, None where it is absent.
+    """
+    if not _persist_current_project(pairs):
+        return
+    record_audit_events(pairs)
+    publish_change_records(pairs)
+    cleared = len(pairs) > 1 and not st.session_state.studies
+    invalidate_study_views(None if cleared else [(new or old)['study_id'] for old, new in pairs])
+    _publish_changes(pairs)
+
+# Undo and redo
+# Every mutation below is expressed as an edit (see UndoHistory) and recorded before its
+# bookkeeping runs; undoing applies the inverse edits, so restoring a cleared portfolio
+# re-links the removed study dicts instead of copying them.
+def _locate_study(studies, position, study_id):
+    """Current index of a study, checking the recorded position first; None when it is gone"""
+    if position < len(studies) and studies[position]['study_id'] == study_id:
+        return position
+    return next((idx for idx, existing in enumerate(studies) if existing['study_id'] == study_id), None)
+
+def _apply_edit(edit):
+    """Apply one edit to the portfolio and return the (old, new) pairs it produced.
+
+    Positions are checked against study_id, so edits still apply after live sync has
+    moved studies around; studies that another reviewer already removed are skipped.
+    """
+    kind, items = edit
+    studies = st.session_state.studies
+    pairs = []
+    if kind == 'replace':
+        for position, old, new in items:
+            idx = _locate_study(studies, position, old['study_id'])
+            if idx is not None:
+                pairs.append((studies[idx], new))
+                studies[idx] = new
+    elif kind == 'remove':
+        if len(items) == 1:
+            idx = _locate_study(studies, items[0][0], items[0][1]['study_id'])
+            if idx is not None:
+                pairs.append((studies.pop(idx), None))
+        else:
+            removed_ids = {study['study_id'] for _, study in items}
+            pairs = [(study, None) for study in studies if study['study_id'] in removed_ids]
+            studies[:] = [study for study in studies if study['study_id'] not in removed_ids]
+    else:
+        present = {study['study_id'] for study in studies}
+        items = [(position, study) for position, study in items if study['study_id'] not in present]
+        if len(items) == 1:
+            studies.insert(items[0][0], items[0][1])
+        elif items and items[0][0] >= len(studies):
+            studies.extend(study for _, study in items)
+        elif items:
+            # Positions are ascending, so one merge pass rebuilds the list
+            merged, remaining = [], iter(studies)
+            for position, study in items:
+                merged.extend(itertools.islice(remaining, max(position - len(merged), 0)))
+                merged.append(study)
+            merged.extend(remaining)
+            studies[:] = merged
+        pairs = [(None, study) for _, study in items]
+    return pairs
+
+def _inverse_edit(edit):
+    kind, items = edit
+    if kind == 'replace':
+        return kind, [(position, new, old) for position, old, new in items]
+    return ('insert' if kind == 'remove' else 'remove'), items
+
+def _edit_portfolio(label, edit):
+    pairs = _apply_edit(edit)
+    if pairs:
+        st.session_state.undo_history.record(label, edit)
+        _portfolio_changed(pairs)
+    return pairs
+
+def undo_step(label):
+    """Context manager grouping several mutations into a single undo step"""
+    return st.session_state.undo_history.step(label)
+
+def undo_last_change():
+    """Revert the most recent undo step and return its label"""
+    history = st.session_state.undo_history
+    if not history.undo:
+        return None
+    label, edits = history.undo.pop()
+    pairs = []
+    for edit in reversed(edits):
+        pairs.extend(_apply_edit(_inverse_edit(edit)))
+    history.redo.append((label, edits))
+    if pairs:
+        _portfolio_changed(pairs)
+    return label
+
+def redo_last_change():
+    """Re-apply the most recently undone step and return its label"""
+    history = st.session_state.undo_history
+    if not history.redo:
+        return None
+    label, edits = history.redo.pop()
+    pairs = []
+    for edit in edits:
+        pairs.extend(_apply_edit(edit))
+    history.undo.append((label, edits))
+    if pairs:
+        _portfolio_changed(pairs)
+    return label
+
+def add_study(study, label=None):
+    """Append a study to the portfolio and notify other sessions"""
+    if 'study_id' not in study:
+        study['study_id'] = uuid.uuid4().hex
+    _edit_portfolio(label or f"Add {study['study_name']}", ('insert', [(len(st.session_state.studies), study)]))
+
+def add_studies(studies, label):
+    """Append several studies as one undo step, skipping study_ids already in the portfolio"""
+    for study in studies:
+        study.setdefault('study_id', uuid.uuid4().hex)
+    start = len(st.session_state.studies)
+    return len(_edit_portfolio(label, ('insert', [(start + offset, study) for offset, study in enumerate(studies)])))
+
+def update_study(study):
+    """Replace the stored study with the same study_id"""
+    for idx, existing in enumerate(st.session_state.studies):
+        if existing['study_id'] == study['study_id']:
+            _edit_portfolio(f"Edit {study['study_name']}", ('replace', [(idx, existing, study)]))
+            break
+
+def remove_study(study):
+    """Remove a study from the portfolio and notify other sessions"""
+    idx = _locate_study(st.session_state.studies, 0, study['study_id'])
+    if idx is not None:
+        _edit_portfolio(f"Delete {study['study_name']}", ('remove', [(idx, st.session_state.studies[idx])]))
+
+def clear_studies():
+    """Remove every study from the portfolio"""
+    studies = st.session_state.studies
+    _edit_portfolio(f"Clear {len(studies)} studies", ('remove', list(enumerate(studies))))
+
+def join_live_channel(channel):
+    """Subscribe this session to a shared channel, merging local studies into it"""
+    broker = get_change_broker()
+    st.session_state.live_channel = channel
+    if not channel:
+        return
+    channel = live_channel_key()
+    ensure_study_ids(st.session_state.studies)
+    _, shared = broker.snapshot(channel)
+    shared_ids = {study['study_id'] for study in shared}
+    for study in st.session_state.studies:
+        if study['study_id'] not in shared_ids:
+            broker.publish(channel, 'create', study, origin=st.session_state.session_id)
+    st.session_state.live_cursor, shared = broker.snapshot(channel)
+    st.session_state.studies[:] = shared
+    invalidate_study_views()
+    _save_current_project()
+
+def sync_live_changes():
+    """Apply events published by other sessions since this session's cursor.
+
+    Only the cards of affected studies are invalidated; the whole portfolio is
+    re-read from the channel snapshot only if the backlog no longer covers the
+    cursor.
+    """
+    channel = live_channel_key()
+    if not channel:
+        return 0
+    broker = get_change_broker()
+    events, complete = broker.events_since(channel, st.session_state.live_cursor)
+    if not complete:
+        st.session_state.live_cursor, shared = broker.snapshot(channel)
+        st.session_state.studies[:] = shared
+        invalidate_study_views()
+        return len(events)
     
-    # Sidebar
-    st.sidebar.header("🎛️ Assessment Controls")
+    applied = 0
+    positions = None
+    touched = set()
+    for event in events:
+        st.session_state.live_cursor = event['seq']
+        if event['origin'] == st.session_state.session_id:
+            continue
+        applied += 1
+        if event['kind'] == 'clear':
+            st.session_state.studies.clear()
+            positions = {}
+            touched = None
+            continue
+        if positions is None:
+            positions = {s['study_id']: idx for idx, s in enumerate(st.session_state.studies)}
+        study_id = event['study_id']
+        if event['kind'] == 'delete':
+            if study_id in positions:
+                st.session_state.studies[:] = [s for s in st.session_state.studies if s['study_id'] != study_id]
+                positions = None
+        elif study_id in positions:
+            st.session_state.studies[positions[study_id]] = copy.deepcopy(event['study'])
+        else:
+            st.session_state.studies.append(copy.deepcopy(event['study']))
+            positions[study_id] = len(st.session_state.studies) - 1
+        if touched is not None:
+            touched.add(study_id)
     
-    # Quick stats in sidebar
-    if st.session_state.studies:
-        st.sidebar.markdown("### 📈 Quick Statistics")
-        stats = generate_summary_statistics(st.session_state.studies)
-        
-        col1, col2 = st.sidebar.columns(2)
-        with col1:
-            st.metric("Total Studies", stats['total_studies'])
-            st.metric("Good Quality", stats['quality_counts']['Good Quality'])
-        with col2:
-            st.metric("Overall Score", f"{stats['overall_quality_score']:.1f}%")
-            st.metric("Poor Quality", stats['quality_counts']['Poor Quality'])
+    if applied:
+        invalidate_study_views(touched)
+    return applied
+
+if hasattr(st, "fragment"):
+    @st.fragment(run_every=LIVE_POLL_SECONDS)
+    def live_change_watcher():
+        """Rerun the app only when the shared channel has moved past our cursor"""
+        channel = live_channel_key()
+        if channel and get_change_broker().latest_seq(channel) > st.session_state.live_cursor:
+            st.rerun()
+else:
+    def live_change_watcher():
+        pass
+
+def get_study_card_html(study):
+    """Summary card HTML, cached per study until the study changes"""
+    study_id = study.get('study_id')
+    if study_id is None:
+        return create_study_summary_card(study)
+    card_html = st.session_state.card_cache.get(study_id)
+    if card_html is None:
+        card_html = create_study_summary_card(study)
+        st.session_state.card_cache[study_id] = card_html
+    return card_html
+
+def get_portfolio_statistics():
+    """Summary statistics for the current portfolio, recomputed only after a change or a scheme switch"""
+    key = (st.session_state.portfolio_revision, get_quality_scheme())
+    cached = st.session_state.derived_caches.get('stats_cache')
+    if cached is None or cached[0] != key:
+        started = time.perf_counter()
+        cached = (key, generate_summary_statistics(st.session_state.studies))
+        get_metrics().observe("nos_stats_computation_seconds", "Time to compute portfolio summary statistics",
+                              time.perf_counter() - started)
+        st.session_state.derived_caches['stats_cache'] = cached
+    return cached[1]
+
+# Multi-project workspaces
+WORKSPACE_DIR = os.environ.get("NOS_WORKSPACE_DIR", os.path.join(os.path.expanduser("~"), ".nos_workspace"))
+SCRATCH_PROJECT = "Scratch (this session only)"
+
+def compute_project_rollup(studies):
+    """Cheap per-project aggregate used for cross-project summaries"""
+    rollup = {'studies': 0, 'Good Quality': 0, 'Fair Quality': 0, 'Poor Quality': 0,
+              'total_stars': 0, 'max_stars': 0}
+    for study in studies:
+        adjust_project_rollup(rollup, study, 1)
+    rollup['updated'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return rollup
+
+def adjust_project_rollup(rollup, study, sign):
+    """Add (sign=1) or remove (sign=-1) one study's contribution to a rollup (standard-scheme labels)"""
+    quality = get_quality_rating(study['total_stars'], study['study_type'])[0]
+    rollup['studies'] += sign
+    rollup[quality] = rollup.get(quality, 0) + sign
+    rollup['total_stars'] += sign * study['total_stars']
+    rollup['max_stars'] += sign * get_max_stars(study['study_type'])
+
+WORKSPACE_COMPACT_RECORDS = int(os.environ.get("NOS_WORKSPACE_COMPACT_RECORDS", "1000"))
+
+def journal_records(pairs, version):
+    """Journal records for (old, new) study pairs, numbered from version + 1"""
+    records = []
+    for old, new in pairs:
+        version += 1
+        if new is None:
+            records.append({'v': version, 'op': 'delete', 'study_id': old['study_id']})
+        else:
+            records.append({'v': version, 'op': 'put', 'study_id': new['study_id'], 'study': new})
+    return records
+
+def apply_journal_records(studies, records):
+    """Replay journal records onto a list of studies in place; returns the touched study ids"""
+    if not records:
+        return set()
+    positions = {study.get('study_id'): idx for idx, study in enumerate(studies)}
+    deleted = set()
+    for record in records:
+        study_id = record['study_id']
+        if record['op'] == 'delete':
+            deleted.add(study_id)
+        elif study_id in positions:
+            deleted.discard(study_id)
+            studies[positions[study_id]] = record['study']
+        else:
+            deleted.discard(study_id)
+            positions[study_id] = len(studies)
+            studies.append(record['study'])
+    if deleted:
+        studies[:] = [study for study in studies if study.get('study_id') not in deleted]
+    return {record['study_id'] for record in records}
+
+def _same_study(a, b):
+    if a is None or b is None:
+        return a is b
+    return json.dumps(a, sort_keys=True, default=str) == json.dumps(b, sort_keys=True, default=str)
+
+class Workspace:
+    """Named projects stored as a JSON snapshot plus an append-only journal each, and an index of rollups.
+
+    Only the index is read at startup; a project's studies are read from disk
+    when a session opens it.  Saving appends one record per changed study and
+    bumps the project version; the snapshot is rewritten only when the journal
+    outgrows it.  Writes carry the version the session last saw, so an edit to
+    a study that another session changed in the meantime is rejected rather
+    than silently overwriting it.
+    """
+
+    def __init__(self, root=WORKSPACE_DIR, compact_records=WORKSPACE_COMPACT_RECORDS):
+        self.root = root
+        self.compact_records = compact_records
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._index_path = os.path.join(root, "index.json")
+        self._index = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as fh:
+                self._index = json.load(fh)
+
+    def _write_json(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(data, fh, default=str)
+        os.replace(tmp_path, path)
+
+    def _project_path(self, name):
+        return os.path.join(self.root, self._index[name]['file'])
+
+    def _journal_path(self, name):
+        return os.path.splitext(self._project_path(name))[0] + ".journal.ndjson"
+
+    def _read_journal(self, name, after=0):
+        path = self._journal_path(name)
+        if not os.path.exists(path):
+            return []
+        with open(path) as fh:
+            records = [json.loads(line) for line in fh if line.strip()]
+        return [record for record in records if record['v'] > after]
+
+    def _read_locked(self, name):
+        with open(self._project_path(name)) as fh:
+            studies = json.load(fh)
+        apply_journal_records(studies, self._read_journal(name, self._index[name].get('snapshot_version', 0)))
+        return studies
+
+    def _write_snapshot_locked(self, name, studies):
+        entry = self._index[name]
+        self._write_json(self._project_path(name), list(studies))
+        if os.path.exists(self._journal_path(name)):
+            os.remove(self._journal_path(name))
+        entry['snapshot_version'] = entry.get('version', 0)
+        entry['journal'] = 0
+
+    def projects(self):
+        """Return {name: rollup} for every project without loading any studies"""
+        with self._lock:
+            return {name: dict(entry['rollup']) for name, entry in self._index.items()}
+
+    def create(self, name, studies=()):
+        with self._lock:
+            if name in self._index:
+                raise ValueError(f"Project '{name}' already exists")
+            slug = re.sub(r'[^A-Za-z0-9_-]+', '_', name).strip('_') or "project"
+            self._index[name] = {'file': f"{slug}_{uuid.uuid4().hex[:8]}.json",
+                                 'rollup': compute_project_rollup(studies), 'version': 0}
+            self._write_snapshot_locked(name, studies)
+            self._write_json(self._index_path, self._index)
+
+    def load(self, name):
+        """Return (studies, version) of a project"""
+        with self._lock:
+            return self._read_locked(name), self._index[name].get('version', 0)
+
+    def project_dir(self, kind, name):
+        """Directory for one kind of per-project data, e.g. audit log segments or timings"""
+        with self._lock:
+            return os.path.join(self.root, kind, os.path.splitext(self._index[name]['file'])[0])
+
+    def audit_dir(self, name):
+        """Directory holding the audit log segments of a project"""
+        return self.project_dir("audit", name)
+
+    def commit(self, name, pairs, base_version):
+        """Append the (old, new) study pairs of one change made on top of base_version.
+
+        Returns {'saved', 'version', 'remote', 'conflicts'}: remote holds the records other
+        sessions wrote after base_version (None when they were compacted away and the caller
+        must reload), conflicts the ids of studies changed both here and there.  Nothing is
+        written when there is a conflict.
+        """
+        with self._lock:
+            if name not in self._index:
+                return {'saved': False, 'version': base_version, 'remote': [], 'conflicts': set()}
+            entry = self._index[name]
+            version = entry.get('version', 0)
+            remote = []
+            conflicts = set()
+            if version != base_version:
+                if base_version >= entry.get('snapshot_version', 0):
+                    remote = self._read_journal(name, base_version)
+                    current = {record['study_id']: record.get('study') for record in remote}
+                else:
+                    remote = None
+                    current = {study['study_id']: study for study in self._read_locked(name)}
+                for old, new in pairs:
+                    study_id = (new or old)['study_id']
+                    if (remote is None or study_id in current) and not _same_study(current.get(study_id), old):
+                        conflicts.add(study_id)
+            if conflicts:
+                return {'saved': False, 'version': version, 'remote': remote, 'conflicts': conflicts}
+            
+            records = journal_records(pairs, version)
+            with open(self._journal_path(name), "a") as fh:
+                fh.write("".join(json.dumps(record, default=str) + "\n" for record in records))
+            entry['version'] = version + len(records)
+            entry['journal'] = entry.get('journal', 0) + len(records)
+            rollup = entry['rollup']
+            for old, new in pairs:
+                if old is not None:
+                    adjust_project_rollup(rollup, old, -1)
+                if new is not None:
+                    adjust_project_rollup(rollup, new, 1)
+            rollup['updated'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            if entry['journal'] > max(self.compact_records, rollup['studies']):
+                self._write_snapshot_locked(name, self._read_locked(name))
+            self._write_json(self._index_path, self._index)
+            return {'saved': True, 'version': entry['version'], 'remote': remote, 'conflicts': set()}
+
+    def _queue_path(self, name):
+        return os.path.splitext(self._project_path(name))[0] + ".queue.json"
+
+    def _read_queue_locked(self, name):
+        path = self._queue_path(name)
+        if not os.path.exists(path):
+            return [], []
+        with open(path) as fh:
+            data = json.load(fh)
+        return data['queue'], data['roster']
+
+    def load_queue(self, name):
+        """Return (queued records, reviewer roster rows, queue version) of a project"""
+        with self._lock:
+            return (*self._read_queue_locked(name), self._index[name].get('queue_version', 0))
+
+    def queue_version(self, name):
+        with self._lock:
+            return self._index.get(name, {}).get('queue_version', 0)
+
+    def update_queue(self, name, change):
+        """Run change(queue, roster) on the stored queue and save it.
+
+        The change is applied to the latest stored state under the lock, so imports,
+        removals and assignments made by different sessions all survive.  Returns
+        (change result, queue, roster, queue version).
+        """
+        with self._lock:
+            queue, roster = self._read_queue_locked(name)
+            result = change(queue, roster)
+            self._write_json(self._queue_path(name), {'queue': queue, 'roster': roster})
+            entry = self._index[name]
+            entry['queue_version'] = entry.get('queue_version', 0) + 1
+            self._write_json(self._index_path, self._index)
+            return result, queue, roster, entry['queue_version']
+
+    def save(self, name, studies):
+        """Replace a project's studies wholesale and return the new version"""
+        with self._lock:
+            if name not in self._index:
+                return 0
+            entry = self._index[name]
+            entry['version'] = entry.get('version', 0) + 1
+            self._write_snapshot_locked(name, studies)
+            entry['rollup'] = compute_project_rollup(studies)
+            self._write_json(self._index_path, self._index)
+            return entry['version']
+
+@st.cache_resource
+def get_workspace():
+    return Workspace()
+
+def _persist_current_project(pairs):
+    """Save one change of the open project; False when it was rejected as stale.
+
+    Non-conflicting changes saved by other sessions in the meantime are merged into this
+    session's portfolio.  On a conflict the change is dropped and the project reloaded.
+    """
+    project = st.session_state.project
+    if project == SCRATCH_PROJECT:
+        return True
+    result = get_workspace().commit(project, pairs, st.session_state.project_version)
+    if result['saved'] and result['remote'] is not None:
+        st.session_state.project_version = result['version']
+        if result['remote']:
+            touched = apply_journal_records(st.session_state.studies, result['remote'])
+            invalidate_study_views(touched)
+        return True
     
-    # Navigation
-    page = st.sidebar.selectbox(
-        "Select Action",
-        [
-            "🏠 Dashboard", 
-            "📝 Add New Study", 
-            "📚 View All Studies", 
-            "📊 Generate Report", 
-            "📈 Advanced Analytics",
-            "🔄 Compare Studies",
+    studies, st.session_state.project_version = get_workspace().load(project)
+    st.session_state.studies[:] = studies
+    invalidate_study_views()
+    if result['saved']:
+        return True
+    st.session_state.undo_history.clear()
+    names = [(new or old)['study_name'] for old, new in pairs if (new or old)['study_id'] in result['conflicts']]
+    st.session_state.save_notice = (f"Not saved: {', '.join(names[:3])}{' …' if len(names) > 3 else ''} "
+                                    f"changed in another session. The project has been reloaded.")
+    return False
+
+def _save_current_project():
+    """Write the whole open project, e.g. after merging a live channel into it"""
+    project = st.session_state.project
+    if project != SCRATCH_PROJECT:
+        st.session_state.project_version = get_workspace().save(project, st.session_state.studies)
+
+def change_queue(change):
+    """Run change(queue, roster_rows) on the open project's assessment queue and return its result.
+
+    Workspace projects apply it to the stored queue, picking up other sessions' changes on
+    the way; the scratch project keeps its queue in the session.
+    """
+    project = st.session_state.project
+    if project == SCRATCH_PROJECT:
+        return change(st.session_state.assessment_queue, st.session_state.reviewer_roster_rows)
+    result, queue, roster, st.session_state.queue_version = get_workspace().update_queue(project, change)
+    st.session_state.assessment_queue[:] = queue
+    st.session_state.reviewer_roster_rows[:] = roster
+    return result
+
+def sync_queue():
+    """Reload the open project's queue when another session changed it"""
+    project = st.session_state.project
+    if project == SCRATCH_PROJECT or get_workspace().queue_version(project) == st.session_state.queue_version:
+        return
+    queue, roster, st.session_state.queue_version = get_workspace().load_queue(project)
+    st.session_state.assessment_queue[:] = queue
+    st.session_state.reviewer_roster_rows[:] = roster
+
+def dequeue(queue_id):
+    """Drop one record from the assessment queue once it is assessed or discarded"""
+    def change(queue, roster):
+        queue[:] = [record for record in queue if record['queue_id'] != queue_id]
+    change_queue(change)
+
+def open_project(name):
+    """Switch this session to another project, loading its studies and queue on demand"""
+    if name == st.session_state.project:
+        return
+    if st.session_state.project == SCRATCH_PROJECT:
+        st.session_state.scratch_studies = list(st.session_state.studies)
+        st.session_state.scratch_queue = (list(st.session_state.assessment_queue),
+                                          list(st.session_state.reviewer_roster_rows))
+    if name == SCRATCH_PROJECT:
+        studies, version = st.session_state.pop('scratch_studies', []), 0
+        (queue, roster), queue_version = st.session_state.pop('scratch_queue', ([], [])), 0
+    else:
+        studies, version = get_workspace().load(name)
+        drop_stored_labels(studies)
+        queue, roster, queue_version = get_workspace().load_queue(name)
+    st.session_state.assessment_queue[:] = queue
+    st.session_state.reviewer_roster_rows[:] = roster
+    st.session_state.queue_version = queue_version
+    for key in ('queue_selection', 'reviewer_roster_editor', 'assignment_reviewer'):
+        st.session_state.pop(key, None)
+    st.session_state.project = name
+    st.session_state.project_version = version
+    st.session_state.studies[:] = studies
+    st.session_state.undo_history.clear()
+    st.session_state.live_cursor = 0
+    ensure_study_ids(st.session_state.studies)
+    invalidate_study_views()
+    if st.session_state.live_channel:
+        join_live_channel(st.session_state.live_channel)
+
+def create_project(name):
+    """Create a project; a non-empty scratch portfolio and its queue are moved into it"""
+    from_scratch = st.session_state.project == SCRATCH_PROJECT
+    studies = list(st.session_state.studies) if from_scratch else []
+    get_workspace().create(name, studies)
+    if studies:
+        st.session_state.studies.clear()
+    if from_scratch and (st.session_state.assessment_queue or st.session_state.reviewer_roster_rows):
+        def move_scratch_queue(queue, roster):
+            queue.extend(st.session_state.assessment_queue)
+            roster.extend(st.session_state.reviewer_roster_rows)
+        get_workspace().update_queue(name, move_scratch_queue)
+        st.session_state.assessment_queue.clear()
+        st.session_state.reviewer_roster_rows.clear()
+    open_project(name)
+
+# Effect-size meta-analysis
+EFFECT_MEASURES = ["Odds Ratio", "Risk Ratio", "Hazard Ratio", "Mean Difference", "Standardised Mean Difference", "Other"]
+RATIO_MEASURES = {"Odds Ratio", "Risk Ratio", "Hazard Ratio"}
+Z_95 = 1.959963984540054
+LOO_BLOCK_SIZE = 512
+
+def _chi2_sf(x, df):
+    """Upper tail probability of the chi-square distribution (regularised incomplete gamma)"""
+    if df <= 0 or x <= 0:
+        return 1.0
+    a, x = df / 2.0, x / 2.0
+    log_prefix = -x + a * math.log(x) - math.lgamma(a)
+    if x < a + 1:
+        term = total = 1.0 / a
+        n = a
+        while abs(term) > abs(total) * 1e-12:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1.0 - total * math.exp(log_prefix))
+    # Continued fraction for the upper tail
+    b = x + 1 - a
+    c = 1e300
+    d = 1 / b
+    h = d
+    for i in range(1, 500):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = 1e-300 if abs(d) < 1e-300 else d
+        c = b + an / c
+        c = 1e-300 if abs(c) < 1e-300 else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-12:
+            break
+    return min(1.0, math.exp(log_prefix) * h)
+
+def _normal_p_value(z):
+    return math.erfc(abs(z) / math.sqrt(2))
+
+def effect_outcome_name(study):
+    """Assessed outcome the study's top-level effect size belongs to (its primary outcome unless named)"""
+    outcome = study.get('effect_outcome')
+    return primary_outcome_name(study) if outcome in (None, "", PRIMARY_OUTCOME) else outcome
+
+def study_effects(study):
+    """(outcome, measure, estimate, standard error) of each effect size a study records.
+
+    Effect sizes are keyed by the same outcome names as the assessments: the top-level fields
+    belong to effect_outcome_name(study), `outcome_effects` holds those of the additional outcomes.
+    """
+    if study.get('effect_estimate') is not None and study.get('standard_error'):
+        yield effect_outcome_name(study), study.get('effect_measure', 'Other'), study['effect_estimate'], study['standard_error']
+    for outcome, effect in study.get('outcome_effects', {}).items():
+        if effect.get('effect_estimate') is not None and effect.get('standard_error'):
+            yield outcome, effect.get('effect_measure', 'Other'), effect['effect_estimate'], effect['standard_error']
+
+def effect_analysis_keys(studies):
+    """Sorted (outcome, measure) pairs that have at least one recorded effect size"""
+    return sorted({(outcome, measure) for study in studies for outcome, measure, _, _ in study_effects(study)})
+
+def extract_effect_arrays(studies, outcome=None, measure=None):
+    """Collect the usable effect estimates of one outcome into NumPy arrays.
+
+    Only studies reporting the same effect measure are pooled: without a measure the rows must
+    agree on one, otherwise ValueError is raised.  Ratio measures are pooled on the log scale
+    (the standard error is expected on that scale too); 'excluded' counts rows dropped for a
+    non-positive ratio or an unusable standard error.  'indices' point into studies; without
+    an outcome a study recording several outcomes appears once per outcome.
+    """
+    rows = [
+        (idx, row_measure, estimate, standard_error)
+        for idx, study in enumerate(studies)
+        for row_outcome, row_measure, estimate, standard_error in study_effects(study)
+        if (outcome is None or row_outcome == outcome) and (measure is None or row_measure == measure)
+    ]
+    measures = {row[1] for row in rows}
+    if len(measures) > 1:
+        raise ValueError(f"Cannot pool different effect measures: {', '.join(sorted(measures))}")
+    measure = measures.pop() if measures else (measure or 'Other')
+    estimates = np.array([row[2] for row in rows], dtype=float)
+    if measure in RATIO_MEASURES:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            estimates = np.where(estimates > 0, np.log(estimates), np.nan)
+    standard_errors = np.array([row[3] for row in rows], dtype=float)
+    valid = np.isfinite(estimates) & np.isfinite(standard_errors) & (standard_errors > 0)
+    return {
+        'indices': np.array([row[0] for row in rows], dtype=int)[valid],
+        'yi': estimates[valid],
+        'vi': standard_errors[valid] ** 2,
+        'measure': measure,
+        'excluded': int((~valid).sum())
+    }
+
+def pool_effects(yi, vi, weights=None):
+    """Fixed-effect and DerSimonian-Laird random-effects pooling with heterogeneity statistics"""
+    k = len(yi)
+    if k == 0:
+        return None
+    w = 1.0 / vi
+    if weights is not None:
+        w = w * weights
+    sum_w = w.sum()
+    fixed = float((w * yi).sum() / sum_w)
+    # Variance of a weighted mean when the weights are not inverse variances
+    fixed_se = float(np.sqrt((w ** 2 * vi).sum()) / sum_w)
+    q = float((w * (yi - fixed) ** 2).sum())
+    c = float(sum_w - (w ** 2).sum() / sum_w)
+    tau2 = max(0.0, (q - (k - 1)) / c) if k > 1 and c > 0 else 0.0
+    w_random = 1.0 / (vi + tau2)
+    if weights is not None:
+        w_random = w_random * weights
+    sum_w_random = w_random.sum()
+    random_effect = float((w_random * yi).sum() / sum_w_random)
+    random_se = float(np.sqrt((w_random ** 2 * (vi + tau2)).sum()) / sum_w_random)
+    return {
+        'k': k,
+        'fixed': fixed,
+        'fixed_se': fixed_se,
+        'random': random_effect,
+        'random_se': random_se,
+        'tau2': tau2,
+        'q': q,
+        'q_p_value': _chi2_sf(q, k - 1),
+        'i2': max(0.0, (q - (k - 1)) / q * 100) if q > 0 else 0.0,
+        'random_p_value': _normal_p_value(random_effect / random_se) if random_se > 0 else 1.0
+    }
+
+def pool_by_subgroup(yi, vi, groups):
+    """Random-effects pooling within each group plus the between-subgroup Q test"""
+    results = {}
+    for group in sorted(set(groups)):
+        mask = groups == group
+        results[group] = pool_effects(yi[mask], vi[mask])
+    
+    pooled = [r for r in results.values() if r is not None]
+    between = None
+    if len(pooled) > 1:
+        estimates = np.array([r['random'] for r in pooled])
+        precision = 1.0 / np.array([r['random_se'] for r in pooled]) ** 2
+        overall = (precision * estimates).sum() / precision.sum()
+        q_between = float((precision * (estimates - overall) ** 2).sum())
+        between = {'q': q_between, 'df': len(pooled) - 1, 'p_value': _chi2_sf(q_between, len(pooled) - 1)}
+    return results, between
+
+def leave_one_out(yi, vi, block_size=LOO_BLOCK_SIZE):
+    """Leave-one-out fixed and random-effects estimates for every study.
+
+    The fixed-effect estimate, Q and DerSimonian-Laird tau² without study i
+    follow in closed form from running sums (O(N) in total). The re-weighted
+    random-effects mean is evaluated exactly in row blocks to bound memory.
+    """
+    k = len(yi)
+    if k < 3:
+        return None
+    w = 1.0 / vi
+    sum_w, sum_wy, sum_wy2, sum_w2 = w.sum(), (w * yi).sum(), (w * yi ** 2).sum(), (w ** 2).sum()
+    
+    loo_w = sum_w - w
+    loo_wy = sum_wy - w * yi
+    loo_fixed = loo_wy / loo_w
+    loo_q = np.maximum(0.0, (sum_wy2 - w * yi ** 2) - loo_wy ** 2 / loo_w)
+    loo_c = loo_w - (sum_w2 - w ** 2) / loo_w
+    loo_tau2 = np.maximum(0.0, (loo_q - (k - 2)) / loo_c)
+    loo_i2 = np.where(loo_q > 0, np.maximum(0.0, (loo_q - (k - 2)) / np.where(loo_q > 0, loo_q, 1) * 100), 0.0)
+    
+    loo_random = np.empty(k)
+    loo_random_se = np.empty(k)
+    for start in range(0, k, block_size):
+        stop = min(start + block_size, k)
+        block_weights = 1.0 / (vi[None, :] + loo_tau2[start:stop, None])
+        block_weights[np.arange(stop - start), np.arange(start, stop)] = 0.0
+        block_sum = block_weights.sum(axis=1)
+        loo_random[start:stop] = block_weights @ yi / block_sum
+        loo_random_se[start:stop] = np.sqrt(1.0 / block_sum)
+    
+    return {
+        'fixed': loo_fixed,
+        'fixed_se': np.sqrt(1.0 / loo_w),
+        'random': loo_random,
+        'random_se': loo_random_se,
+        'tau2': loo_tau2,
+        'i2': loo_i2
+    }
+
+def quality_sensitivity_analysis(yi, vi, studies_subset):
+    """Pooled random-effects estimates under quality-based inclusion rules"""
+    quality = np.array(quality_labels(studies_subset))
+    quality_score = np.array([s['total_stars'] / get_max_stars(s['study_type']) for s in studies_subset])
+    scenarios = {
+        'All studies': pool_effects(yi, vi),
+        'Excluding Poor Quality': pool_effects(yi[quality != "Poor Quality"], vi[quality != "Poor Quality"]),
+        'Good Quality only': pool_effects(yi[quality == "Good Quality"], vi[quality == "Good Quality"]),
+        'Quality-weighted (stars / max)': pool_effects(yi, vi, weights=np.maximum(quality_score, 1e-9))
+    }
+    return scenarios
+
+def format_effect(value, measure):
+    """Back-transform log ratios for display"""
+    return math.exp(value) if measure in RATIO_MEASURES else value
+
+def meta_analysis_summary_row(label, result, measure):
+    if result is None:
+        return {'Analysis': label, 'k': 0}
+    estimate = result['random']
+    return {
+        'Analysis': label,
+        'k': result['k'],
+        'Estimate (RE)': round(format_effect(estimate, measure), 4),
+        '95% CI': f"{format_effect(estimate - Z_95 * result['random_se'], measure):.4f} to "
+                  f"{format_effect(estimate + Z_95 * result['random_se'], measure):.4f}",
+        'Estimate (FE)': round(format_effect(result['fixed'], measure), 4),
+        'tau²': round(result['tau2'], 4),
+        'I² (%)': round(result['i2'], 1),
+        'p (RE)': round(result['random_p_value'], 4)
+    }
+
+# Cumulative analyses by publication year
+def _last_index_per_year(sorted_years):
+    """Index of the last study of each publication year in a year-sorted array"""
+    unique_years = np.unique(sorted_years)
+    return unique_years, np.searchsorted(sorted_years, unique_years, side='right') - 1
+
+def cumulative_quality_trend(studies):
+    """Running quality score and Good/Fair/Poor mix as studies accumulate by publication year.
+
+    One stable sort, then prefix sums; each cumulative point is read off the
+    prefix arrays in O(1).
+    """
+    if not studies:
+        return None
+    years = np.array([s['publication_year'] for s in studies])
+    order = np.argsort(years, kind='stable')
+    sorted_years = years[order]
+    stars = np.array([s['total_stars'] for s in studies], dtype=float)[order]
+    max_stars = np.array([get_max_stars(s['study_type']) for s in studies], dtype=float)[order]
+    quality = np.array(quality_labels(studies))[order]
+    
+    cum_stars = np.cumsum(stars)
+    cum_max = np.cumsum(max_stars)
+    cum_good = np.cumsum(quality == "Good Quality")
+    cum_fair = np.cumsum(quality == "Fair Quality")
+    cum_poor = np.cumsum(quality == "Poor Quality")
+    
+    unique_years, last = _last_index_per_year(sorted_years)
+    n = last + 1
+    return pd.DataFrame({
+        'Studies': n,
+        'Pooled Quality Score %': cum_stars[last] / cum_max[last] * 100,
+        'Good %': cum_good[last] / n * 100,
+        'Fair %': cum_fair[last] / n * 100,
+        'Poor %': cum_poor[last] / n * 100
+    }, index=pd.Index(unique_years, name='Publication Year'))
+
+def cumulative_meta_analysis(studies, outcome=None, measure=None):
+    """Running fixed-effect estimate, tau² and I² by publication year from prefix sums"""
+    arrays = extract_effect_arrays(studies, outcome, measure)
+    if len(arrays['yi']) == 0:
+        return None
+    years = np.array([studies[idx]['publication_year'] for idx in arrays['indices']])
+    order = np.argsort(years, kind='stable')
+    sorted_years = years[order]
+    yi = arrays['yi'][order]
+    w = 1.0 / arrays['vi'][order]
+    
+    cum_w = np.cumsum(w)
+    cum_wy = np.cumsum(w * yi)
+    cum_wy2 = np.cumsum(w * yi ** 2)
+    cum_w2 = np.cumsum(w ** 2)
+    
+    unique_years, last = _last_index_per_year(sorted_years)
+    k = last + 1
+    sum_w, sum_wy = cum_w[last], cum_wy[last]
+    fixed = sum_wy / sum_w
+    q = np.maximum(0.0, cum_wy2[last] - sum_wy ** 2 / sum_w)
+    c = sum_w - cum_w2[last] / sum_w
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tau2 = np.where((k > 1) & (c > 0), np.maximum(0.0, (q - (k - 1)) / c), 0.0)
+        i2 = np.where(q > 0, np.maximum(0.0, (q - (k - 1)) / q * 100), 0.0)
+    se = np.sqrt(1.0 / sum_w)
+    measure = arrays['measure']
+    return pd.DataFrame({
+        'Studies': k,
+        'Pooled Estimate (FE)': [format_effect(v, measure) for v in fixed],
+        'Lower 95% CI': [format_effect(v, measure) for v in fixed - Z_95 * se],
+        'Upper 95% CI': [format_effect(v, measure) for v in fixed + Z_95 * se],
+        'tau²': tau2,
+        'I² (%)': i2
+    }, index=pd.Index(unique_years, name='Publication Year'))
+
+# Stratified analytics cube
+CUBE_DIMENSIONS = {
+    'study_type': "Study Type",
+    'year_band': "Year Band",
+    'country': "Country",
+    'quality_rating': "Quality",
+    'population': "Population",
+    'funding': "Funding",
+    'sample_size_band': "Sample Size"
+}
+CUBE_DOMAINS = ["Selection", "Comparability", "Outcome/Exposure"]
+SAMPLE_SIZE_BANDS = [(0, "Not reported"), (1, "<100"), (100, "100–999"), (1000, "1,000–9,999"), (10000, "≥10,000")]
+
+def _year_band(year, width=5):
+    start = (int(year) // width) * width
+    return f"{start}–{start + width - 1}"
+
+def _sample_size_band(sample_size):
+    label = SAMPLE_SIZE_BANDS[0][1]
+    for lower, band in SAMPLE_SIZE_BANDS:
+        if (sample_size or 0) >= lower:
+            label = band
+    return label
+
+def _dimension_value(value):
+    value = str(value).strip() if value is not None else ""
+    return value or "Not reported"
+
+def _domain_star_columns(domain_scores):
+    """Per-domain stars and maxima, with Outcome and Exposure folded into one column"""
+    outcome_scores = domain_scores.get('Outcome', domain_scores.get('Exposure', {'stars': 0, 'max_stars': 0}))
+    return {
+        'Selection_stars': domain_scores.get('Selection', {}).get('stars', 0),
+        'Selection_max': domain_scores.get('Selection', {}).get('max_stars', 0),
+        'Comparability_stars': domain_scores.get('Comparability', {}).get('stars', 0),
+        'Comparability_max': domain_scores.get('Comparability', {}).get('max_stars', 0),
+        'Outcome/Exposure_stars': outcome_scores['stars'],
+        'Outcome/Exposure_max': outcome_scores['max_stars']
+    }
+
+def build_score_frame(studies):
+    """One row per study with its metadata dimensions and per-domain stars (unlabelled, see get_score_frame)"""
+    rows = []
+    for study in studies:
+        domain_scores = calculate_domain_scores(study)
+        rows.append({
+            'study_id': study.get('study_id'),
+            'study_type': study['study_type'],
+            'publication_year': study['publication_year'],
+            'year_band': _year_band(study['publication_year']),
+            'country': _dimension_value(study.get('country')),
+            'population': _dimension_value(study.get('population')),
+            'funding': _dimension_value(study.get('funding')),
+            'sample_size_band': _sample_size_band(study.get('sample_size')),
+            'total_stars': study['total_stars'],
+            'max_stars': sum(scores['max_stars'] for scores in domain_scores.values()),
+            **_domain_star_columns(domain_scores)
+        })
+    return pd.DataFrame(rows)
+
+def build_analytics_cube(score_frame):
+    """Pre-aggregate the score frame over every combination of the cube dimensions"""
+    frame = score_frame.copy()
+    frame['studies'] = 1
+    for quality in ["Good Quality", "Fair Quality", "Poor Quality"]:
+        frame[quality] = (frame['quality_rating'] == quality).astype(int)
+    star_columns = [f"stars_{n}" for n in range(int(frame['max_stars'].max()) + 1)]
+    frame[star_columns] = (frame['total_stars'].to_numpy()[:, None] == np.arange(len(star_columns))).astype(int)
+    measures = ['studies', 'total_stars', 'max_stars', "Good Quality", "Fair Quality", "Poor Quality"] + \
+        [f"{domain}_{part}" for domain in CUBE_DOMAINS for part in ("stars", "max")] + star_columns
+    return frame.groupby(list(CUBE_DIMENSIONS), observed=True)[measures].sum().reset_index()
+
+def get_score_frame():
+    """Score frame for the current portfolio, labelled under the active quality scheme.
+
+    Studies are rescored only after a change; a scheme switch relabels the cached frame
+    in one vectorized pass and rebuilds the cube from it.
+    """
+    cached = st.session_state.derived_caches.get('score_frame_cache')
+    if cached is None or cached['revision'] != st.session_state.portfolio_revision:
+        cached = {'revision': st.session_state.portfolio_revision, 'base': build_score_frame(st.session_state.studies)}
+        st.session_state.derived_caches['score_frame_cache'] = cached
+    scheme = get_quality_scheme()
+    if cached.get('scheme') != scheme:
+        frame = cached['base']
+        if len(frame):
+            frame = frame.assign(quality_rating=classify_quality(frame, scheme))
+        cached.update(scheme=scheme, frame=frame, cube=build_analytics_cube(frame) if len(frame) else None)
+    return cached['frame']
+
+def get_analytics_cube():
+    get_score_frame()
+    return st.session_state.derived_caches['score_frame_cache']['cube']
+
+def slice_cube(cube, filters):
+    """Select cube cells matching {dimension: [values]}; empty selections mean all values"""
+    mask = np.ones(len(cube), dtype=bool)
+    for dimension, values in filters.items():
+        if values:
+            mask &= cube[dimension].isin(values).to_numpy()
+    return cube[mask]
+
+def summarise_cube_slice(cells):
+    """Domain averages, quality mix and star distribution of a cube slice"""
+    totals = cells.drop(columns=list(CUBE_DIMENSIONS)).sum()
+    n = int(totals['studies'])
+    if n == 0:
+        return None
+    star_columns = [c for c in totals.index if c.startswith('stars_')]
+    return {
+        'studies': n,
+        'overall_quality_score': float(totals['total_stars'] / totals['max_stars'] * 100) if totals['max_stars'] else 0.0,
+        'domain_averages': {
+            domain: float(totals[f"{domain}_stars"] / totals[f"{domain}_max"] * 100) if totals[f"{domain}_max"] else 0.0
+            for domain in CUBE_DOMAINS
+        },
+        'quality_counts': {q: int(totals[q]) for q in ["Good Quality", "Fair Quality", "Poor Quality"]},
+        'star_distribution': {int(c.split('_')[1]): int(totals[c]) for c in star_columns if totals[c]}
+    }
+
+def rollup_cube(cells, dimension):
+    """Aggregate a slice along one dimension for a drill-down table"""
+    grouped = cells.groupby(dimension, observed=True).sum(numeric_only=True)
+    table = pd.DataFrame({
+        'Studies': grouped['studies'],
+        'Quality Score %': grouped['total_stars'] / grouped['max_stars'] * 100,
+        'Good %': grouped['Good Quality'] / grouped['studies'] * 100,
+        'Fair %': grouped['Fair Quality'] / grouped['studies'] * 100,
+        'Poor %': grouped['Poor Quality'] / grouped['studies'] * 100
+    })
+    for domain in CUBE_DOMAINS:
+        table[f"{domain} %"] = grouped[f"{domain}_stars"] / grouped[f"{domain}_max"].where(grouped[f"{domain}_max"] > 0) * 100
+    return table.round(1).sort_values('Studies', ascending=False)
+
+def quality_by_year(score_frame):
+    """Good/Fair/Poor counts per publication year"""
+    table = pd.crosstab(score_frame['publication_year'], score_frame['quality_rating'])
+    return table.reindex(columns=["Good Quality", "Fair Quality", "Poor Quality"], fill_value=0) \
+        .rename(columns=lambda quality: quality.split()[0]).sort_index()
+
+def domain_percentages(score_frame):
+    """Per-study percentage of each domain's maximum; NaN where a rubric lacks the domain"""
+    return pd.DataFrame({
+        domain: score_frame[f"{domain}_stars"] / score_frame[f"{domain}_max"].where(score_frame[f"{domain}_max"] > 0) * 100
+        for domain in CUBE_DOMAINS
+    })
+
+# Quality threshold schemes
+QUALITY_COLORS = {"Good Quality": "#28a745", "Fair Quality": "#ffc107", "Poor Quality": "#dc3545"}
+
+QUALITY_SCHEMES = {
+    "standard": "Standard (rubric cut-offs, e.g. 7/5 of 9 stars)",
+    "strict": "Strict (Good ≥ 85%, Fair ≥ 65% of maximum stars)",
+    "ahrq": "AHRQ domain-based conversion"
+}
+
+def get_quality_scheme():
+    return st.session_state.get('quality_scheme', "standard")
+
+def classify_quality(columns, scheme):
+    """Good/Fair/Poor labels for whole score columns at once (a score frame or a dict of arrays).
+
+    The AHRQ conversion is stated for 4/2/3-star domains; domain cut-offs are taken relative
+    to each rubric's domain maxima so it reproduces the published rule on the standard NOS.
+    """
+    total = np.asarray(columns['total_stars'], dtype=float)
+    if scheme == "ahrq":
+        selection = np.asarray(columns['Selection_stars'], dtype=float)
+        selection_max = np.asarray(columns['Selection_max'], dtype=float)
+        comparability = np.asarray(columns['Comparability_stars'], dtype=float)
+        outcome = np.asarray(columns['Outcome/Exposure_stars'], dtype=float)
+        outcome_max = np.asarray(columns['Outcome/Exposure_max'], dtype=float)
+        rest_ok = (comparability >= 1) & (outcome >= outcome_max - 1)
+        good = rest_ok & (selection >= selection_max - 1)
+        fair = rest_ok & (selection >= selection_max - 2)
+    elif scheme == "strict":
+        max_stars = np.asarray(columns['max_stars'], dtype=float)
+        good = total >= np.ceil(max_stars * 0.85)
+        fair = total >= np.ceil(max_stars * 0.65)
+    else:
+        study_types = np.asarray(columns['study_type'])
+        good_cut = np.empty(len(total))
+        fair_cut = np.empty(len(total))
+        for study_type in np.unique(study_types):
+            thresholds = compile_rubric(study_type)['thresholds']
+            mask = study_types == study_type
+            good_cut[mask] = thresholds['good']
+            fair_cut[mask] = thresholds['fair']
+        good = total >= good_cut
+        fair = total >= fair_cut
+    return np.select([good, fair], ["Good Quality", "Fair Quality"], "Poor Quality")
+
+def rate_assessment_quality(assessment, study_type):
+    """Quality label and colour of a single assessment under the active scheme"""
+    domain_scores = calculate_domain_scores({'study_type': study_type, 'assessment': assessment})
+    columns = {name: np.array([value]) for name, value in _domain_star_columns(domain_scores).items()}
+    columns['study_type'] = np.array([study_type])
+    columns['total_stars'] = np.array([sum(scores['stars'] for scores in domain_scores.values())])
+    columns['max_stars'] = np.array([sum(scores['max_stars'] for scores in domain_scores.values())])
+    label = str(classify_quality(columns, get_quality_scheme())[0])
+    return label, QUALITY_COLORS[label]
+
+def quality_columns(studies):
+    """The score columns classify_quality reads, computed from each study's answers"""
+    domain_rows = [calculate_domain_scores(study) for study in studies]
+    star_rows = [_domain_star_columns(domain_scores) for domain_scores in domain_rows]
+    columns = {
+        'study_type': np.array([study['study_type'] for study in studies]),
+        'total_stars': np.array([study['total_stars'] for study in studies]),
+        'max_stars': np.array([sum(scores['max_stars'] for scores in domain_scores.values())
+                               for domain_scores in domain_rows])
+    }
+    for name in _domain_star_columns({}):
+        columns[name] = np.array([row[name] for row in star_rows])
+    return columns
+
+def quality_labels(studies, scheme=None):
+    """Good/Fair/Poor label of each study under a scheme (the active one by default).
+
+    Labels are never stored on the studies: they follow from the stars, so a scheme switch
+    or a rescored study can't leave one stale.  The portfolio itself is read off the score frame.
+    """
+    if not studies:
+        return []
+    if scheme is None:
+        scheme = get_quality_scheme()
+        if studies is st.session_state.get('studies'):
+            return get_score_frame()['quality_rating'].tolist()
+    return classify_quality(quality_columns(studies), scheme).tolist()
+
+def study_quality(study, scheme=None):
+    return quality_labels([study], scheme)[0]
+
+def portfolio_quality():
+    """{study_id: label} for the portfolio under the active scheme"""
+    return dict(zip((study['study_id'] for study in st.session_state.studies), quality_labels(st.session_state.studies)))
+
+def sync_quality_scheme():
+    """Drop the cached cards, which embed a label, when this session switches scheme"""
+    scheme = get_quality_scheme()
+    if st.session_state.get('rendered_scheme') != scheme:
+        st.session_state.card_cache.clear()
+        st.session_state.rendered_scheme = scheme
+
+# Outcome-level assessments
+# A study's `assessment` holds the shared answers plus those for its primary outcome;
+# `outcome_assessments` maps further outcome names to their outcome-domain answers only.
+OUTCOME_DOMAINS = ("Outcome", "Exposure")
+PRIMARY_OUTCOME = "Primary outcome"
+
+def primary_outcome_name(study):
+    return study.get('primary_outcome') or PRIMARY_OUTCOME
+
+def study_outcomes(study):
+    return [primary_outcome_name(study)] + list(study.get('outcome_assessments', {}))
+
+def list_outcomes(studies):
+    """Outcome names in first-seen order across the portfolio"""
+    return list(dict.fromkeys(name for study in studies for name in study_outcomes(study)))
+
+def outcome_assessment(study, outcome):
+    """Answers for one outcome: its own outcome-domain answers layered over the shared ones"""
+    if outcome == primary_outcome_name(study):
+        return study['assessment']
+    return ChainMap(study['outcome_assessments'][outcome], study['assessment'])
+
+def score_outcomes(study):
+    """Domain scores for every outcome of a study, scoring the shared domains only once"""
+    rubric = compile_rubric(study['study_type'])
+    shared = [0] * len(rubric['domains'])
+    get = study['assessment'].get
+    for name, stars, domain_index in rubric['program']:
+        if domain_index not in rubric['outcome_domains']:
+            shared[domain_index] += stars.get(get(name), 0)
+    outcome_program = [step for step in rubric['program'] if step[2] in rubric['outcome_domains']]
+    
+    results = {}
+    for outcome in study_outcomes(study):
+        get = outcome_assessment(study, outcome).get
+        domain_stars = list(shared)
+        for name, stars, domain_index in outcome_program:
+            domain_stars[domain_index] += stars.get(get(name), 0)
+        results[outcome] = {
+            domain_name: {
+                'stars': stars,
+                'max_stars': max_stars,
+                'percentage': (stars / max_stars * 100) if max_stars > 0 else 0
+            }
+            for domain_name, stars, max_stars in zip(rubric['domains'], domain_stars, rubric['domain_max'])
+        }
+    return results
+
+def build_outcome_views(studies, outcome):
+    """Lightweight per-outcome stand-ins for the studies that report an outcome.
+
+    Each view is a shallow copy whose `assessment` is a ChainMap over the stored answers,
+    so the existing visualisations and tables work per outcome without duplicating data;
+    their quality labels are derived from the per-outcome stars like any study's.
+    """
+    views = []
+    for study in studies:
+        if outcome not in study_outcomes(study):
+            continue
+        domain_scores = score_outcomes(study)[outcome]
+        view = dict(study, assessment=outcome_assessment(study, outcome), outcome=outcome,
+                    total_stars=sum(scores['stars'] for scores in domain_scores.values()))
+        views.append(view)
+    return views
+
+def get_outcome_views(outcome):
+    """Per-outcome views of the portfolio, cached per revision"""
+    key = st.session_state.portfolio_revision
+    cache = st.session_state.derived_caches.get('outcome_view_cache')
+    if cache is None or cache['key'] != key:
+        cache = st.session_state.derived_caches['outcome_view_cache'] = {'key': key}
+    if outcome not in cache:
+        cache[outcome] = build_outcome_views(st.session_state.studies, outcome)
+    return cache[outcome]
+
+def show_outcome_assessment_form(study_type, outcomes):
+    """Outcome-domain questions for each additional outcome; shared domains are answered once above"""
+    outcome_domains = {name: domain for name, domain in NOS_CRITERIA[study_type].items() if name in OUTCOME_DOMAINS}
+    if not outcomes or not outcome_domains:
+        return {}
+    
+    st.markdown("### 🎯 Outcome-Specific Answers")
+    st.caption("Selection and comparability answers above apply to every outcome.")
+    outcome_answers = {}
+    for tab, outcome in zip(timed_tabs(outcomes, key=f"outcome_tabs_{study_type}"), outcomes):
+        with tab:
+            answers = {}
+            for domain_name, domain in outcome_domains.items():
+                for criterion_name, criterion in domain.items():
+                    option_keys = list(criterion['options'])
+                    selected = st.radio(
+                        criterion['question'],
+                        option_keys,
+                        format_func=lambda key, criterion=criterion: (
+                            f"{criterion['options'][key]} {'★' * criterion['stars'].get(key, 0) or '☆'}"),
+                        key=f"{criterion_name}_{domain_name}_{outcome}",
+                        on_change=time_criterion_answer, args=(criterion_name,)
+                    )
+                    answers[criterion_name] = selected
+            outcome_answers[outcome] = answers
+    return outcome_answers
+
+def export_outcome_assessments(studies_data):
+    """Long-format export with one row per study and outcome"""
+    rows = []
+    ratings = {}
+    for study in studies_data:
+        criteria = NOS_CRITERIA[study['study_type']]
+        for outcome, domain_scores in score_outcomes(study).items():
+            answers = outcome_assessment(study, outcome)
+            if outcome not in ratings:
+                views = get_outcome_views(outcome)
+                ratings[outcome] = dict(zip((view['study_id'] for view in views), quality_labels(views)))
+            row = {
+                'Study_Name': study['study_name'],
+                'Publication_Year': study['publication_year'],
+                'Study_Type': study['study_type'],
+                'Outcome': outcome,
+                'Total_Stars': sum(scores['stars'] for scores in domain_scores.values()),
+                'Max_Possible_Stars': get_max_stars(study['study_type']),
+                'Quality_Rating': ratings[outcome].get(study['study_id'])
+            }
+            for domain_name, scores in domain_scores.items():
+                row[f'{domain_name}_Stars'] = scores['stars']
+            for domain_name, domain in criteria.items():
+                if domain_name in OUTCOME_DOMAINS:
+                    for criterion_name in domain:
+                        row[f'{domain_name}_{criterion_name}'] = answers.get(criterion_name, 'Not assessed')
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+# Criterion-level response analytics
+def get_criterion_layout(study_type):
+    """Criteria of a study type in form order, with column offsets into the flat option axis"""
+    criteria = []
+    offset = 0
+    for domain_name, domain in NOS_CRITERIA[study_type].items():
+        for criterion_name, criterion in domain.items():
+            options = list(criterion['options'].keys())
+            criteria.append({
+                'domain': domain_name,
+                'criterion': criterion_name,
+                'question': criterion['question'],
+                'options': options,
+                'stars': [criterion['stars'].get(option, 0) for option in options],
+                'offset': offset
+            })
+            offset += len(options)
+    return {'criteria': criteria, 'n_options': offset}
+
+def encode_assessments(studies, study_type):
+    """Encode each study's responses as option indices (N x criteria, -1 when unanswered)"""
+    layout = get_criterion_layout(study_type)
+    lookups = [{option: idx for idx, option in enumerate(c['options'])} for c in layout['criteria']]
+    names = [c['criterion'] for c in layout['criteria']]
+    codes = np.full((len(studies), len(names)), -1, dtype=np.int16)
+    for row, study in enumerate(studies):
+        assessment = study['assessment']
+        codes[row] = [lookup.get(assessment.get(name), -1) for name, lookup in zip(names, lookups)]
+    return codes, layout
+
+def get_encoded_assessments(study_type):
+    """Encoded responses and row positions of one study type, cached per portfolio revision"""
+    cache = st.session_state.derived_caches.get('encoding_cache')
+    if cache is None or cache['revision'] != st.session_state.portfolio_revision:
+        cache = st.session_state.derived_caches['encoding_cache'] = {'revision': st.session_state.portfolio_revision}
+    if study_type not in cache:
+        positions = np.array([idx for idx, s in enumerate(st.session_state.studies)
+                              if s['study_type'] == study_type], dtype=int)
+        codes, layout = encode_assessments([st.session_state.studies[idx] for idx in positions], study_type)
+        cache[study_type] = (codes, layout, positions)
+    return cache[study_type]
+
+def criterion_frequency_matrix(codes, layout, mask=None):
+    """Count every criterion × option response in a single bincount over the encoded matrix"""
+    if mask is not None:
+        codes = codes[mask]
+    offsets = np.array([c['offset'] for c in layout['criteria']], dtype=np.int64)
+    flat = codes.astype(np.int64) + offsets
+    counts = np.bincount(flat[codes >= 0], minlength=layout['n_options'])
+    return counts, len(codes)
+
+def criterion_frequency_table(counts, n_studies, layout):
+    rows = []
+    for criterion in layout['criteria']:
+        for idx, option in enumerate(criterion['options']):
+            count = int(counts[criterion['offset'] + idx])
+            rows.append({
+                'Domain': criterion['domain'],
+                'Criterion': criterion['criterion'],
+                'Response': option,
+                'Stars': criterion['stars'][idx],
+                'Studies': count,
+                'Share %': round(count / n_studies * 100, 1) if n_studies else 0.0
+            })
+    return pd.DataFrame(rows)
+
+def create_criterion_heatmap(counts, n_studies, layout, study_type):
+    """Criterion × option heatmap; starred responses shade green, unstarred responses shade red"""
+    html_content = f'''
+    <div style="background: white; padding: 20px; border-radius: 10px; box-shadow: 0 4px 8px rgba(0,0,0,0.1);">
+        <h3 style="text-align: center; color: #2c3e50; margin-bottom: 20px; font-family: Arial, sans-serif;">
+            🧬 Criterion Response Frequencies ({study_type}, n={n_studies})
+        </h3>
+        <table style="width: 100%; border-collapse: collapse; font-family: Arial, sans-serif; font-size: 12px;">
+    '''
+    for criterion in layout['criteria']:
+        options = NOS_CRITERIA[study_type][criterion['domain']][criterion['criterion']]['options']
+        html_content += f'<tr><td style="border: 1px solid #ddd; padding: 8px; font-weight: bold; min-width: 200px;">{criterion["question"]}</td>'
+        for idx, option in enumerate(criterion['options']):
+            share = counts[criterion['offset'] + idx] / n_studies if n_studies else 0
+            rgb = "40, 167, 69" if criterion['stars'][idx] > 0 else "220, 53, 69"
+            text_color = "white" if share >= 0.5 else "black"
+            html_content += f'''
+            <td style="border: 1px solid #ddd; padding: 6px; background: rgba({rgb}, {0.1 + 0.9 * share:.2f}); color: {text_color};" title="{options[option]}">
+                <div style="font-weight: bold;">{share * 100:.0f}%</div>
+                <div>{option}</div>
+            </td>'''
+        html_content += '</tr>'
+    html_content += '</table></div>'
+    return html_content
+
+def top_criterion_weaknesses(studies_data, limit=5, min_share=0.3):
+    """Zero-star responses chosen by the largest share of studies, across study types"""
+    weaknesses = []
+    for study_type in NOS_CRITERIA:
+        subset = [s for s in studies_data if s['study_type'] == study_type]
+        if not subset:
+            continue
+        codes, layout = encode_assessments(subset, study_type)
+        counts, n_studies = criterion_frequency_matrix(codes, layout)
+        for criterion in layout['criteria']:
+            zero_star = [idx for idx, stars in enumerate(criterion['stars']) if stars == 0]
+            share = counts[[criterion['offset'] + idx for idx in zero_star]].sum() / n_studies
+            if share >= min_share:
+                weaknesses.append((share, study_type, criterion['question'], n_studies))
+    return sorted(weaknesses, reverse=True)[:limit]
+
+# Study similarity and clustering
+SIMILARITY_BLOCK_SIZE = 256
+SIMILARITY_MATRIX_LIMIT = int(os.environ.get("NOS_SIMILARITY_MATRIX_LIMIT", "5000"))
+
+def domain_profile_matrix(score_frame):
+    """Per-domain fraction of available stars (N x domains), 0 where a domain has no stars"""
+    stars = score_frame[[f"{domain}_stars" for domain in CUBE_DOMAINS]].to_numpy(dtype=float)
+    maxima = score_frame[[f"{domain}_max" for domain in CUBE_DOMAINS]].to_numpy(dtype=float)
+    return np.divide(stars, maxima, out=np.zeros_like(stars), where=maxima > 0)
+
+def pairwise_distances(rows, columns=None, metric="euclidean", block_size=SIMILARITY_BLOCK_SIZE):
+    """Distances between every row pair, broadcast one block of rows at a time to bound memory.
+
+    ``euclidean`` compares domain profiles; ``hamming`` is the share of differing criterion responses.
+    """
+    columns = rows if columns is None else columns
+    distances = np.empty((len(rows), len(columns)), dtype=np.float32)
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size, None, :]
+        if metric == "hamming":
+            distances[start:start + block_size] = (block != columns[None, :, :]).mean(axis=2)
+        else:
+            distances[start:start + block_size] = np.sqrt(((block - columns[None, :, :]) ** 2).sum(axis=2))
+    return distances
+
+def get_similarity_data():
+    """Domain profiles and, for portfolios up to the matrix limit, their full distance matrix"""
+    cached = st.session_state.derived_caches.get('similarity_cache')
+    if cached is None or cached['revision'] != st.session_state.portfolio_revision:
+        profiles = domain_profile_matrix(get_score_frame())
+        cached = st.session_state.derived_caches['similarity_cache'] = {
+            'revision': st.session_state.portfolio_revision,
+            'profiles': profiles,
+            'distances': pairwise_distances(profiles) if len(profiles) <= SIMILARITY_MATRIX_LIMIT else None
+        }
+    return cached
+
+def most_similar_studies(index, limit=5, metric="euclidean"):
+    """Nearest studies to one study as (position, distance) pairs, closest first.
+
+    Criterion-response (Hamming) similarity only compares studies of the same type.
+    """
+    if metric == "hamming":
+        codes, _, positions = get_encoded_assessments(st.session_state.studies[index]['study_type'])
+        row = int(np.flatnonzero(positions == index)[0])
+        distances = pairwise_distances(codes[[row]], codes, metric="hamming")[0]
+    else:
+        similarity = get_similarity_data()
+        positions = np.arange(len(similarity['profiles']))
+        row = index
+        if similarity['distances'] is not None:
+            distances = similarity['distances'][row]
+        else:
+            distances = pairwise_distances(similarity['profiles'][[row]], similarity['profiles'])[0]
+    distances = distances.astype(float)
+    distances[row] = np.inf
+    limit = min(limit, len(distances) - 1)
+    if limit <= 0:
+        return []
+    nearest = np.argpartition(distances, limit - 1)[:limit]
+    nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+    return [(int(positions[i]), float(distances[i])) for i in nearest]
+
+def cluster_profiles(profiles, n_clusters):
+    """Average-linkage clustering of domain profiles, numbered 1..k from largest cluster.
+
+    Studies sharing a profile are merged up front, so the agglomeration runs over the
+    distinct profiles (a few hundred at most) rather than over every study.
+    """
+    unique, inverse, counts = np.unique(profiles.round(4), axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    distances = pairwise_distances(unique).astype(float)
+    np.fill_diagonal(distances, np.inf)
+    sizes = counts.astype(float)
+    labels = np.arange(len(unique))
+    for _ in range(len(unique) - min(n_clusters, len(unique))):
+        i, j = np.unravel_index(np.argmin(distances), distances.shape)
+        i, j = min(i, j), max(i, j)
+        merged = (sizes[i] * distances[i] + sizes[j] * distances[j]) / (sizes[i] + sizes[j])
+        distances[i, :] = merged
+        distances[:, i] = merged
+        distances[i, i] = np.inf
+        distances[j, :] = np.inf
+        distances[:, j] = np.inf
+        sizes[i] += sizes[j]
+        labels[labels == j] = i
+    study_labels = labels[inverse]
+    roots, root_counts = np.unique(study_labels, return_counts=True)
+    numbering = {root: number for number, root in enumerate(roots[np.argsort(-root_counts, kind="stable")], 1)}
+    return np.array([numbering[label] for label in study_labels], dtype=int)
+
+# Duplicate detection
+DUPLICATE_TITLE_THRESHOLD = 0.9
+DUPLICATE_BLOCK_LIMIT = 500
+TITLE_STOPWORDS = frozenset(
+    "a an and are as at by for from in into is of on or the to with among between after before "
+    "study studies cohort case control cross sectional patients risk association analysis".split()
+)
+
+def normalise_doi(doi):
+    doi = (doi or "").strip().lower()
+    doi = re.sub(r"^(https?://(dx\.)?doi\.org/|doi:\s*)", "", doi)
+    return doi.rstrip(".")
+
+def normalise_pmid(pmid):
+    digits = re.sub(r"\D", "", str(pmid or ""))
+    return digits.lstrip("0")
+
+def normalise_title(title):
+    return " ".join(re.findall(r"[a-z0-9]+", (title or "").lower()))
+
+def first_author_key(authors):
+    """Lower-case surname of the first listed author ("Smith J, Doe A" -> "smith")"""
+    first = re.split(r";|,| and ", authors or "", maxsplit=1)[0]
+    words = [word for word in re.findall(r"[^\W\d_]+", first.lower()) if len(word) > 1]
+    return words[0] if words else ""
+
+class DuplicateIndex:
+    """Exact DOI/PMID hash indexes plus a blocked fuzzy title matcher.
+
+    Titles are blocked on (publication year, title word) for distinctive words, so only
+    records sharing a word within a year either side are compared with difflib.  Words
+    whose block outgrows DUPLICATE_BLOCK_LIMIT stop being indexed; they are too common
+    to narrow the search.
+    """
+    
+    def __init__(self):
+        self.records = []
+        self.by_doi = {}
+        self.by_pmid = {}
+        self.blocks = {}
+    
+    @staticmethod
+    def _key(study):
+        title = normalise_title(study.get('title') or study.get('study_name'))
+        words = {word for word in title.split() if len(word) > 2 and word not in TITLE_STOPWORDS}
+        try:
+            year = int(study.get('publication_year'))
+        except (TypeError, ValueError):
+            year = None
+        return {
+            'doi': normalise_doi(study.get('doi')),
+            'pmid': normalise_pmid(study.get('pmid')),
+            'title': title,
+            'words': words,
+            'author': first_author_key(study.get('authors')),
+            'year': year
+        }
+    
+    def match(self, study, key=None):
+        """Indexed records that look like the same paper, as (position, reason, score) tuples"""
+        key = key or self._key(study)
+        found = {}
+        if key['doi']:
+            for position in self.by_doi.get(key['doi'], ()):
+                found[position] = ("Same DOI", 1.0)
+        if key['pmid']:
+            for position in self.by_pmid.get(key['pmid'], ()):
+                found.setdefault(position, ("Same PMID", 1.0))
+        
+        shared = {}
+        years = (key['year'] - 1, key['year'], key['year'] + 1) if key['year'] is not None else (None,)
+        for word in key['words']:
+            for year in years:
+                for position in self.blocks.get((year, word), ()):
+                    shared[position] = shared.get(position, 0) + 1
+        needed = max(1, len(key['words']) // 2)
+        for position, count in shared.items():
+            if position in found or count < needed:
+                continue
+            other = self.records[position]
+            matcher = difflib.SequenceMatcher(None, key['title'], other['title'], autojunk=False)
+            if matcher.real_quick_ratio() < DUPLICATE_TITLE_THRESHOLD or matcher.quick_ratio() < DUPLICATE_TITLE_THRESHOLD:
+                continue
+            score = matcher.ratio()
+            same_author = bool(key['author']) and key['author'] == other['author']
+            if score >= DUPLICATE_TITLE_THRESHOLD and (same_author or score >= 0.97):
+                found[position] = ("Similar title" + (" and first author" if same_author else ""), score)
+        return sorted(((position, reason, score) for position, (reason, score) in found.items()),
+                      key=lambda item: -item[2])
+    
+    def add(self, study, key=None):
+        key = key or self._key(study)
+        position = len(self.records)
+        self.records.append(key)
+        if key['doi']:
+            self.by_doi.setdefault(key['doi'], []).append(position)
+        if key['pmid']:
+            self.by_pmid.setdefault(key['pmid'], []).append(position)
+        for word in key['words']:
+            block = self.blocks.setdefault((key['year'], word), [])
+            if len(block) < DUPLICATE_BLOCK_LIMIT:
+                block.append(position)
+        return position
+
+def find_duplicate_pairs(studies):
+    """Batch scan: every candidate pair once, as dicts with positions, reason and score"""
+    index = DuplicateIndex()
+    pairs = []
+    for position, study in enumerate(studies):
+        key = index._key(study)
+        for other, reason, score in index.match(study, key):
+            pairs.append({'first': other, 'second': position, 'reason': reason, 'score': score})
+        index.add(study, key)
+    return pairs
+
+def get_duplicate_index():
+    """Index over the current portfolio (positions match st.session_state.studies), rebuilt per revision"""
+    cached = st.session_state.derived_caches.get('duplicate_index')
+    if cached is None or cached[0] != st.session_state.portfolio_revision:
+        index = DuplicateIndex()
+        for study in st.session_state.studies:
+            index.add(study)
+        cached = st.session_state.derived_caches['duplicate_index'] = (st.session_state.portfolio_revision, index)
+    return cached[1]
+
+def merge_duplicate_studies(keep, drop):
+    """Fill the kept study's empty fields from its duplicate, then remove the duplicate"""
+    merged = dict(keep)
+    for field, value in drop.items():
+        if field not in ('study_id', 'assessment') and value not in (None, "", 0) and merged.get(field) in (None, "", 0):
+            merged[field] = value
+    notes = [text for text in (keep.get('notes'), drop.get('notes')) if text]
+    if len(notes) == 2 and notes[0] != notes[1]:
+        merged['notes'] = f"{notes[0]}\n\n[Merged from duplicate] {notes[1]}"
+    with undo_step(f"Merge {drop['study_name']} into {keep['study_name']}"):
+        update_study(merged)
+        remove_study(drop)
+    return merged
+
+# Bibliographic import
+# Parsers are generators over a binary file object and hold at most one record at a time;
+# XML formats use iterparse and clear each finished record from the tree.  Uploads are
+# streamed one after another straight into the queue, so no file is ever held as a list.
+IMPORT_FORMATS = {
+    "ris": "RIS (Zotero, Rayyan, EndNote, Mendeley)",
+    "medline": "MEDLINE / PubMed (.nbib)",
+    "bibtex": "BibTeX",
+    "pubmed_xml": "PubMed XML",
+    "endnote_xml": "EndNote XML"
+}
+RIS_TAG = re.compile(r"^([A-Z][A-Z0-9])  -(?: (.*))?$")
+MEDLINE_TAG = re.compile(r"^([A-Z][A-Z0-9]{1,3}) *- ?(.*)$")
+BIBTEX_FIELD = re.compile(r"(\w+)\s*=\s*")
+
+def _format_author(name):
+    """"Smith, John A." -> "Smith JA", matching the form's author style"""
+    if "," not in name:
+        return name.strip()
+    surname, given = name.split(",", 1)
+    initials = "".join(part[0] for part in re.findall(r"[^\W\d_]+", given))
+    return f"{surname.strip()} {initials}".strip()
+
+def _bibliographic_record(title, authors, journal, year, doi="", pmid="", source=""):
+    """Placeholder study metadata waiting in the assessment queue"""
+    authors = [_format_author(author) for author in authors if author and author.strip()]
+    match = re.search(r"\d{4}", str(year or ""))
+    year = int(match.group()) if match else None
+    surname = first_author_key(authors[0] if authors else "").title()
+    label = f"{surname} et al." if len(authors) > 1 else surname
+    if year is not None:
+        label = f"{label} {year}"
+    return {
+        'study_name': label if surname else (title or "Untitled")[:80],
+        'title': (title or "").strip(),
+        'authors': ", ".join(authors),
+        'journal': (journal or "").strip(),
+        'publication_year': year,
+        'doi': normalise_doi(doi),
+        'pmid': normalise_pmid(pmid),
+        'source': source
+    }
+
+def _text_lines(stream):
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace")
+
+def parse_ris(stream, source=""):
+    record = None
+    last_tag = None
+    for line in _text_lines(stream):
+        match = RIS_TAG.match(line.rstrip("\r\n"))
+        if not match:
+            # Continuation lines extend the previous tag's value
+            if record is not None and last_tag in record and line.strip():
+                record[last_tag][-1] += " " + line.strip()
+            continue
+        tag, value = match.group(1), (match.group(2) or "").strip()
+        if tag == "TY":
+            record = {}
+        elif tag == "ER":
+            if record is not None:
+                first = lambda *tags: next((record[t][0] for t in tags if t in record), "")
+                pmid = next((v for v in record.get("AN", []) if v.isdigit()), "")
+                yield _bibliographic_record(first("TI", "T1"), record.get("AU", []) + record.get("A1", []),
+                                            first("JO", "JF", "T2", "JA"), first("PY", "Y1", "DA"),
+                                            first("DO"), pmid, source)
+            record = None
+        elif record is not None:
+            record.setdefault(tag, []).append(value)
+        last_tag = tag if record is not None else None
+
+def parse_medline(stream, source=""):
+    """PubMed's MEDLINE text format (.nbib): tagged lines, records start at PMID and end at a blank line"""
+    record = None
+    last_tag = None
+    
+    def finish(record):
+        first = lambda *tags: next((record[t][0] for t in tags if t in record), "")
+        doi = next((value[:-5].strip() for value in record.get("AID", []) + record.get("LID", [])
+                    if value.endswith("[doi]")), "")
+        return _bibliographic_record(first("TI", "BTI"), record.get("AU", []), first("JT", "TA"), first("DP"),
+                                     doi, first("PMID"), source)
+    
+    for line in _text_lines(stream):
+        line = line.rstrip("\r\n")
+        if line.startswith("      ") and record is not None and last_tag in record:
+            # Continuation lines are indented by six spaces
+            record[last_tag][-1] += " " + line.strip()
+            continue
+        match = MEDLINE_TAG.match(line)
+        if not match:
+            if not line.strip() and record:
+                yield finish(record)
+                record = None
+            continue
+        tag, value = match.group(1), match.group(2).strip()
+        if tag == "PMID":
+            if record:
+                yield finish(record)
+            record = {}
+        if record is not None:
+            record.setdefault(tag, []).append(value)
+            last_tag = tag
+    if record:
+        yield finish(record)
+
+def _bibtex_fields(entry):
+    """Field values of one BibTeX entry, honouring nested braces and quoted values"""
+    fields = {}
+    position = entry.find(",") + 1
+    while True:
+        match = BIBTEX_FIELD.search(entry, position)
+        if not match:
+            return fields
+        start = end = match.end()
+        if entry.startswith("{", start):
+            depth = 0
+            for end in range(start, len(entry)):
+                if entry[end] == "{":
+                    depth += 1
+                elif entry[end] == "}":
+                    depth -= 1
+                    if depth == 0:
+                        break
+            value = entry[start + 1:end]
+        elif entry.startswith("\"", start):
+            end = entry.find("\"", start + 1)
+            end = len(entry) if end < 0 else end
+            value = entry[start + 1:end]
+        else:
+            end = entry.find(",", start)
+            end = len(entry) if end < 0 else end
+            value = entry[start:end]
+        position = end + 1
+        fields[match.group(1).lower()] = re.sub(r"[{}]", "", " ".join(value.split()))
+
+def parse_bibtex(stream, source=""):
+    buffer, depth = [], 0
+    for line in _text_lines(stream):
+        if not buffer:
+            if not line.lstrip().startswith("@"):
+                continue
+        buffer.append(line)
+        depth += line.count("{") - line.count("}")
+        if depth <= 0 and any("{" in part for part in buffer):
+            entry = "".join(buffer).strip()
+            buffer, depth = [], 0
+            if re.match(r"@(comment|string|preamble)\b", entry, re.IGNORECASE):
+                continue
+            fields = _bibtex_fields(entry[entry.find("{") + 1:])
+            yield _bibliographic_record(fields.get("title"), re.split(r"\s+and\s+", fields.get("author", "")),
+                                        fields.get("journal") or fields.get("booktitle"), fields.get("year"),
+                                        fields.get("doi"), fields.get("pmid"), source)
+
+def _iter_xml_records(stream, tag):
+    """Yield each finished <tag> element, then clear it and detach it from its parent"""
+    open_elements = []
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            open_elements.append(elem)
+            continue
+        open_elements.pop()
+        if elem.tag == tag:
+            yield elem
+            elem.clear()
+            if open_elements:
+                open_elements[-1].remove(elem)
+
+def parse_pubmed_xml(stream, source=""):
+    for article in _iter_xml_records(stream, "PubmedArticle"):
+        authors = []
+        for author in article.iterfind(".//AuthorList/Author"):
+            name = " ".join(filter(None, [author.findtext("LastName"), author.findtext("Initials")]))
+            authors.append(name or author.findtext("CollectiveName") or "")
+        year = (article.findtext(".//JournalIssue/PubDate/Year") or article.findtext(".//JournalIssue/PubDate/MedlineDate")
+                or article.findtext(".//ArticleDate/Year"))
+        doi = next((node.text for node in article.iterfind(".//ArticleIdList/ArticleId")
+                    if node.get("IdType") == "doi"), "") or next(
+            (node.text for node in article.iterfind(".//ELocationID") if node.get("EIdType") == "doi"), "")
+        title = "".join(article.find(".//ArticleTitle").itertext()) if article.find(".//ArticleTitle") is not None else ""
+        yield _bibliographic_record(title, authors, article.findtext(".//Journal/Title"), year,
+                                    doi, article.findtext(".//MedlineCitation/PMID"), source)
+
+def parse_endnote_xml(stream, source=""):
+    text = lambda node: "".join(node.itertext()).strip() if node is not None else ""
+    for record in _iter_xml_records(stream, "record"):
+        yield _bibliographic_record(
+            text(record.find("titles/title")),
+            [text(author) for author in record.iterfind("contributors/authors/author")],
+            text(record.find("titles/secondary-title")) or text(record.find("periodical/full-title")),
+            text(record.find("dates/year")),
+            text(record.find("electronic-resource-num")),
+            text(record.find("accession-num")),
+            source
+        )
+
+IMPORT_PARSERS = {
+    "ris": parse_ris,
+    "medline": parse_medline,
+    "bibtex": parse_bibtex,
+    "pubmed_xml": parse_pubmed_xml,
+    "endnote_xml": parse_endnote_xml
+}
+
+def detect_import_format(filename, head):
+    """Guess the format from the extension, sniffing the first bytes of text and XML files"""
+    extension = os.path.splitext(filename.lower())[1]
+    if extension == ".bib":
+        return "bibtex"
+    if extension == ".ris":
+        return "ris"
+    if extension == ".nbib" or re.search(rb"^PMID- ", head, re.MULTILINE):
+        return "medline"
+    if b"PubmedArticle" in head:
+        return "pubmed_xml"
+    if b"<record" in head or b"<records" in head:
+        return "endnote_xml"
+    return "ris" if re.search(rb"^TY  - ", head, re.MULTILINE) else None
+
+def parse_bibliography_file(filename, stream):
+    """Records of one uploaded file, yielded one at a time (format detected per file)"""
+    import_format = detect_import_format(filename, stream.read(4096))
+    stream.seek(0)
+    if import_format is None:
+        raise ValueError("unrecognised bibliography format")
+    return IMPORT_PARSERS[import_format](stream, source=filename)
+
+def import_bibliographies(files, errors):
+    """Yield the records of several uploads in upload order, appending a message to errors per bad file.
+
+    A file that fails part-way keeps the records read before the error.
+    """
+    for uploaded in files:
+        count = 0
+        try:
+            for record in parse_bibliography_file(uploaded.name, uploaded):
+                count += 1
+                yield record
+        except (ValueError, ET.ParseError, UnicodeError) as exc:
+            errors.append(f"{uploaded.name}: {exc}" + (f" (after {count} records)" if count else ""))
+            continue
+        if count == 0:
+            errors.append(f"{uploaded.name}: no records found")
+
+def enqueue_records(records, skip_duplicates=True):
+    """Add imported records to the assessment queue, optionally skipping studies already present"""
+    index = DuplicateIndex()
+    for study in list(st.session_state.studies) + st.session_state.assessment_queue:
+        index.add(study)
+    fresh, skipped = [], 0
+    for record in records:
+        key = index._key(record)
+        if skip_duplicates and index.match(record, key):
+            skipped += 1
+            continue
+        index.add(record, key)
+        record['queue_id'] = uuid.uuid4().hex
+        fresh.append(record)
+    if fresh:
+        change_queue(lambda queue, roster: queue.extend(fresh))
+    return len(fresh), skipped
+
+# PDF evidence prefill
+PDF_CACHE_DIR = os.environ.get("NOS_PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "nos_pdf_cache"))
+PDF_WORKERS = int(os.environ.get("NOS_PDF_WORKERS", "0")) or os.cpu_count() or 2
+# Server-side folders can only be read below this directory; unset, PDFs must be uploaded
+PDF_ROOT = os.environ.get("NOS_PDF_ROOT", "")
+# Workers never fork the server process, which holds Streamlit's threads and every session's data
+PDF_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+EVIDENCE_STOPWORDS = TITLE_STOPWORDS | frozenset(
+    "was were been being this that these those which who whom what all any some other than such not "
+    "yes use used using e.g average description described based study's within where there their".split()
+)
+EVIDENCE_PASSAGES = 3
+EVIDENCE_MIN_SCORE = 1.0
+
+def evidence_terms(text):
+    """Lower-case content words with a light plural/tense stem, shared by passages and queries"""
+    terms = []
+    for word in re.findall(r"[a-z]{3,}", text.lower()):
+        if word in EVIDENCE_STOPWORDS:
+            continue
+        for suffix in ("ing", "ed", "es", "s"):
+            if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+                word = word[:-len(suffix)]
+                break
+        terms.append(word)
+    return terms
+
+class PassageIndex:
+    """BM25 inverted index over one paper's passages"""
+    
+    def __init__(self, passages, k1=1.2, b=0.75):
+        self.k1, self.b = k1, b
+        self.postings = {}
+        self.lengths = []
+        for idx, passage in enumerate(passages):
+            terms = evidence_terms(passage['text'])
+            self.lengths.append(len(terms))
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                self.postings.setdefault(term, []).append((idx, count))
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+    
+    def search(self, terms, limit=EVIDENCE_PASSAGES):
+        """Best passages for the query terms as (score, passage index), highest first"""
+        scores = {}
+        n_passages = len(self.lengths)
+        for term in set(terms):
+            postings = self.postings.get(term, ())
+            if not postings:
+                continue
+            idf = math.log(1 + (n_passages - len(postings) + 0.5) / (len(postings) + 0.5))
+            for idx, count in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[idx] / self.average_length)
+                scores[idx] = scores.get(idx, 0.0) + idf * count * (self.k1 + 1) / (count + norm)
+        return sorted(((score, idx) for idx, score in scores.items()), reverse=True)[:limit]
+
+def criterion_evidence_rules(study_type, domain_name, criterion_name):
+    return _criterion_evidence_rules(RUBRIC_SIGNATURE, study_type, domain_name, criterion_name)
+
+@st.cache_resource(show_spinner=False)
+def _criterion_evidence_rules(signature, study_type, domain_name, criterion_name):
+    """Query terms and per-option keywords derived from a criterion's question and option texts.
+
+    An option's keywords are the words of its description that no sibling option uses.
+    Options whose text only says "no description"/"no statement"/"not stated" are the
+    fallback when the paper has nothing relevant; keyword-free starred options (Yes/No
+    questions) are suggested when relevant text is found.
+    """
+    criterion = NOS_CRITERIA[study_type][domain_name][criterion_name]
+    option_terms = {key: set(evidence_terms(text.replace("★", ""))) for key, text in criterion['options'].items()}
+    distinctive = {
+        key: terms - set().union(*(other for other_key, other in option_terms.items() if other_key != key))
+        for key, terms in option_terms.items()
+    }
+    absent = next((key for key, text in criterion['options'].items()
+                   if re.match(r"no (description|statement)|.*not stated", text.lower())), None)
+    present = next((key for key in criterion['options']
+                    if criterion['stars'].get(key, 0) > 0 and not distinctive[key]), None)
+    query = set(evidence_terms(criterion['question'])) | set().union(*option_terms.values())
+    return {'query': sorted(query), 'options': distinctive, 'absent': absent, 'present': present}
+
+def suggest_criterion_evidence(document, index, study_type, domain_name, criterion_name):
+    """Top passages for a criterion and the option they point to (None when inconclusive)"""
+    rules = criterion_evidence_rules(study_type, domain_name, criterion_name)
+    hits = index.search(rules['query'])
+    passages = [dict(document['passages'][idx], score=score) for score, idx in hits]
+    if not hits or hits[0][0] < EVIDENCE_MIN_SCORE:
+        return {'passages': passages, 'option': rules['absent'], 'reason': "No passage addresses this criterion"}
+    
+    option_scores = {}
+    for score, idx in hits:
+        terms = set(evidence_terms(document['passages'][idx]['text']))
+        for option, keywords in rules['options'].items():
+            if keywords & terms:
+                option_scores[option] = option_scores.get(option, 0.0) + score * len(keywords & terms) / len(keywords)
+    if option_scores:
+        option = max(option_scores, key=option_scores.get)
+        return {'passages': passages, 'option': option, 'reason': "Keywords of this option appear in the top passages"}
+    return {'passages': passages, 'option': rules['present'],
+            'reason': "Relevant passages found" if rules['present'] else "Passages found but no option keywords matched"}
+
+def _within(root, path):
+    return os.path.commonpath([root, path]) == root
+
+def resolve_pdf_folder(folder):
+    """Real path of a folder below PDF_ROOT; ValueError when folders are disabled or it lies outside"""
+    if not PDF_ROOT:
+        raise ValueError("Reading server folders is disabled (set NOS_PDF_ROOT)")
+    root = os.path.realpath(PDF_ROOT)
+    path = os.path.realpath(os.path.join(root, folder))
+    if not _within(root, path):
+        raise ValueError(f"{folder} is outside the PDF directory")
+    if not os.path.isdir(path):
+        raise ValueError(f"Folder not found: {folder}")
+    return path
+
+def extract_pdfs(paths):
+    """Extract PDFs in a process pool; results are cached by file hash"""
+    if not paths:
+        return []
+    with ProcessPoolExecutor(max_workers=min(PDF_WORKERS, len(paths)),
+                             mp_context=multiprocessing.get_context(PDF_START_METHOD)) as pool:
+        return list(pool.map(pdf_evidence.extract_passages, paths, [PDF_CACHE_DIR] * len(paths), chunksize=4))
+
+def extract_pdf_folder(folder):
+    """Extract every PDF under a folder of PDF_ROOT, skipping links that lead outside it"""
+    path = resolve_pdf_folder(folder)
+    root = os.path.realpath(PDF_ROOT)
+    paths = sorted(os.path.join(directory, name) for directory, _, names in os.walk(path)
+                   for name in names if name.lower().endswith(".pdf"))
+    return extract_pdfs([path for path in paths if _within(root, os.path.realpath(path))])
+
+def extract_pdf_uploads(uploads):
+    """Extract uploaded PDFs, staged in a temporary directory for the worker processes"""
+    with tempfile.TemporaryDirectory(prefix="nos_pdf_") as staging:
+        paths = []
+        for position, uploaded in enumerate(uploads):
+            directory = os.path.join(staging, str(position))
+            os.mkdir(directory)
+            paths.append(os.path.join(directory, os.path.basename(uploaded.name)))
+            with open(paths[-1], "wb") as handle:
+                handle.write(uploaded.getbuffer())
+        return extract_pdfs(paths)
+
+def get_evidence_index(sha256):
+    """Passage index of a library paper, built once per session"""
+    indexes = st.session_state.derived_caches.setdefault('pdf_indexes', {})
+    if sha256 not in indexes:
+        indexes[sha256] = PassageIndex(st.session_state.pdf_library[sha256]['passages'])
+    return indexes[sha256]
+
+def render_criterion_evidence(evidence, study_type, domain_name, criterion_name, criterion):
+    document, index = evidence
+    suggestion = suggest_criterion_evidence(document, index, study_type, domain_name, criterion_name)
+    label = criterion['options'][suggestion['option']] if suggestion['option'] else "No suggestion"
+    with st.expander(f"📄 Evidence — suggested: {label}"):
+        st.caption(suggestion['reason'])
+        for passage in suggestion['passages']:
+            st.markdown(f"> {passage['text']}\n\n*Page {passage['page']} · relevance {passage['score']:.1f}*")
+
+# Audit trail
+# Every local mutation appends one event per affected study to an NDJSON log.  The log is
+# split into segments of AUDIT_SEGMENT_EVENTS lines; when a segment is sealed its
+# study/assessor byte-offset index is written beside it, so opening the log only scans
+# the active segment and history queries seek straight to the matching lines.
+AUDIT_SEGMENT_EVENTS = int(os.environ.get("NOS_AUDIT_SEGMENT_EVENTS", "5000"))
+SCRATCH_AUDIT_DIR = os.path.join(tempfile.gettempdir(), "nos_audit_scratch")
+AUDIT_FIELDS = ("study_name", "title", "authors", "journal", "publication_year", "doi", "pmid", "study_type",
+                "country", "sample_size", "follow_up", "population", "funding", "effect_outcome",
+                "effect_measure", "effect_estimate", "standard_error", "total_stars", "notes",
+                "strengths", "limitations", "assessor_name", "primary_outcome")
+
+def _flatten_assessment(study):
+    """Audited values of a study keyed by field, with criteria as assessment.<criterion>"""
+    if study is None:
+        return {}
+    values = {field: study.get(field) for field in AUDIT_FIELDS if study.get(field) is not None}
+    values.update({f"assessment.{name}": option for name, option in study.get('assessment', {}).items()})
+    for outcome, answers in study.get('outcome_assessments', {}).items():
+        values.update({f"outcome_assessments.{outcome}.{name}": option for name, option in answers.items()})
+    for outcome, effect in study.get('outcome_effects', {}).items():
+        values.update({f"outcome_effects.{outcome}.{name}": value for name, value in effect.items() if value is not None})
+    return values
+
+def diff_study_versions(old, new):
+    """Changed fields between two flattened versions as [{'field', 'old', 'new'}]"""
+    return [{'field': field, 'old': old.get(field), 'new': new.get(field)}
+            for field in sorted(set(old) | set(new)) if old.get(field) != new.get(field)]
+
+class AuditLog:
+    """Append-only, segment-rotated audit log indexed by study and by assessor"""
+    
+    def __init__(self, directory, segment_events=AUDIT_SEGMENT_EVENTS):
+        self.directory = directory
+        self.segment_events = segment_events
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.by_study = {}
+        self.by_assessor = {}
+        self.seq = 0
+        segments = sorted(name for name in os.listdir(directory) if name.endswith(".ndjson"))
+        for name in segments[:-1]:
+            self._load_sealed_index(name)
+        self.active = segments[-1] if segments else self._segment_name(1)
+        self.active_events = self._scan_segment(self.active)
+    
+    @staticmethod
+    def _segment_name(number):
+        return f"segment-{number:06d}.ndjson"
+    
+    def _index_event(self, segment, offset, event):
+        self.seq = max(self.seq, event['seq'])
+        self.by_study.setdefault(event['study_id'], []).append((segment, offset))
+        self.by_assessor.setdefault(event['assessor'], []).append((segment, offset))
+    
+    def _load_sealed_index(self, segment):
+        index_path = os.path.join(self.directory, segment + ".idx")
+        if not os.path.exists(index_path):
+            self._scan_segment(segment)
+            return
+        with open(index_path) as fh:
+            index = json.load(fh)
+        self.seq = max(self.seq, index['last_seq'])
+        for study_id, offsets in index['study'].items():
+            self.by_study.setdefault(study_id, []).extend((segment, offset) for offset in offsets)
+        for assessor, offsets in index['assessor'].items():
+            self.by_assessor.setdefault(assessor, []).extend((segment, offset) for offset in offsets)
+    
+    def _scan_segment(self, segment):
+        path = os.path.join(self.directory, segment)
+        if not os.path.exists(path):
+            return 0
+        count = 0
+        with open(path, "rb") as fh:
+            offset = fh.tell()
+            for line in iter(fh.readline, b""):
+                if line.strip():
+                    self._index_event(segment, offset, json.loads(line))
+                    count += 1
+                offset = fh.tell()
+        return count
+    
+    def _seal_active(self):
+        index = {'study': {}, 'assessor': {}, 'last_seq': self.seq}
+        for key, entries in (('study', self.by_study), ('assessor', self.by_assessor)):
+            for name, locations in entries.items():
+                offsets = [offset for segment, offset in locations if segment == self.active]
+                if offsets:
+                    index[key][name] = offsets
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(index, fh)
+        os.replace(tmp_path, os.path.join(self.directory, self.active + ".idx"))
+        self.active = self._segment_name(int(self.active[8:14]) + 1)
+        self.active_events = 0
+    
+    def append(self, events):
+        """Write events (dicts without seq) and return them with their sequence numbers"""
+        with self._lock:
+            written = []
+            for event in events:
+                if self.active_events >= self.segment_events:
+                    self._seal_active()
+                self.seq += 1
+                event = dict(event, seq=self.seq)
+                with open(os.path.join(self.directory, self.active), "ab") as fh:
+                    offset = fh.tell()
+                    fh.write((json.dumps(event, default=str) + "\n").encode("utf-8"))
+                self._index_event(self.active, offset, event)
+                self.active_events += 1
+                written.append(event)
+            return written
+    
+    def _read(self, locations):
+        events = []
+        handles = {}
+        try:
+            for segment, offset in locations:
+                if segment not in handles:
+                    handles[segment] = open(os.path.join(self.directory, segment), "rb")
+                handles[segment].seek(offset)
+                events.append(json.loads(handles[segment].readline()))
+        finally:
+            for handle in handles.values():
+                handle.close()
+        return events
+    
+    def study_history(self, study_id):
+        with self._lock:
+            locations = list(self.by_study.get(study_id, ()))
+        return self._read(locations)
+    
+    def assessor_history(self, assessor, limit=200):
+        """Most recent events by an assessor, newest first"""
+        with self._lock:
+            locations = list(self.by_assessor.get(assessor, ()))[-limit:]
+        return self._read(reversed(locations))
+    
+    def assessors(self):
+        with self._lock:
+            return sorted(self.by_assessor)
+
+@st.cache_resource
+def get_audit_logs():
+    """Open audit logs shared by all sessions, keyed by directory"""
+    return {}
+
+def scratch_audit_dir(session_id):
+    """Audit log of a session's unsaved scratch project; removed when the session ends"""
+    return os.path.join(SCRATCH_AUDIT_DIR, session_id)
+
+def discard_scratch_audit(logs, session_id):
+    directory = scratch_audit_dir(session_id)
+    logs.pop(directory, None)
+    shutil.rmtree(directory, ignore_errors=True)
+
+def get_audit_log():
+    if st.session_state.project == SCRATCH_PROJECT:
+        directory = scratch_audit_dir(st.session_state.session_id)
+    else:
+        directory = get_workspace().audit_dir(st.session_state.project)
+    logs = get_audit_logs()
+    if directory not in logs:
+        logs[directory] = AuditLog(directory)
+    return logs[directory]
+
+def current_assessor():
+    """Who is making a change: the reviewer named in the sidebar, never a name stored on a study"""
+    return (st.session_state.get('assessor_identity') or "").strip() or "Unknown"
+
+def record_audit_events(pairs):
+    """Log the field-level changes of one mutation, given the (old, new) versions of each study"""
+    timestamp = datetime.now().isoformat(timespec="seconds")
+    events = []
+    for old, new in pairs:
+        reference = new or old
+        changes = diff_study_versions(_flatten_assessment(old), _flatten_assessment(new))
+        if not changes:
+            continue
+        events.append({
+            'timestamp': timestamp,
+            'study_id': reference['study_id'],
+            'study_name': reference.get('study_name'),
+            'assessor': current_assessor(),
+            'action': 'create' if old is None else 'delete' if new is None else 'update',
+            'changes': changes
+        })
+    if events:
+        get_audit_log().append(events)
+
+def replay_study_versions(events):
+    """Flattened study state after each event, in order (version 1 is the creation)"""
+    state, versions = {}, []
+    for event in events:
+        for change in event['changes']:
+            if change['new'] is None:
+                state.pop(change['field'], None)
+            else:
+                state[change['field']] = change['new']
+        versions.append(dict(state))
+    return versions
+
+def render_study_history(study, key):
+    """History table and a diff between any two recorded versions of one study"""
+    events = get_audit_log().study_history(study['study_id'])
+    if not events:
+        st.info("No changes recorded for this study yet.")
+        return
+    st.dataframe(pd.DataFrame([{
+        'Version': number,
+        'When': event['timestamp'],
+        'Who': event['assessor'],
+        'Action': event['action'],
+        'Fields Changed': len(event['changes'])
+    } for number, event in enumerate(events, 1)]), use_container_width=True, hide_index=True)
+    if len(events) > 1:
+        versions = replay_study_versions(events)
+        col1, col2 = st.columns(2)
+        with col1:
+            version_a = st.selectbox("Compare version", range(1, len(events) + 1), index=len(events) - 2,
+                                     key=f"history_a_{key}")
+        with col2:
+            version_b = st.selectbox("with version", range(1, len(events) + 1), index=len(events) - 1,
+                                     key=f"history_b_{key}")
+        changes = diff_study_versions(versions[version_a - 1], versions[version_b - 1])
+        if changes:
+            st.dataframe(pd.DataFrame(changes).rename(
+                columns={'field': 'Field', 'old': f'Version {version_a}', 'new': f'Version {version_b}'}
+            ).astype(str), use_container_width=True, hide_index=True)
+        else:
+            st.caption("The two versions are identical.")
+
+# Dual-review adjudication
+# Each reviewer's answers live in study['reviewer_assessments']; consensus decisions in
+# study['consensus'] remember the answers they settled, so a reviewer revising a settled
+# criterion re-opens it.  The canonical `assessment` holds agreed answers and decisions.
+def reviewer_assessments(study):
+    """Independent answers per reviewer; a study without separate reviews counts as its assessor's"""
+    reviews = study.get('reviewer_assessments')
+    if reviews:
+        return reviews
+    return {(study.get('assessor_name') or "Original assessor").strip(): {'assessment': study.get('assessment', {})}}
+
+def _criterion_answers(reviews, criterion):
+    return {reviewer: review['assessment'][criterion] for reviewer, review in reviews.items()
+            if criterion in review['assessment']}
+
+def with_canonical_assessment(study):
+    """Copy of the study whose assessment and scores reflect reviewer agreement and consensus"""
+    reviews = reviewer_assessments(study)
+    consensus = study.get('consensus', {})
+    assessment = dict(study.get('assessment', {}))
+    for criterion in {name for review in reviews.values() for name in review['assessment']}:
+        answers = _criterion_answers(reviews, criterion)
+        decision = consensus.get(criterion)
+        if decision and decision['answers'] == answers:
+            assessment[criterion] = decision['option']
+        elif len(set(answers.values())) == 1:
+            assessment[criterion] = next(iter(answers.values()))
+    updated = dict(study, assessment=assessment)
+    updated['total_stars'] = calculate_total_stars(assessment, study['study_type'])
+    return updated
+
+def add_reviewer_assessment(study, reviewer, assessment):
+    """Store one reviewer's independent answers on a study (replacing their earlier ones)"""
+    reviews = dict(reviewer_assessments(study))
+    reviews[reviewer] = {'assessment': assessment, 'assessment_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    update_study(with_canonical_assessment(dict(study, reviewer_assessments=reviews)))
+
+def record_consensus(study, decisions, adjudicator):
+    """Settle disputed criteria; decisions maps criterion to the agreed option"""
+    reviews = reviewer_assessments(study)
+    consensus = dict(study.get('consensus', {}))
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for criterion, option in decisions.items():
+        consensus[criterion] = {'option': option, 'answers': _criterion_answers(reviews, criterion),
+                                'adjudicator': adjudicator, 'timestamp': timestamp}
+    update_study(with_canonical_assessment(dict(study, reviewer_assessments=reviews, consensus=consensus)))
+
+def find_disagreements(study):
+    """Open (reviewer pair, criterion, answers) disagreements of one study"""
+    reviews = study.get('reviewer_assessments') or {}
+    if len(reviews) < 2:
+        return []
+    consensus = study.get('consensus', {})
+    disagreements = []
+    for criterion in sorted({name for review in reviews.values() for name in review['assessment']}):
+        answers = _criterion_answers(reviews, criterion)
+        if len(set(answers.values())) < 2:
+            continue
+        decision = consensus.get(criterion)
+        if decision and decision['answers'] == answers:
+            continue
+        for pair in itertools.combinations(sorted(answers), 2):
+            if answers[pair[0]] != answers[pair[1]]:
+                disagreements.append((pair, criterion, answers))
+    return disagreements
+
+class AdjudicationQueue:
+    """Open disagreements indexed by study, reviewer pair and criterion.
+
+    Studies are ranked in a heap by (rating differs between reviewers, number of open
+    disagreements); re-indexing a study pushes a fresh entry and leaves the old one to be
+    skipped lazily.  Only studies marked dirty since the last refresh are re-examined.
+    """
+
+    def __init__(self, scheme):
+        self.scheme = scheme
+        self.items = {}
+        self.by_study = {}
+        self.by_pair = {}
+        self.by_criterion = {}
+        self._entries = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._dirty = None
+
+    def clear(self):
+        """Drop the index; the next refresh rebuilds it (also called when the portfolio is spilled)"""
+        self.__init__(self.scheme)
+
+    def mark_dirty(self, study_ids=None):
+        if study_ids is None:
+            self._dirty = None
+        elif self._dirty is not None:
+            self._dirty.update(study_ids)
+
+    def refresh(self, studies):
+        if self._dirty is None:
+            self.clear()
+            targets = studies
+        else:
+            for study_id in self._dirty:
+                self._drop(study_id)
+            targets = [study for study in studies if study['study_id'] in self._dirty] if self._dirty else []
+        for study in targets:
+            self._index(study)
+        self._dirty = set()
+
+    def _drop(self, study_id):
+        for key in self.by_study.pop(study_id, ()):
+            del self.items[key]
+            for index, value in ((self.by_pair, key[1]), (self.by_criterion, key[2])):
+                index[value].discard(key)
+                if not index[value]:
+                    del index[value]
+        self._entries.pop(study_id, None)
+
+    def _index(self, study):
+        disagreements = find_disagreements(study)
+        if not disagreements:
+            return
+        study_id = study['study_id']
+        keys = self.by_study.setdefault(study_id, set())
+        for pair, criterion, answers in disagreements:
+            key = (study_id, pair, criterion)
+            self.items[key] = answers
+            keys.add(key)
+            self.by_pair.setdefault(pair, set()).add(key)
+            self.by_criterion.setdefault(criterion, set()).add(key)
+        ratings = {rate_assessment_quality(review['assessment'], study['study_type'])[0]
+                   for review in study['reviewer_assessments'].values()}
+        boundary = len(ratings) > 1
+        entry = (-boundary, -len({criterion for _, criterion, _ in disagreements}), study['study_name'],
+                 next(self._seq), study_id, study)
+        self._entries[study_id] = entry
+        heapq.heappush(self._heap, entry)
+
+    def worklist(self, limit=20, pair=None, criterion=None):
+        """Highest-priority studies, optionally restricted to one reviewer pair and/or criterion"""
+        if pair is not None or criterion is not None:
+            keys = None
+            for index, value in ((self.by_pair, pair), (self.by_criterion, criterion)):
+                if value is not None:
+                    matched = index.get(value, set())
+                    keys = matched if keys is None else keys & matched
+            return heapq.nsmallest(limit, (self._entries[study_id] for study_id in {key[0] for key in keys}))
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = list(self._entries.values())
+            heapq.heapify(self._heap)
+        top = []
+        while self._heap and len(top) < limit:
+            entry = heapq.heappop(self._heap)
+            if self._entries.get(entry[4]) is entry:
+                top.append(entry)
+        for entry in top:
+            heapq.heappush(self._heap, entry)
+        return top
+
+def get_adjudication_queue():
+    """This session's queue, refreshed for the studies changed since the last rerun"""
+    queue = st.session_state.get('adjudication_queue')
+    if queue is None or queue.scheme != get_quality_scheme():
+        caches = st.session_state.studies.caches
+        if queue in caches:
+            caches.remove(queue)
+        queue = st.session_state.adjudication_queue = AdjudicationQueue(get_quality_scheme())
+        caches.append(queue)
+    queue.refresh(st.session_state.studies)
+    return queue
+
+# Reviewer workload scheduling
+# Queued records are spread over a roster of reviewers by estimated effort.  Assignments
+# live on the records ('assigned_to') and are saved with the project's queue and roster
+# (see change_queue), so saving an assessment removes its work item; a
+# rerun of the scheduler keeps every still-valid assignment, releases only the items that
+# put a reviewer above their capacity share, and fills open slots greedily (largest effort
+# first, to the least-loaded eligible reviewer).
+STUDY_TYPE_KEYWORDS = (
+    ("Case-Control Studies", re.compile(r"case[- ]control", re.I)),
+    ("Cross-Sectional Studies", re.compile(r"cross[- ]sectional|prevalence|survey", re.I)),
+    ("Cohort Studies", re.compile(r"cohort|prospective|retrospective|longitudinal|follow[- ]up", re.I)),
+)
+DEFAULT_ASSESSMENT_MINUTES = 20.0
+MAX_ASSESSMENT_GAP_MINUTES = 120.0
+
+def guess_study_type(title):
+    """Likely NOS study type from design keywords in a title, or None"""
+    for study_type, pattern in STUDY_TYPE_KEYWORDS:
+        if pattern.search(title or ""):
+            return study_type
+    return None
+
+def author_surnames(authors):
+    return {first_author_key(author) for author in re.split(r";|,| and ", authors or "")} - {""}
+
+def measure_assessment_minutes(studies):
+    """Median minutes per assessment by study type, from gaps between a reviewer's consecutive saves"""
+    saves = {}
+    for study in studies:
+        try:
+            saved = datetime.strptime(study.get('assessment_date', ""), "%Y-%m-%d %H:%M:%S")
+        except (TypeError, ValueError):
+            continue
+        saves.setdefault(study.get('assessor_name') or "", []).append((saved, study['study_type']))
+    gaps = {}
+    for timeline in saves.values():
+        timeline.sort()
+        for (previous, _), (saved, study_type) in zip(timeline, timeline[1:]):
+            minutes = (saved - previous).total_seconds() / 60
+            if 1 <= minutes <= MAX_ASSESSMENT_GAP_MINUTES:
+                gaps.setdefault(study_type, []).append(minutes)
+    efforts = {study_type: float(np.median(values)) for study_type, values in gaps.items()}
+    all_gaps = [minutes for values in gaps.values() for minutes in values]
+    efforts[None] = float(np.median(all_gaps)) if all_gaps else DEFAULT_ASSESSMENT_MINUTES
+    return efforts
+
+def get_effort_estimates():
+    """Minutes per assessment by study type: timed assessments where recorded, else save gaps"""
+    timings, labels = get_timing_store().load()
+    key = (st.session_state.portfolio_revision, len(timings))
+    cached = st.session_state.derived_caches.get('effort_cache')
+    if cached is None or cached[0] != key:
+        efforts = measure_assessment_minutes(st.session_state.studies)
+        minutes = timings['active_seconds'].astype(np.float64) / 60
+        plausible = minutes <= MAX_ASSESSMENT_GAP_MINUTES
+        if plausible.any():
+            medians = grouped_median(minutes[plausible], timings['study_type'][plausible].astype(np.int64),
+                                     len(labels['study_type']))
+            efforts.update({study_type: float(median) for study_type, median in zip(labels['study_type'], medians)
+                            if not np.isnan(median)})
+            efforts[None] = float(np.median(minutes[plausible]))
+        cached = st.session_state.derived_caches['effort_cache'] = (key, efforts)
+    return cached[1]
+
+def record_effort(record, efforts):
+    if 'likely_study_type' not in record:
+        record['likely_study_type'] = guess_study_type(record.get('title') or record.get('study_name'))
+    return efforts.get(record['likely_study_type'], efforts[None])
+
+def assign_reviewers(records, roster, reviews_per_study, efforts):
+    """Assign every record to reviews_per_study distinct eligible reviewers, balancing effort.
+
+    roster maps reviewer -> {'capacity': relative share, 'conflicts': set of author surnames}.
+    Returns counts of new and moved assignments, unfilled review slots and the load per reviewer.
+    """
+    capacity = {name: max(float(entry['capacity']), 0.01) for name, entry in roster.items()}
+    conflicted = {name: entry['conflicts'] for name, entry in roster.items() if entry['conflicts']}
+    load = dict.fromkeys(roster, 0.0)
+    tasks = {name: [] for name in roster}
+    effort = [record_effort(record, efforts) for record in records]
+    surnames = {}
+    
+    def eligible(name, position):
+        if name in records[position]['assigned_to']:
+            return False
+        if name in conflicted:
+            if position not in surnames:
+                surnames[position] = author_surnames(records[position].get('authors'))
+            return not conflicted[name] & surnames[position]
+        return True
+    
+    # Keep assignments whose reviewer is still on the roster and not conflicted
+    released = {}
+    for position, record in enumerate(records):
+        kept = [name for name in record.get('assigned_to', ()) if name in roster][:reviews_per_study]
+        released.update({position: name for name in record.get('assigned_to', ()) if name not in kept})
+        record['assigned_to'] = []
+        for name in kept:
+            if eligible(name, position):
+                record['assigned_to'].append(name)
+                load[name] += effort[position]
+                tasks[name].append(position)
+    
+    # Release the most recent items of reviewers above their capacity share (e.g. after someone joined)
+    total_capacity = sum(capacity.values())
+    total_load = sum(load.values())
+    slack = max(effort, default=0.0)
+    for name in roster:
+        target = total_load * capacity[name] / total_capacity + slack
+        while tasks[name] and load[name] - effort[tasks[name][-1]] >= target:
+            position = tasks[name].pop()
+            records[position]['assigned_to'].remove(name)
+            load[name] -= effort[position]
+            released[position] = name
+    
+    # Longest-processing-time-first greedy fill of the open slots
+    open_slots = [position for position, record in enumerate(records) if len(record['assigned_to']) < reviews_per_study]
+    heap = [(load[name] / capacity[name], name) for name in roster]
+    heapq.heapify(heap)
+    assigned = moved = unfilled = 0
+    for position in sorted(open_slots, key=effort.__getitem__, reverse=True):
+        for _ in range(reviews_per_study - len(records[position]['assigned_to'])):
+            skipped = []
+            while heap and not eligible(heap[0][1], position):
+                skipped.append(heapq.heappop(heap))
+            if heap:
+                _, name = heapq.heappop(heap)
+                records[position]['assigned_to'].append(name)
+                load[name] += effort[position]
+                heapq.heappush(heap, (load[name] / capacity[name], name))
+                if position not in released:
+                    assigned += 1
+                elif released[position] != name:
+                    moved += 1
+            else:
+                unfilled += 1
+            for entry in skipped:
+                heapq.heappush(heap, entry)
+    return {'assigned': assigned, 'moved': moved, 'unfilled': unfilled, 'load': load}
+
+def workload_summary(records, roster, efforts):
+    """Assigned studies and estimated hours per reviewer"""
+    counts = dict.fromkeys(roster, 0)
+    minutes = dict.fromkeys(roster, 0.0)
+    for record in records:
+        for name in record.get('assigned_to', ()):
+            if name in counts:
+                counts[name] += 1
+                minutes[name] += record_effort(record, efforts)
+    return pd.DataFrame({
+        'Reviewer': list(roster),
+        'Capacity': [roster[name]['capacity'] for name in roster],
+        'Studies': [counts[name] for name in roster],
+        'Estimated Hours': [round(minutes[name] / 60, 1) for name in roster]
+    })
+
+# Assessment timing
+# The Add page starts a timer when a new assessment is opened; navigating to another page
+# pauses it and returning resumes it, so active time excludes time spent elsewhere in the
+# app.  Criterion answers sit outside the save form and report each change through an
+# on_change callback: the active time since the previous answer is credited to the
+# criterion just answered, and switches between domain tabs are counted.  Each saved
+# assessment appends one fixed-size record plus one per timed criterion; names are
+# dictionary-encoded.
+TIMING_DTYPE = np.dtype([('started', '<f8'), ('finished', '<f8'), ('active_seconds', '<f4'),
+                         ('reviewer', '<u4'), ('study_type', '<u2'), ('tab_switches', '<u2')])
+CRITERION_TIMING_DTYPE = np.dtype([('finished', '<f8'), ('seconds', '<f4'), ('reviewer', '<u4'),
+                                   ('study_type', '<u2'), ('criterion', '<u2')])
+TABS_REPORT_CHANGES = "on_change" in inspect.signature(st.tabs).parameters
+
+class AssessmentTimingStore:
+    """Append-only columnar store of assessment timings (timings.bin, criteria.bin + labels.json)"""
+    
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._data_path = os.path.join(directory, "timings.bin")
+        self._criteria_path = os.path.join(directory, "criteria.bin")
+        self._labels_path = os.path.join(directory, "labels.json")
+        self.labels = {'reviewer': [], 'study_type': [], 'criterion': []}
+        if os.path.exists(self._labels_path):
+            with open(self._labels_path) as fh:
+                self.labels.update(json.load(fh))
+        self._codes = {kind: {name: code for code, name in enumerate(names)} for kind, names in self.labels.items()}
+        self._cache = {}
+    
+    def _code(self, kind, name):
+        codes = self._codes[kind]
+        if name not in codes:
+            codes[name] = len(self.labels[kind])
+            self.labels[kind].append(name)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as fh:
+                json.dump(self.labels, fh)
+            os.replace(tmp_path, self._labels_path)
+        return codes[name]
+    
+    def append(self, started, finished, active_seconds, reviewer, study_type, tab_switches, criteria=None):
+        """Record one assessment and the seconds credited to each criterion answered in it"""
+        with self._lock:
+            reviewer_code, type_code = self._code('reviewer', reviewer), self._code('study_type', study_type)
+            record = np.array([(started, finished, active_seconds, reviewer_code, type_code,
+                                min(tab_switches, 65535))], dtype=TIMING_DTYPE)
+            with open(self._data_path, "ab") as fh:
+                record.tofile(fh)
+            if criteria:
+                records = np.array([(finished, seconds, reviewer_code, type_code, self._code('criterion', name))
+                                    for name, seconds in criteria.items()], dtype=CRITERION_TIMING_DTYPE)
+                with open(self._criteria_path, "ab") as fh:
+                    records.tofile(fh)
+    
+    def _read(self, path, dtype):
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        cached = self._cache.get(path)
+        if cached is None or cached[0] != size:
+            count = size // dtype.itemsize
+            cached = self._cache[path] = (size, np.fromfile(path, dtype=dtype, count=count) if count
+                                          else np.empty(0, dtype=dtype))
+        return cached[1]
+    
+    def load(self):
+        """All timings as a structured array, re-read only when the file has grown"""
+        with self._lock:
+            return self._read(self._data_path, TIMING_DTYPE), {kind: list(names) for kind, names in self.labels.items()}
+    
+    def load_criteria(self):
+        """Per-criterion timings as a structured array, re-read only when the file has grown"""
+        with self._lock:
+            return (self._read(self._criteria_path, CRITERION_TIMING_DTYPE),
+                    {kind: list(names) for kind, names in self.labels.items()})
+
+@st.cache_resource
+def get_timing_stores():
+    """Open timing stores shared by all sessions, keyed by directory"""
+    return {}
+
+def get_timing_store():
+    if st.session_state.project == SCRATCH_PROJECT:
+        directory = os.path.join(tempfile.gettempdir(), "nos_timing_scratch", st.session_state.session_id)
+    else:
+        directory = get_workspace().project_dir("timings", st.session_state.project)
+    stores = get_timing_stores()
+    if directory not in stores:
+        stores[directory] = AssessmentTimingStore(directory)
+    return stores[directory]
+
+def new_assessment_timer(now):
+    return {'started': now, 'resumed': now, 'last_answer': now, 'active': 0.0, 'tab_switches': 0, 'criteria': {}}
+
+def track_assessment_timer(page):
+    """Start, pause or resume the assessment timer as the reviewer moves between pages"""
+    timer = st.session_state.get('assessment_timer')
+    now = time.time()
+    if page == "📝 Add New Study":
+        if timer is None:
+            st.session_state.assessment_timer = new_assessment_timer(now)
+        elif timer['resumed'] is None:
+            timer['resumed'] = timer['last_answer'] = now
+    elif timer is not None and timer['resumed'] is not None:
+        timer['active'] += now - timer['resumed']
+        timer['resumed'] = None
+
+def time_criterion_answer(criterion_name):
+    """on_change callback of a criterion: credit it with the active time since the previous answer"""
+    timer = st.session_state.get('assessment_timer')
+    if timer is None or timer['resumed'] is None:
+        return
+    now = time.time()
+    timer['criteria'][criterion_name] = timer['criteria'].get(criterion_name, 0.0) + now - timer['last_answer']
+    timer['last_answer'] = now
+
+def count_tab_switch():
+    """on_change callback of the domain and outcome tabs"""
+    timer = st.session_state.get('assessment_timer')
+    if timer is not None:
+        timer['tab_switches'] += 1
+
+def timed_tabs(names, key):
+    """st.tabs whose switches count towards the assessment timer where Streamlit reports them"""
+    if TABS_REPORT_CHANGES:
+        return st.tabs(names, key=key, on_change=count_tab_switch)
+    return st.tabs(names)
+
+def finish_assessment_timer(study_type, reviewer):
+    """Record the timing of the assessment just submitted and start timing the next one"""
+    timer = st.session_state.get('assessment_timer')
+    now = time.time()
+    if timer is None:
+        return None
+    active = timer['active'] + (now - timer['resumed'] if timer['resumed'] is not None else 0.0)
+    get_timing_store().append(timer['started'], now, active, reviewer, study_type, timer['tab_switches'],
+                              timer['criteria'])
+    st.session_state.assessment_timer = new_assessment_timer(now)
+    return active
+
+def grouped_median(values, groups, n_groups):
+    """Median of values per integer group label (NaN for empty groups) via one sort"""
+    order = np.lexsort((values, groups))
+    values = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    medians = np.full(n_groups, np.nan)
+    present = counts > 0
+    low = starts[present] + (counts[present] - 1) // 2
+    high = starts[present] + counts[present] // 2
+    medians[present] = (values[low] + values[high]) / 2
+    return medians
+
+def summarise_timings(timings, labels, max_minutes=MAX_ASSESSMENT_GAP_MINUTES):
+    """Throughput per reviewer and month plus median minutes per study type and reviewer.
+
+    Assessments with more than max_minutes of active time (a form left open overnight)
+    are excluded from the medians but still count towards throughput.
+    """
+    minutes = timings['active_seconds'].astype(np.float64) / 60
+    plausible = minutes <= max_minutes
+    months = timings['finished'].astype('datetime64[s]').astype('datetime64[M]')
+    month_labels, month_codes = np.unique(months, return_inverse=True)
+    n_reviewers, n_types = len(labels['reviewer']), len(labels['study_type'])
+    reviewers = timings['reviewer'].astype(np.int64)
+    cells = reviewers * len(month_labels) + month_codes
+    counts = np.bincount(cells, minlength=n_reviewers * len(month_labels)).reshape(n_reviewers, -1)
+    hours = np.bincount(cells, weights=minutes / 60,
+                        minlength=n_reviewers * len(month_labels)).reshape(n_reviewers, -1)
+    study_types = timings['study_type'].astype(np.int64)
+    return {
+        'months': [str(month) for month in month_labels],
+        'throughput': pd.DataFrame(counts, index=labels['reviewer'], columns=[str(month) for month in month_labels]),
+        'studies_per_hour': np.divide(counts.sum(axis=1), hours.sum(axis=1),
+                                      out=np.zeros(n_reviewers), where=hours.sum(axis=1) > 0),
+        'by_type': pd.DataFrame({
+            'Study Type': labels['study_type'],
+            'Assessments': np.bincount(study_types, minlength=n_types),
+            'Median Minutes': grouped_median(minutes[plausible], study_types[plausible], n_types)
+        }),
+        'by_reviewer': pd.DataFrame({
+            'Reviewer': labels['reviewer'],
+            'Assessments': counts.sum(axis=1),
+            'Median Minutes': grouped_median(minutes[plausible], reviewers[plausible], n_reviewers),
+            'Tab Switches per Assessment': np.divide(np.bincount(reviewers, weights=timings['tab_switches'],
+                                                                 minlength=n_reviewers),
+                                                     counts.sum(axis=1), out=np.zeros(n_reviewers),
+                                                     where=counts.sum(axis=1) > 0)
+        })
+    }
+
+def summarise_criterion_timings(criteria, labels, max_minutes=MAX_ASSESSMENT_GAP_MINUTES):
+    """Median and total seconds per study type and NOS item, slowest items first.
+
+    Credits above max_minutes (an answer given after the form sat idle) are excluded
+    from the medians but still count as timed answers.
+    """
+    n_criteria = len(labels['criterion'])
+    cells = criteria['study_type'].astype(np.int64) * n_criteria + criteria['criterion'].astype(np.int64)
+    n_cells = len(labels['study_type']) * n_criteria
+    seconds = criteria['seconds'].astype(np.float64)
+    plausible = seconds <= max_minutes * 60
+    counts = np.bincount(cells, minlength=n_cells)
+    present = np.flatnonzero(counts)
+    medians = grouped_median(seconds[plausible], cells[plausible], n_cells)[present]
+    types = [labels['study_type'][cell // n_criteria] for cell in present]
+    names = [labels['criterion'][cell % n_criteria] for cell in present]
+    questions = [next((criterion['question'] for domain in NOS_CRITERIA.get(study_type, {}).values()
+                       for criterion_name, criterion in domain.items() if criterion_name == name), name)
+                 for study_type, name in zip(types, names)]
+    table = pd.DataFrame({
+        'Study Type': types,
+        'NOS Item': questions,
+        'Timed Answers': counts[present],
+        'Median Seconds': medians,
+        'Total Hours': np.bincount(cells, weights=seconds, minlength=n_cells)[present] / 3600
+    })
+    return table.sort_values('Median Seconds', ascending=False, na_position='last', ignore_index=True)
+
+def render_timing_analytics():
+    timings, labels = get_timing_store().load()
+    if not len(timings):
+        st.info("No timed assessments yet. Assessments saved from 'Add New Study' are timed automatically.")
+        return
+    summary = summarise_timings(timings, labels)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Timed Assessments", f"{len(timings):,}")
+    with col2:
+        st.metric("Median Minutes", f"{np.median(timings['active_seconds']) / 60:.1f}")
+    with col3:
+        st.metric("Reviewers", len(labels['reviewer']))
+    col1, col2 = st.columns(2)
+    with col1:
+        st.dataframe(summary['by_type'].round(1), use_container_width=True, hide_index=True)
+    with col2:
+        st.dataframe(summary['by_reviewer'].assign(**{'Studies per Hour': summary['studies_per_hour']}).round(1),
+                     use_container_width=True, hide_index=True)
+    st.write("**Assessments per Reviewer and Month**")
+    st.bar_chart(summary['throughput'].T)
+    st.caption("Active time runs from opening a new assessment to saving it, excluding time on other pages of the app.")
+    
+    criteria, labels = get_timing_store().load_criteria()
+    if len(criteria):
+        st.write("**Which NOS Items Take Longest**")
+        st.dataframe(summarise_criterion_timings(criteria, labels).round(1), use_container_width=True, hide_index=True)
+        st.caption("Each answer is credited with the active time since the reviewer's previous answer; "
+                   "items left at their default option are not timed.")
+
+# Change-data-capture feed
+# Every local create/update/delete in a workspace project is appended to an NDJSON feed
+# with its computed scores.  Records are buffered and written in batches (when the batch
+# fills or after CDC_FLUSH_SECONDS); files rotate at CDC_SEGMENT_BYTES and are named after
+# their first sequence number, so a consumer resumes from its last seq by picking the
+# segment and skipping lines, or pulls /changes?project=...&after=<seq> from the feed server.
+# The feed carries whole study records, so it is served on its own address rather than next
+# to /metrics; with NOS_CDC_TOKEN set every pull must send it as a bearer token, and the
+# server only binds beyond loopback when a token is configured.
+CDC_HOST = os.environ.get("NOS_CDC_HOST", "127.0.0.1")
+CDC_PORT = int(os.environ.get("NOS_CDC_PORT", "9465") or 0)
+CDC_TOKEN = os.environ.get("NOS_CDC_TOKEN", "")
+CDC_BATCH_SIZE = int(os.environ.get("NOS_CDC_BATCH_SIZE", "200"))
+CDC_FLUSH_SECONDS = float(os.environ.get("NOS_CDC_FLUSH_SECONDS", "1.0"))
+CDC_SEGMENT_BYTES = int(os.environ.get("NOS_CDC_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+CDC_PULL_LIMIT = 5000
+
+class ChangeFeed:
+    """Append-only, size-rotated NDJSON change feed of one project"""
+    
+    def __init__(self, directory, batch_size=CDC_BATCH_SIZE, segment_bytes=CDC_SEGMENT_BYTES):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._buffer = []
+        os.makedirs(directory, exist_ok=True)
+        self.segments = sorted(int(name[8:20]) for name in os.listdir(directory)
+                               if name.startswith("changes-") and name.endswith(".ndjson"))
+        self.seq = self.segments[-1] - 1 + self._count_lines(self.segments[-1]) if self.segments else 0
+    
+    def _path(self, first_seq):
+        return os.path.join(self.directory, f"changes-{first_seq:012d}.ndjson")
+    
+    def _count_lines(self, first_seq):
+        with open(self._path(first_seq), "rb") as fh:
+            return sum(chunk.count(b"\n") for chunk in iter(lambda: fh.read(1 << 20), b""))
+    
+    def append(self, records):
+        """Assign sequence numbers and buffer the records; full batches are written at once"""
+        with self._lock:
+            for record in records:
+                self.seq += 1
+                self._buffer.append(json.dumps({'seq': self.seq, **record}, default=str))
+            if len(self._buffer) >= self.batch_size:
+                self._flush_locked()
+            return self.seq
+    
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+    
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        first_seq = self.seq - len(self._buffer) + 1
+        if not self.segments or os.path.getsize(self._path(self.segments[-1])) >= self.segment_bytes:
+            self.segments.append(first_seq)
+        with open(self._path(self.segments[-1]), "a", encoding="utf-8") as fh:
+            fh.write("\n".join(self._buffer) + "\n")
+        self._buffer = []
+    
+    def read_since(self, after, limit=CDC_PULL_LIMIT):
+        """Flushed records with seq > after, at most limit of them, and the cursor to resume from.
+
+        Sequence numbers are contiguous within a segment, so lines before the cursor are
+        skipped without being parsed.
+        """
+        with self._lock:
+            segments = list(self.segments)
+            flushed = self.seq - len(self._buffer)
+        records = []
+        for first_seq in segments[max(bisect.bisect_right(segments, after + 1) - 1, 0):]:
+            skip = max(after + 1 - first_seq, 0)
+            with open(self._path(first_seq), encoding="utf-8") as fh:
+                for seq, line in enumerate(itertools.islice(fh, skip, None), first_seq + skip):
+                    if seq > flushed or len(records) >= limit:
+                        return records, records[-1]['seq'] if records else after
+                    records.append(json.loads(line))
+        return records, records[-1]['seq'] if records else after
+
+class ChangeFeedRegistry:
+    """Feeds of all workspace projects, with one background thread flushing partial batches"""
+    
+    def __init__(self, workspace, flush_seconds=CDC_FLUSH_SECONDS):
+        self.workspace = workspace
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._feeds = {}
+        flusher = threading.Thread(target=self._flush_forever, name="nos-cdc-flusher", daemon=True)
+        flusher.start()
+        atexit.register(self.flush_all)
+    
+    def get(self, project):
+        """The project's feed, or None for projects outside the workspace (e.g. scratch)"""
+        if project not in self.workspace.projects():
+            return None
+        directory = self.workspace.project_dir("changes", project)
+        with self._lock:
+            if directory not in self._feeds:
+                self._feeds[directory] = ChangeFeed(directory)
+            return self._feeds[directory]
+    
+    def flush_all(self):
+        with self._lock:
+            feeds = list(self._feeds.values())
+        for feed in feeds:
+            feed.flush()
+    
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush_all()
+
+@st.cache_resource
+def get_change_feeds():
+    """Process-wide change feeds; the pull endpoint starts with them"""
+    feeds = ChangeFeedRegistry(get_workspace())
+    feeds.server = start_change_feed_server(feeds)
+    return feeds
+
+def change_record(old, new):
+    """CDC record of one study change with the scores a warehouse needs"""
+    study = new or old
+    domain_scores = calculate_domain_scores(study)
+    return {
+        'op': 'create' if old is None else 'delete' if new is None else 'update',
+        'ts': datetime.now().isoformat(timespec="milliseconds"),
+        'study_id': study['study_id'],
+        'study_name': study.get('study_name'),
+        'study_type': study['study_type'],
+        'total_stars': study.get('total_stars'),
+        'max_stars': get_max_stars(study['study_type']),
+        'quality_rating': get_quality_rating(study['total_stars'], study['study_type'])[0],
+        'domain_scores': {domain: scores['stars'] for domain, scores in domain_scores.items()},
+        'assessor': current_assessor(),
+        'study': new
+    }
+
+def publish_change_records(pairs):
+    feed = get_change_feeds().get(st.session_state.project)
+    if feed is not None:
+        feed.append([dict(change_record(old, new), project=st.session_state.project) for old, new in pairs])
+
+# Typed dataset export (Arrow / Parquet)
+# One row per study with dictionary-encoded criterion answers and categories, narrow integer
+# star columns and typed metadata.  Fields without a column of their own (outcome and
+# reviewer assessments, consensus, ...) travel as JSON in `details`, so an exported dataset
+# can be imported again without loss.  Rows are grouped by study type: one or more Parquet
+# row groups, or IPC record batches, per type.
+DATASET_TEXT_FIELDS = ("study_id", "study_name", "title", "authors", "journal", "doi", "pmid", "country",
+                       "population", "funding", "follow_up", "notes", "strengths", "limitations",
+                       "assessor_name", "primary_outcome", "effect_outcome", "assessment_version")
+DATASET_CATEGORY_FIELDS = ("study_type", "effect_measure")
+DATASET_INT_FIELDS = {"publication_year": "int16", "sample_size": "int64", "total_stars": "int8"}
+DATASET_FLOAT_FIELDS = ("effect_estimate", "standard_error")
+DATASET_ROW_GROUP_SIZE = 65536
+DATASET_FORMATS = {"Parquet": ".parquet", "Arrow IPC": ".arrow"}
+
+def _dataset_criteria():
+    """Every criterion of every rubric, in form order"""
+    return list(dict.fromkeys(name for domains in NOS_CRITERIA.values()
+                              for domain in domains.values() for name in domain))
+
+def _category_array(values):
+    """Dictionary-encoded string array with the narrowest index type pandas picks (int8 for < 128 values)"""
+    return pa.Array.from_pandas(pd.Categorical(values))
+
+def _criterion_column(groups, criterion):
+    """Dictionary array of one criterion over per-type encoded groups; null where not answered or not asked"""
+    dictionary, indices = [], []
+    for codes, layout in groups:
+        names = [entry['criterion'] for entry in layout['criteria']]
+        if criterion not in names:
+            indices.append(np.full(len(codes), -1, dtype=np.int8))
+            continue
+        entry = layout['criteria'][names.index(criterion)]
+        dictionary.extend(option for option in entry['options'] if option not in dictionary)
+        remap = np.array([dictionary.index(option) for option in entry['options']] + [-1], dtype=np.int8)
+        indices.append(remap[codes[:, names.index(criterion)]])
+    indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.int8)
+    return pa.DictionaryArray.from_arrays(pa.array(indices, mask=indices < 0, type=pa.int8()),
+                                          pa.array(dictionary, type=pa.string()))
+
+def build_assessment_table(studies):
+    """Arrow table of the portfolio, sorted by study type (see the section comment)"""
+    studies = sorted(studies, key=lambda study: study['study_type'])
+    tabular = {*DATASET_TEXT_FIELDS, *DATASET_CATEGORY_FIELDS, *DATASET_INT_FIELDS, *DATASET_FLOAT_FIELDS,
+               'assessment', 'assessment_date', 'quality_rating'}
+    columns = {}
+    for field in DATASET_TEXT_FIELDS:
+        columns[field] = pa.array([None if study.get(field) is None else str(study[field]) for study in studies],
+                                  type=pa.string())
+    for field in DATASET_CATEGORY_FIELDS:
+        columns[field] = _category_array([study.get(field) for study in studies])
+    for field, dtype in DATASET_INT_FIELDS.items():
+        columns[field] = pa.array([study.get(field) for study in studies], type=dtype)
+    for field in DATASET_FLOAT_FIELDS:
+        columns[field] = pa.array([study.get(field) for study in studies], type=pa.float64())
+    columns['assessment_date'] = pa.array(
+        pd.to_datetime([study.get('assessment_date') for study in studies], errors='coerce')).cast(pa.timestamp('s'))
+    
+    # Answers are encoded per study type once; stars and criterion columns are array lookups on the codes
+    groups = []
+    domain_columns = {f"{domain}_{kind}": [] for domain in CUBE_DOMAINS for kind in ('stars', 'max')}
+    max_stars = []
+    for study_type, group in itertools.groupby(studies, key=lambda study: study['study_type']):
+        codes, layout = encode_assessments(list(group), study_type)
+        groups.append((codes, layout))
+        rubric = compile_rubric(study_type)
+        domain_stars = dict.fromkeys(rubric['domains'], 0)
+        for column, entry in enumerate(layout['criteria']):
+            domain_stars[entry['domain']] = domain_stars[entry['domain']] + np.array(entry['stars'] + [0])[codes[:, column]]
+        domain_max = dict(zip(rubric['domains'], rubric['domain_max']))
+        for domain in CUBE_DOMAINS:
+            names = ('Outcome', 'Exposure') if domain == "Outcome/Exposure" else (domain,)
+            name = next((name for name in names if name in domain_stars), None)
+            domain_columns[f"{domain}_stars"].append(np.broadcast_to(domain_stars[name] if name else 0, len(codes)))
+            domain_columns[f"{domain}_max"].append(np.full(len(codes), domain_max.get(name, 0)))
+        max_stars.append(np.full(len(codes), rubric['max_stars']))
+    columns['max_stars'] = pa.array(np.concatenate(max_stars) if max_stars else [], type=pa.int8())
+    # The label is exported for analysis under the active scheme, and ignored again on import
+    columns['quality_rating'] = _category_array(classify_quality({
+        'study_type': [study['study_type'] for study in studies],
+        'total_stars': [study['total_stars'] for study in studies],
+        'max_stars': columns['max_stars'].to_numpy(zero_copy_only=False),
+        **{name: np.concatenate(values) if values else [] for name, values in domain_columns.items()}
+    }, get_quality_scheme()) if studies else [])
+    for domain in CUBE_DOMAINS:
+        name = re.sub(r'\W+', '_', domain).lower()
+        for kind, suffix in (('stars', 'stars'), ('max', 'max_stars')):
+            values = domain_columns[f"{domain}_{kind}"]
+            columns[f"{name}_{suffix}"] = pa.array(np.concatenate(values) if values else [], type=pa.int8())
+    criteria = _dataset_criteria()
+    for criterion in criteria:
+        columns[f"NOS_{criterion}"] = _criterion_column(groups, criterion)
+    
+    details = []
+    for study in studies:
+        extra = {key: value for key, value in study.items() if key not in tabular}
+        details.append(json.dumps(extra, default=str) if extra else None)
+    columns['details'] = pa.array(details, type=pa.string())
+    return pa.table(columns, metadata={'nos.dataset_version': "1", 'nos.criteria': json.dumps(criteria)})
+
+def _study_type_slices(table):
+    """Contiguous slices of a table sorted by study type, one per type"""
+    if not table.num_rows:
+        return [table]
+    codes = table.column('study_type').combine_chunks().indices.to_numpy(zero_copy_only=False)
+    bounds = [0, *(np.flatnonzero(np.diff(codes)) + 1), table.num_rows]
+    return [table.slice(start, stop - start) for start, stop in zip(bounds, bounds[1:])]
+
+def export_assessment_dataset(studies, dataset_format):
+    """Parquet or Arrow IPC bytes of the portfolio"""
+    table = build_assessment_table(studies)
+    sink = pa.BufferOutputStream()
+    if dataset_format == "Parquet":
+        with pq.ParquetWriter(sink, table.schema, compression="zstd") as writer:
+            for group in _study_type_slices(table):
+                writer.write_table(group, row_group_size=DATASET_ROW_GROUP_SIZE)
+    else:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            for group in _study_type_slices(table):
+                writer.write_table(group, max_chunksize=DATASET_ROW_GROUP_SIZE)
+    return sink.getvalue().to_pybytes()
+
+def read_assessment_dataset(data, filename):
+    """Arrow table from Parquet or Arrow IPC bytes; the IPC file is read without copying its buffers"""
+    if filename.lower().endswith(".parquet"):
+        return pq.read_table(pa.BufferReader(data))
+    return pa.ipc.open_file(pa.BufferReader(data)).read_all()
+
+def _column_values(column):
+    """Python values of a column; dictionary columns are decoded through their (small) dictionary"""
+    column = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    if pa.types.is_dictionary(column.type):
+        dictionary = column.dictionary.to_pylist() + [None]
+        codes = column.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+        return [dictionary[code] for code in codes.tolist()]
+    return column.to_pylist()
+
+def studies_from_table(table):
+    """Study dicts from a table written by build_assessment_table"""
+    criteria = [name[4:] for name in table.column_names if name.startswith("NOS_")]
+    fields = [field for field in (*DATASET_TEXT_FIELDS, *DATASET_CATEGORY_FIELDS, *DATASET_INT_FIELDS,
+                                  *DATASET_FLOAT_FIELDS) if field in table.column_names]
+    values = {name: _column_values(table.column(name)) for name in fields + [f"NOS_{c}" for c in criteria]}
+    details = table.column('details').to_pylist() if 'details' in table.column_names else [None] * table.num_rows
+    dates = (pd.Series(table.column('assessment_date').to_pandas()).dt.strftime("%Y-%m-%d %H:%M:%S").tolist()
+             if 'assessment_date' in table.column_names else [None] * table.num_rows)
+    studies = []
+    for row in range(table.num_rows):
+        study = json.loads(details[row]) if details[row] else {}
+        study.update({field: values[field][row] for field in fields if values[field][row] is not None})
+        for field in DATASET_FLOAT_FIELDS:
+            study.setdefault(field, None)
+        if isinstance(dates[row], str):
+            study['assessment_date'] = dates[row]
+        study['assessment'] = {criterion: values[f"NOS_{criterion}"][row] for criterion in criteria
+                               if values[f"NOS_{criterion}"][row] is not None}
+        studies.append(study)
+    return studies
+
+# Excel workbook export
+# Written with xlsxwriter in constant_memory mode: each row is flushed to a temporary file as
+# soon as the next one starts, so memory stays flat however many studies are exported.  Rows
+# must therefore be written top to bottom, and the per-study sheets are filled in one pass.
+EXCEL_SHEETS = ("Publication Table", "Detailed Data", "Domain Statistics", "Star Distribution", "By Study Type")
+EXCEL_FONT_COLORS = {"Good Quality": "#FFFFFF", "Fair Quality": "#212529", "Poor Quality": "#FFFFFF"}
+
+def _excel_formats(workbook):
+    """Header, number and Good/Fair/Poor formats shared by every sheet"""
+    formats = {
+        'header': workbook.add_format({'bold': True, 'bg_color': "#2c3e50", 'font_color': "#FFFFFF", 'border': 1}),
+        'percent': workbook.add_format({'num_format': "0.0"}),
+        'decimal': workbook.add_format({'num_format': "0.00"})
+    }
+    for rating, color in QUALITY_COLORS.items():
+        formats[rating] = workbook.add_format({'bg_color': color, 'font_color': EXCEL_FONT_COLORS[rating]})
+    return formats
+
+def _write_excel_header(worksheet, columns, formats, width=14):
+    worksheet.write_row(0, 0, columns, formats['header'])
+    worksheet.set_column(0, len(columns) - 1, width)
+    worksheet.freeze_panes(1, 0)
+
+def _format_quality_column(worksheet, column, last_row, formats):
+    """Conditional formats reproducing the app's Good/Fair/Poor colours"""
+    if last_row < 1:
+        return
+    for rating in QUALITY_COLORS:
+        worksheet.conditional_format(1, column, last_row, column, {
+            'type': 'cell', 'criteria': '==', 'value': f'"{rating}"', 'format': formats[rating]})
+
+def export_excel_workbook(studies):
+    """XLSX bytes with publication, detailed, domain, star distribution and study type sheets"""
+    types = list(dict.fromkeys(study['study_type'] for study in studies))
+    domains = list(dict.fromkeys(domain for study_type in types for domain in NOS_CRITERIA[study_type]))
+    criteria = list(dict.fromkeys(name for study_type in types for domain in NOS_CRITERIA[study_type].values()
+                                  for name in domain))
+    detailed_columns = ['Study_ID', 'Study_Name', 'First_Author', 'All_Authors', 'Publication_Year', 'Journal',
+                        'DOI', 'Study_Type', 'Assessment_Date', 'Total_Stars', 'Max_Possible_Stars',
+                        'Quality_Rating', 'Quality_Percentage', 'Notes']
+    for domain in domains:
+        detailed_columns += [f'{domain}_Stars', f'{domain}_Max_Stars', f'{domain}_Percentage']
+    detailed_columns += [f'NOS_{criterion}' for criterion in criteria]
+    publication_columns = ['Reference', 'Study Design', 'Selection', 'Comparability', 'Outcome/Exposure',
+                           'Total Score', 'Quality Assessment']
+    
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'strings_to_urls': False})
+        formats = _excel_formats(workbook)
+        sheets = {name: workbook.add_worksheet(name) for name in EXCEL_SHEETS}
+        _write_excel_header(sheets["Publication Table"], publication_columns, formats, width=18)
+        _write_excel_header(sheets["Detailed Data"], detailed_columns, formats)
+        
+        # One pass over the studies fills both per-study sheets and the aggregates
+        percent_columns = {column for column, name in enumerate(detailed_columns) if name.endswith('_Percentage')}
+        domain_totals = {domain: [0, 0, 0] for domain in domains}
+        star_counts = {}
+        type_totals = {study_type: {'Studies': 0, 'Good Quality': 0, 'Fair Quality': 0, 'Poor Quality': 0,
+                                    'stars': 0, 'max_stars': 0} for study_type in types}
+        # Typed writers skip xlsxwriter's per-cell type sniffing, which dominates large exports
+        write_publication = sheets["Publication Table"].write_string
+        write_string, write_number = sheets["Detailed Data"].write_string, sheets["Detailed Data"].write_number
+        for row, (study, quality) in enumerate(zip(studies, quality_labels(studies)), 1):
+            domain_scores = calculate_domain_scores(study)
+            for column, value in enumerate(publication_table_row(study, domain_scores, quality).values()):
+                write_publication(row, column, value)
+            values = detailed_export_row(study, domain_scores, row, quality)
+            for column, name in enumerate(detailed_columns):
+                value = values.get(name)
+                if isinstance(value, str):
+                    if value:
+                        write_string(row, column, value)
+                elif value is not None:
+                    write_number(row, column, value, formats['percent'] if column in percent_columns else None)
+            for domain, scores in domain_scores.items():
+                totals = domain_totals[domain]
+                totals[0] += scores['stars']
+                totals[1] += scores['max_stars']
+                totals[2] += 1
+            star_counts[study['total_stars']] = star_counts.get(study['total_stars'], 0) + 1
+            totals = type_totals[study['study_type']]
+            totals['Studies'] += 1
+            totals[quality] += 1
+            totals['stars'] += study['total_stars']
+            totals['max_stars'] += get_max_stars(study['study_type'])
+        _format_quality_column(sheets["Publication Table"], publication_columns.index('Quality Assessment'),
+                               len(studies), formats)
+        _format_quality_column(sheets["Detailed Data"], detailed_columns.index('Quality_Rating'), len(studies), formats)
+        sheets["Detailed Data"].autofilter(0, 0, len(studies), len(detailed_columns) - 1)
+        
+        worksheet = sheets["Domain Statistics"]
+        _write_excel_header(worksheet, ['Domain', 'Studies', 'Total Stars', 'Possible Stars', 'Average Stars',
+                                        'Average %'], formats, width=16)
+        for row, (domain, (stars, possible, count)) in enumerate(domain_totals.items(), 1):
+            worksheet.write_row(row, 0, [domain, count, stars, possible])
+            worksheet.write(row, 4, stars / count if count else 0, formats['decimal'])
+            worksheet.write(row, 5, stars / possible * 100 if possible else 0, formats['percent'])
+        
+        worksheet = sheets["Star Distribution"]
+        _write_excel_header(worksheet, ['Total Stars', 'Studies', '% of Studies'], formats)
+        for row, stars in enumerate(sorted(star_counts), 1):
+            worksheet.write_row(row, 0, [stars, star_counts[stars]])
+            worksheet.write(row, 2, star_counts[stars] / len(studies) * 100, formats['percent'])
+        if star_counts:
+            chart = workbook.add_chart({'type': 'column'})
+            chart.add_series({'name': "Studies", 'categories': ["Star Distribution", 1, 0, len(star_counts), 0],
+                              'values': ["Star Distribution", 1, 1, len(star_counts), 1]})
+            chart.set_x_axis({'name': "Total stars"})
+            chart.set_legend({'none': True})
+            worksheet.insert_chart(1, 4, chart)
+        
+        worksheet = sheets["By Study Type"]
+        _write_excel_header(worksheet, ['Study Type', 'Studies', 'Good Quality', 'Fair Quality', 'Poor Quality',
+                                        'Mean Stars', 'Mean % of Maximum'], formats, width=18)
+        for row, (study_type, totals) in enumerate(type_totals.items(), 1):
+            worksheet.write_row(row, 0, [study_type, totals['Studies'], totals['Good Quality'],
+                                         totals['Fair Quality'], totals['Poor Quality']])
+            worksheet.write(row, 5, totals['stars'] / totals['Studies'], formats['decimal'])
+            worksheet.write(row, 6, totals['stars'] / totals['max_stars'] * 100 if totals['max_stars'] else 0,
+                            formats['percent'])
+        workbook.close()
+        with open(path, "rb") as fh:
+            return fh.read()
+    finally:
+        os.remove(path)
+
+# Prometheus-style metrics
+METRICS_HOST = os.environ.get("NOS_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("NOS_METRICS_PORT", "9464") or 0)
+SESSION_ACTIVE_SECONDS = 15 * 60
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+class MetricsRegistry:
+    """Counters, histograms and per-session gauges rendered in the text exposition format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._sessions = {}
+
+    def inc(self, name, help_text, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._help[name] = ('counter', help_text)
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, help_text, value, buckets=LATENCY_BUCKETS, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._help[name] = ('histogram', help_text)
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = {'buckets': buckets, 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            histogram = series[key]
+            for idx, bound in enumerate(histogram['buckets']):
+                if value <= bound:
+                    histogram['counts'][idx] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def touch_session(self, session_id, approx_bytes):
+        with self._lock:
+            self._sessions[session_id] = (time.time(), approx_bytes)
+
+    def update_session_bytes(self, session_id, approx_bytes):
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions[session_id] = (self._sessions[session_id][0], approx_bytes)
+
+    def forget_session(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def render(self):
+        """Return all metrics in Prometheus text exposition format"""
+        lines = []
+        now = time.time()
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {self._help[name][1]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {self._help[name][1]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    for bound, count in zip(histogram['buckets'], histogram['counts']):
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', bound),))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {histogram['count']}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram['sum']}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram['count']}")
+            
+            active = [(seen, size) for seen, size in self._sessions.values()
+                      if now - seen <= SESSION_ACTIVE_SECONDS]
+            lines.append("# HELP nos_sessions Sessions seen in the last 15 minutes")
+            lines.append("# TYPE nos_sessions gauge")
+            lines.append(f"nos_sessions {len(active)}")
+            lines.append("# HELP nos_session_state_bytes Approximate portfolio bytes held in session state")
+            lines.append("# TYPE nos_session_state_bytes gauge")
+            lines.append(f"nos_session_state_bytes {sum(size for _, size in self._sessions.values())}")
+        return "\n".join(lines) + "\n"
+
+def _send_body(handler, body, content_type, headers=None):
+    handler.send_response(200)
+    handler.send_header('Content-Type', content_type)
+    handler.send_header('Content-Length', str(len(body)))
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    handler.end_headers()
+    handler.wfile.write(body)
+
+def _make_metrics_handler(registry):
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            _send_body(self, registry.render().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8')
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+def _make_change_feed_handler(change_feeds, token=""):
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import parse_qs, urlsplit
+
+    class ChangeFeedHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path != '/changes':
+                self.send_error(404)
+                return
+            if token and not hmac.compare_digest(self.headers.get('Authorization', ""), f"Bearer {token}"):
+                self.send_error(401, "A valid bearer token is required")
+                return
+            query = parse_qs(url.query)
+            feed = change_feeds.get(query.get('project', [""])[0])
+            if feed is None:
+                self.send_error(404, "Unknown project")
+                return
+            try:
+                after = int(query.get('after', ["0"])[0])
+                limit = min(int(query.get('limit', [str(CDC_PULL_LIMIT)])[0]), CDC_PULL_LIMIT)
+            except ValueError:
+                self.send_error(400, "after and limit must be integers")
+                return
+            records, cursor = feed.read_since(after, limit)
+            body = "".join(json.dumps(record, default=str) + "\n" for record in records).encode('utf-8')
+            _send_body(self, body, 'application/x-ndjson', {'X-Next-Cursor': str(cursor)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ChangeFeedHandler
+
+def _is_loopback(host):
+    try:
+        return host == "localhost" or ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def _serve_in_thread(handler, host, port, name):
+    from http.server import ThreadingHTTPServer
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError:
+        return None
+    thread = threading.Thread(target=server.serve_forever, name=name, daemon=True)
+    thread.start()
+    return server
+
+def start_metrics_server(registry, host=METRICS_HOST, port=METRICS_PORT):
+    """Serve /metrics from a daemon thread; returns the server or None if disabled or the port is taken"""
+    if not port:
+        return None
+    return _serve_in_thread(_make_metrics_handler(registry), host, port, "nos-metrics")
+
+def start_change_feed_server(change_feeds, host=CDC_HOST, port=CDC_PORT, token=CDC_TOKEN):
+    """Serve /changes from a daemon thread; returns the server or None if it cannot be started.
+
+    Disabled with port 0, and refused for an address reachable from other machines
+    unless a token is configured.
+    """
+    if not port or not (token or _is_loopback(host)):
+        return None
+    return _serve_in_thread(_make_change_feed_handler(change_feeds, token), host, port, "nos-changes")
+
+@st.cache_resource
+def get_metrics():
+    """Process-wide metrics registry; the scrape endpoint starts with it"""
+    registry = MetricsRegistry()
+    registry.server = start_metrics_server(registry)
+    return registry
+
+def estimate_session_bytes():
+    """Approximate pickled size of this session's portfolio, refreshed after each change"""
+    cached = st.session_state.get('memory_estimate')
+    if cached is None or cached[0] != st.session_state.portfolio_revision:
+        cached = (st.session_state.portfolio_revision,
+                  len(pickle.dumps(list(st.session_state.studies), protocol=pickle.HIGHEST_PROTOCOL)))
+        st.session_state.memory_estimate = cached
+    return cached[1]
+
+# Idle-session eviction
+SESSION_IDLE_SECONDS = float(os.environ.get("NOS_SESSION_IDLE_SECONDS", "1800"))
+SESSION_SPILL_DIR = os.environ.get("NOS_SPILL_DIR", os.path.join(tempfile.gettempdir(), "nos_session_spill"))
+
+class SessionMemoryManager:
+    """Tracks each session's portfolio size and spills idle portfolios to disk.
+
+    The manager only holds weak references to the sessions' StudyList
+    objects, so closed tabs are released as usual. Spilling empties the list,
+    its undo history and every cache registered on it in place; the next
+    interaction reloads the studies and history.
+    """
+
+    def __init__(self, metrics, idle_seconds=SESSION_IDLE_SECONDS, spill_dir=SESSION_SPILL_DIR):
+        self._lock = threading.RLock()
+        self._sessions = {}
+        self._metrics = metrics
+        self.idle_seconds = idle_seconds
+        self.spill_dir = spill_dir
+        self.forget_hooks = []
+        os.makedirs(spill_dir, exist_ok=True)
+        sweeper = threading.Thread(target=self._sweep_forever, name="nos-session-sweeper", daemon=True)
+        sweeper.start()
+
+    def _spill_path(self, session_id):
+        return os.path.join(self.spill_dir, f"{session_id}.pkl")
+
+    def _forget(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        self._metrics.forget_session(session_id)
+        with contextlib.suppress(OSError):
+            os.remove(self._spill_path(session_id))
+        for hook in self.forget_hooks:
+            hook(session_id)
+
+    def activate(self, session_id, studies):
+        """Mark the session busy for this rerun, rehydrating its portfolio if it was spilled"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry['studies']() is not studies:
+                entry = self._sessions[session_id] = {
+                    'studies': weakref.ref(studies, lambda _ref, sid=session_id: self._forget(sid)),
+                    'spilled': False,
+                    'bytes': 0
+                }
+            entry['busy'] = True
+            entry['last_seen'] = time.time()
+            if entry['spilled']:
+                with open(self._spill_path(session_id), 'rb') as fh:
+                    studies[:], undo, redo = pickle.load(fh)
+                if getattr(studies, 'history', None) is not None:
+                    studies.history.restore(undo, redo)
+                os.remove(self._spill_path(session_id))
+                entry['spilled'] = False
+
+    def record_size(self, session_id, approx_bytes):
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions[session_id]['bytes'] = approx_bytes
+
+    def release(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry['busy'] = False
+                entry['last_seen'] = time.time()
+
+    def sweep(self, now=None):
+        """Spill every portfolio idle for longer than the timeout; returns the number spilled"""
+        now = time.time() if now is None else now
+        spilled = 0
+        with self._lock:
+            for session_id, entry in list(self._sessions.items()):
+                studies = entry['studies']()
+                if studies is None or entry['busy'] or entry['spilled']:
+                    continue
+                if now - entry['last_seen'] < self.idle_seconds:
+                    continue
+                # A list created before history was attached to it has none to spill
+                history = getattr(studies, 'history', None)
+                if not studies and not (history is not None and (history.undo or history.redo)):
+                    continue
+                # One pickle, so undo steps still share the study dicts the portfolio holds.
+                # Only the stacks are saved: reruns redefine UndoHistory, so its instances don't pickle.
+                stacks = (list(history.undo), list(history.redo)) if history is not None else ([], [])
+                with open(self._spill_path(session_id), 'wb') as fh:
+                    pickle.dump((list(studies), *stacks), fh, protocol=pickle.HIGHEST_PROTOCOL)
+                studies.clear()
+                if history is not None:
+                    history.clear()
+                for cache in studies.caches:
+                    cache.clear()
+                entry['spilled'] = True
+                self._metrics.update_session_bytes(session_id, 0)
+                spilled += 1
+        return spilled
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(max(1.0, min(self.idle_seconds / 4, 60.0)))
+            self.sweep()
+
+    def summary(self):
+        with self._lock:
+            entries = list(self._sessions.values())
+        return {
+            'sessions': len(entries),
+            'spilled': sum(1 for entry in entries if entry['spilled']),
+            'resident_bytes': sum(entry['bytes'] for entry in entries if not entry['spilled'])
+        }
+
+@st.cache_resource
+def get_session_memory():
+    manager = SessionMemoryManager(get_metrics())
+    # A closed session's scratch project is gone, and so is its audit trail
+    manager.forget_hooks.append(functools.partial(discard_scratch_audit, get_audit_logs()))
+    return manager
+
+def record_export(export_format, data, started):
+    """Record size and duration of a generated export"""
+    size = len(data.encode('utf-8')) if isinstance(data, str) else len(data)
+    metrics = get_metrics()
+    metrics.observe("nos_export_seconds", "Time to generate an export", time.perf_counter() - started,
+                    format=export_format)
+    metrics.observe("nos_export_bytes", "Size of generated exports", size, buckets=SIZE_BUCKETS,
+                    format=export_format)
+
+def main():
+    session_memory = get_session_memory()
+    session_memory.activate(st.session_state.session_id, st.session_state.studies)
+    session_bytes = estimate_session_bytes()
+    session_memory.record_size(st.session_state.session_id, session_bytes)
+    metrics = get_metrics()
+    get_change_feeds()
+    metrics.inc("nos_script_reruns_total", "Streamlit script reruns")
+    metrics.touch_session(st.session_state.session_id, session_bytes)
+    start_profiling()
+    try:
+        st.session_state.full_rerun_active = True
+        with profile_section("live_sync"):
+            # Pick up assessments saved by other reviewers on the shared channel
+            ensure_study_ids(st.session_state.studies)
+            sync_live_changes()
+            sync_queue()
+        
+        with profile_section("quality_scheme"):
+            sync_quality_scheme()
+        
+        with profile_section("header"):
+            render_header()
+        
+        with profile_section("sidebar"):
+            page = render_sidebar()
+        track_assessment_timer(page)
+        
+        render_started = time.perf_counter()
+        with profile_section(f"page:{page}"):
+            render_page(page)
+        metrics.observe("nos_page_render_seconds", "Page body render latency",
+                        time.perf_counter() - render_started, page=page)
+        
+        with profile_section("footer"):
+            render_footer()
+    finally:
+        stop_profiling()
+        st.session_state.full_rerun_active = False
+        session_memory.release(st.session_state.session_id)
+    
+    render_profiler_panel()
+
+def render_header():
+    # Enhanced Header
+    st.markdown("""
+    <div class="main-header">
+        <h1>📊 Newcastle-Ottawa Scale Assessment Tool</h1>
+        <h3>Advanced Systematic Risk of Bias Assessment for Observational Studies</h3>
+        <p style="margin: 10px 0 0 0; opacity: 0.9; font-size: 14px;">
+            Version 2.0 | Publication-Ready Assessments | Enhanced Analytics
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Developer information
+    st.markdown(f"""
+    <div class="developer-info">
+        <div style="display: grid; grid-template-columns: 2fr 1fr; gap: 20px; align-items: center;">
+            <div>
+                <strong>🎓 Developed by:</strong> Muhammad Nabeel Saddique<br>
+                <strong>📚 Institution:</strong> 4th Year MBBS Student, King Edward Medical University, Lahore, Pakistan<br>
+                <strong>🔬 Research Focus:</strong> Systematic Review, Meta-Analysis, Evidence-Based Medicine<br>
+                <strong>🏢 Founder:</strong> Nibras Research Academy - Mentoring young researchers in systematic reviews<br>
+                <strong>🛠️ Research Tools Expertise:</strong> Rayyan, Zotero, EndNote, WebPlotDigitizer, Meta-Converter, RevMan, MetaXL, Jamovi, CMA, OpenMeta, R Studio
+            </div>
+            <div style="text-align: center; background: white; padding: 15px; border-radius: 8px;">
+                <div style="font-size: 24px; font-weight: bold; color: #3498db;">
+                    {len(st.session_state.studies)}
+                </div>
+                <div style="font-size: 12px; color: #6c757d;">
+                    Studies Assessed
+                </div>
+            </div>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+def render_sidebar():
+    """Render the sidebar and return the selected page"""
+    # Sidebar
+    st.sidebar.header("🎛️ Assessment Controls")
+    
+    st.sidebar.text_input("👤 Reviewer", key="assessor_identity",
+                          help="Recorded in the audit trail for every change made in this session")
+    
+    st.sidebar.selectbox("⚖️ Quality Scheme", list(QUALITY_SCHEMES), format_func=QUALITY_SCHEMES.get,
+                         key="quality_scheme",
+                         help="How star totals are converted to Good/Fair/Poor; labels follow the scheme everywhere, "
+                              "change records and project summaries keep the standard cut-offs")
+    
+    for rubric_error in RUBRIC_ERRORS:
+        st.sidebar.warning(f"Rubric not loaded — {rubric_error}")
+    
+    # Undo / redo
+    history = st.session_state.undo_history
+    col1, col2 = st.sidebar.columns(2)
+    with col1:
+        if st.button("↩️ Undo", disabled=not history.undo, use_container_width=True,
+                     help=f"Undo: {history.undo[-1][0]}" if history.undo else "Nothing to undo"):
+            st.session_state.undo_notice = f"Undone: {undo_last_change()}"
+            st.rerun()
+    with col2:
+        if st.button("↪️ Redo", disabled=not history.redo, use_container_width=True,
+                     help=f"Redo: {history.redo[-1][0]}" if history.redo else "Nothing to redo"):
+            st.session_state.undo_notice = f"Redone: {redo_last_change()}"
+            st.rerun()
+    if 'undo_notice' in st.session_state:
+        st.sidebar.caption(st.session_state.pop('undo_notice'))
+    if 'save_notice' in st.session_state:
+        st.sidebar.warning(st.session_state.pop('save_notice'))
+    
+    # Project selection
+    workspace_projects = get_workspace().projects()
+    project_names = [SCRATCH_PROJECT] + sorted(workspace_projects)
+    selected_project = st.sidebar.selectbox(
+        "📁 Project", project_names,
+        index=project_names.index(st.session_state.project) if st.session_state.project in project_names else 0
+    )
+    if selected_project != st.session_state.project:
+        open_project(selected_project)
+        st.rerun()
+    
+    with st.sidebar.expander("➕ New Project"):
+        new_project_name = st.text_input("Project name", placeholder="e.g., Statins and dementia SR")
+        if st.session_state.project == SCRATCH_PROJECT and st.session_state.studies:
+            st.caption("Studies in the scratch project will be moved into the new project.")
+        if st.button("Create Project", use_container_width=True):
+            if not new_project_name.strip():
+                st.error("Please enter a project name")
+            elif new_project_name.strip() in workspace_projects or new_project_name.strip() == SCRATCH_PROJECT:
+                st.error("A project with this name already exists")
+            else:
+                create_project(new_project_name.strip())
+                st.rerun()
+    
+    # Quick stats in sidebar
+    if st.session_state.studies:
+        st.sidebar.markdown("### 📈 Quick Statistics")
+        stats = get_portfolio_statistics()
+        
+        col1, col2 = st.sidebar.columns(2)
+        with col1:
+            st.metric("Total Studies", stats['total_studies'])
+            st.metric("Good Quality", stats['quality_counts']['Good Quality'])
+        with col2:
+            st.metric("Overall Score", f"{stats['overall_quality_score']:.1f}%")
+            st.metric("Poor Quality", stats['quality_counts']['Poor Quality'])
+    
+    # Session memory
+    with st.sidebar.expander("🧠 Session Memory"):
+        memory_summary = get_session_memory().summary()
+        st.caption(f"This session: {estimate_session_bytes() / 1024:.1f} KB")
+        st.caption(f"Server: {memory_summary['sessions']} sessions, {memory_summary['spilled']} spilled to disk, "
+                   f"{memory_summary['resident_bytes'] / 1e6:.2f} MB resident")
+    
+    # Live collaboration
+    with st.sidebar.expander("🔔 Live Collaboration"):
+        channel = st.text_input("Shared project channel",
+                                value=st.session_state.live_channel,
+                                help="Reviewers on the same channel see each other's saved assessments")
+        if channel.strip() != st.session_state.live_channel:
+            join_live_channel(channel.strip())
+            st.rerun()
+        if st.session_state.live_channel:
+            st.caption(f"Connected to '{st.session_state.live_channel}' (event #{st.session_state.live_cursor})")
+            live_change_watcher()
+    
+    # Navigation
+    page = st.sidebar.selectbox(
+        "Select Action",
+        [
+            "🏠 Dashboard", 
+            "📝 Add New Study", 
+            "📚 View All Studies", 
+            "📊 Generate Report", 
+            "📈 Advanced Analytics",
+            "🧮 Meta-Analysis",
+            "👥 Review Assignments",
+            "⚖️ Adjudication",
+            "🔄 Compare Studies",
             "💾 Export Data",
             "📖 Assessment Guide"
         ]
     )
+    st.session_state.current_page = page
+    return page
+
+def render_workspace_overview():
+    """Summarise every workspace project from its rollup, without loading any studies"""
+    projects = get_workspace().projects()
+    if not projects:
+        return
+    
+    st.subheader("📁 Workspace Overview")
+    overview_rows = []
+    for name, rollup in sorted(projects.items()):
+        overview_rows.append({
+            'Project': name,
+            'Studies': rollup['studies'],
+            'Good': rollup.get('Good Quality', 0),
+            'Fair': rollup.get('Fair Quality', 0),
+            'Poor': rollup.get('Poor Quality', 0),
+            'Overall Score': f"{(rollup['total_stars'] / rollup['max_stars'] * 100) if rollup['max_stars'] else 0:.1f}%",
+            'Last Updated': rollup.get('updated', '')
+        })
+    st.dataframe(pd.DataFrame(overview_rows), use_container_width=True, hide_index=True)
+    
+    total_studies = sum(rollup['studies'] for rollup in projects.values())
+    total_stars = sum(rollup['total_stars'] for rollup in projects.values())
+    max_stars = sum(rollup['max_stars'] for rollup in projects.values())
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Projects", len(projects))
+    with col2:
+        st.metric("Studies Across Projects", total_studies)
+    with col3:
+        st.metric("Organisation Score", f"{(total_stars / max_stars * 100) if max_stars else 0:.1f}%")
+
+def render_meta_analysis_page():
+    st.header("🧮 Meta-Analysis")
+    
+    studies = st.session_state.studies
+    analyses = effect_analysis_keys(studies)
+    if not analyses:
+        st.info("No effect sizes recorded yet. Add an effect estimate and standard error when assessing a study.")
+        return
+    
+    # Overview across all outcomes; each effect measure of an outcome is pooled on its own
+    st.subheader("📋 Pooled Results by Outcome")
+    outcome_rows = []
+    for outcome, measure in analyses:
+        arrays = extract_effect_arrays(studies, outcome, measure)
+        row = meta_analysis_summary_row(outcome, pool_effects(arrays['yi'], arrays['vi']), measure)
+        row['Measure'] = measure
+        outcome_rows.append(row)
+    st.dataframe(pd.DataFrame(outcome_rows), use_container_width=True, hide_index=True)
+    mixed = {outcome for outcome, _ in analyses if sum(1 for other, _ in analyses if other == outcome) > 1}
+    if mixed:
+        st.warning(f"Studies of {', '.join(sorted(mixed))} report different effect measures; "
+                   "each measure is pooled separately.")
+    
+    outcome, measure = st.selectbox("Outcome", analyses, format_func=lambda key: f"{key[0]} ({key[1]})")
+    arrays = extract_effect_arrays(studies, outcome, measure)
+    yi, vi = arrays['yi'], arrays['vi']
+    # Studies that assessed this outcome are rated by its own outcome/exposure answers
+    views = {view['study_id']: view for view in get_outcome_views(outcome)}
+    subset = [views.get(studies[idx].get('study_id'), studies[idx]) for idx in arrays['indices']]
+    if arrays['excluded']:
+        st.caption(f"{arrays['excluded']} studies left out: "
+                   f"{'non-positive ratio or ' if measure in RATIO_MEASURES else ''}unusable standard error.")
+    
+    result = pool_effects(yi, vi)
+    if result is None:
+        st.info("No valid effect sizes for this outcome.")
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Pooled Estimate (RE)", f"{format_effect(result['random'], measure):.3f}")
+    with col2:
+        st.metric("95% CI", f"{format_effect(result['random'] - Z_95 * result['random_se'], measure):.3f} – "
+                            f"{format_effect(result['random'] + Z_95 * result['random_se'], measure):.3f}")
+    with col3:
+        st.metric("I²", f"{result['i2']:.1f}%")
+    with col4:
+        st.metric("Studies", result['k'])
+    st.caption(f"Fixed effect: {format_effect(result['fixed'], measure):.3f} | τ² = {result['tau2']:.4f} | "
+               f"Q = {result['q']:.2f} (p = {result['q_p_value']:.4f})")
+    
+    # Study-level estimates
+    st.subheader("🌲 Study Estimates")
+    random_weights = 1.0 / (vi + result['tau2'])
+    quality = quality_labels(subset)
+    forest_df = pd.DataFrame({
+        'Study': [s['study_name'] for s in subset],
+        'Quality': quality,
+        'Estimate': [format_effect(y, measure) for y in yi],
+        'Lower 95% CI': [format_effect(y - Z_95 * math.sqrt(v), measure) for y, v in zip(yi, vi)],
+        'Upper 95% CI': [format_effect(y + Z_95 * math.sqrt(v), measure) for y, v in zip(yi, vi)],
+        'Weight (RE) %': random_weights / random_weights.sum() * 100
+    }).round(4)
+    st.dataframe(forest_df, use_container_width=True, hide_index=True)
     
+    # Subgroup analysis
+    st.subheader("🧩 Subgroup Analysis")
+    subgroup_field = st.radio("Subgroup by", ["quality_rating", "study_type"], horizontal=True,
+                              format_func=lambda f: "Quality Rating" if f == "quality_rating" else "Study Type")
+    groups = np.array(quality if subgroup_field == "quality_rating" else [s[subgroup_field] for s in subset])
+    subgroup_results, between = pool_by_subgroup(yi, vi, groups)
+    st.dataframe(pd.DataFrame([meta_analysis_summary_row(group, res, measure)
+                               for group, res in subgroup_results.items()]),
+                 use_container_width=True, hide_index=True)
+    if between:
+        st.caption(f"Test for subgroup differences: Q = {between['q']:.2f}, df = {between['df']}, "
+                   f"p = {between['p_value']:.4f}")
+    
+    # Sensitivity analyses
+    st.subheader("🎯 Quality Sensitivity Analysis")
+    scenarios = quality_sensitivity_analysis(yi, vi, subset)
+    st.dataframe(pd.DataFrame([meta_analysis_summary_row(label, res, measure)
+                               for label, res in scenarios.items()]),
+                 use_container_width=True, hide_index=True)
+    
+    loo = leave_one_out(yi, vi)
+    if loo is not None:
+        st.subheader("🔁 Leave-One-Out Analysis")
+        loo_df = pd.DataFrame({
+            'Omitted Study': [s['study_name'] for s in subset],
+            'Quality': quality,
+            'Estimate (RE)': [format_effect(v, measure) for v in loo['random']],
+            'Lower 95% CI': [format_effect(m - Z_95 * se, measure) for m, se in zip(loo['random'], loo['random_se'])],
+            'Upper 95% CI': [format_effect(m + Z_95 * se, measure) for m, se in zip(loo['random'], loo['random_se'])],
+            'Estimate (FE)': [format_effect(v, measure) for v in loo['fixed']],
+            'I² (%)': loo['i2'],
+            'Change (RE)': np.abs(loo['random'] - result['random'])
+        }).sort_values('Change (RE)', ascending=False).round(4)
+        st.dataframe(loo_df, use_container_width=True, hide_index=True)
+
+def render_adjudication_page():
+    st.header("⚖️ Disagreement Adjudication")
+    
+    queue = get_adjudication_queue()
+    dual_reviewed = sum(1 for study in st.session_state.studies if len(study.get('reviewer_assessments') or {}) > 1)
+    if not queue.items:
+        st.info(f"No open disagreements ({dual_reviewed} dual-reviewed studies). A second reviewer records an "
+                "independent review by saving the same study on 'Add New Study' and ticking "
+                "*Record as an independent review*.")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Studies to Adjudicate", len(queue.by_study))
+    with col2:
+        st.metric("Open Disagreements", len({(key[0], key[2]) for key in queue.items}))
+    with col3:
+        st.metric("Dual-Reviewed Studies", dual_reviewed)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        pair = st.selectbox("Reviewer pair", [None] + sorted(queue.by_pair),
+                            format_func=lambda value: "All pairs" if value is None else " vs ".join(value))
+    with col2:
+        criterion = st.selectbox("Criterion", [None] + sorted(queue.by_criterion),
+                                 format_func=lambda value: "All criteria" if value is None else value.replace('_', ' ').title())
+    
+    worklist = queue.worklist(20, pair, criterion)
+    st.dataframe(pd.DataFrame([{
+        'Study': entry[5]['study_name'],
+        'Disputed Criteria': -entry[1],
+        'Rating Differs': "Yes" if entry[0] else "No",
+        'Reviewers': ", ".join(entry[5]['reviewer_assessments'])
+    } for entry in worklist]), use_container_width=True, hide_index=True)
+    st.caption("Studies whose reviewers reach different quality ratings come first, then those with the most disputed criteria.")
+    
+    entry = st.selectbox("Adjudicate", worklist, format_func=lambda entry: entry[5]['study_name'], key="adjudication_study")
+    study = entry[5]
+    criteria = {name: criterion for domain in NOS_CRITERIA[study['study_type']].values()
+                for name, criterion in domain.items()}
+    disputed = {}
+    for key in sorted(queue.by_study[study['study_id']], key=lambda key: key[2]):
+        disputed[key[2]] = queue.items[key]
+    
+    with st.form("adjudication_form"):
+        decisions = {}
+        for criterion_name, answers in disputed.items():
+            criterion = criteria.get(criterion_name)
+            if criterion is None:
+                continue
+            st.markdown(f"**{criterion['question']}**")
+            st.caption(" | ".join(f"{reviewer}: {criterion['options'].get(option, option)}"
+                                  for reviewer, option in answers.items()))
+            options = list(criterion['options'])
+            current = study['assessment'].get(criterion_name)
+            decisions[criterion_name] = st.radio("Consensus", options, format_func=criterion['options'].get,
+                                                 index=options.index(current) if current in options else 0,
+                                                 key=f"consensus_{study['study_id']}_{criterion_name}")
+        if st.form_submit_button("✅ Record Consensus", type="primary"):
+            record_consensus(study, decisions, current_assessor())
+            st.success(f"Consensus recorded for {len(decisions)} criteria of {study['study_name']}")
+            st.rerun()
+
+def render_assignment_page():
+    st.header("👥 Review Assignments")
+    
+    queue = st.session_state.assessment_queue
+    if not queue:
+        st.info("The assessment queue is empty. Import bibliography files on 'Add New Study' first.")
+        return
+    
+    # Roster, saved with the project's queue
+    st.subheader("📋 Reviewer Roster")
+    roster_rows = st.session_state.reviewer_roster_rows or [
+        {'Reviewer': current_assessor(), 'Capacity': 1.0, 'Conflicts of Interest': ""}]
+    edited = st.data_editor(pd.DataFrame(roster_rows), num_rows="dynamic", use_container_width=True,
+                            hide_index=True, key="reviewer_roster_editor", column_config={
+                                'Capacity': st.column_config.NumberColumn(min_value=0.1, max_value=5.0, step=0.1,
+                                                                          help="Relative share of the workload"),
+                                'Conflicts of Interest': st.column_config.TextColumn(
+                                    help="Author surnames this reviewer must not assess, comma-separated")
+                            })
+    roster = {}
+    for row in edited.to_dict("records"):
+        name = str(row.get('Reviewer') or "").strip()
+        if name and name not in roster:
+            roster[name] = {'capacity': row.get('Capacity') or 1.0,
+                            'conflicts': author_surnames(str(row.get('Conflicts of Interest') or ""))}
+    
+    efforts = get_effort_estimates()
+    col1, col2 = st.columns(2)
+    with col1:
+        reviews_per_study = st.radio("Reviewers per study", [1, 2], index=1, horizontal=True,
+                                     format_func=lambda count: "Dual review" if count == 2 else "Single review")
+    with col2:
+        st.caption("Estimated minutes per assessment (timed assessments, else gaps between saves): " +
+                   ", ".join(f"{(study_type or 'Unknown design').replace(' Studies', '')} {minutes:.0f}"
+                             for study_type, minutes in efforts.items()))
+    
+    if st.button("⚖️ Assign & Rebalance", type="primary", disabled=len(roster) < reviews_per_study):
+        def assign(stored_queue, stored_roster):
+            stored_roster[:] = edited.to_dict("records")
+            return assign_reviewers(stored_queue, roster, reviews_per_study, efforts)
+        started = time.perf_counter()
+        result = change_queue(assign)
+        st.success(f"{result['assigned']} new assignments, {result['moved']} moved to rebalance "
+                   f"({time.perf_counter() - started:.2f}s)")
+        if result['unfilled']:
+            st.warning(f"{result['unfilled']} review slots could not be filled because of conflicts of interest "
+                       "or too few reviewers.")
+    
+    if roster:
+        st.subheader("⚖️ Workload")
+        st.dataframe(workload_summary(queue, roster, efforts), use_container_width=True, hide_index=True)
+        
+        reviewer = st.selectbox("Personal queue", list(roster), key="assignment_reviewer",
+                                index=list(roster).index(current_assessor()) if current_assessor() in roster else 0)
+        assigned = [record for record in queue if reviewer in record.get('assigned_to', ())]
+        if assigned:
+            personal_df = pd.DataFrame([{
+                'Study': record['study_name'],
+                'Title': record['title'],
+                'Likely Design': record.get('likely_study_type') or "Unknown",
+                'Co-Reviewers': ", ".join(name for name in record['assigned_to'] if name != reviewer)
+            } for record in assigned])
+            st.dataframe(personal_df, use_container_width=True, hide_index=True)
+            st.download_button(f"📥 Download {reviewer}'s Queue", personal_df.to_csv(index=False),
+                               file_name=f"assignments_{re.sub(r'[^A-Za-z0-9]+', '_', reviewer)}.csv",
+                               mime="text/csv")
+        else:
+            st.caption("No studies assigned to this reviewer yet.")
+
+def render_page(page):
     # Dashboard Page
     if page == "🏠 Dashboard":
         st.header("🏠 Assessment Dashboard")
@@ -1121,7 +5648,7 @@ def main():
                                   key=lambda x: x['assessment_date'], reverse=True)[:3]
             
             for study in recent_studies:
-                study_card = create_study_summary_card(study)
+                study_card = get_study_card_html(study)
                 st.markdown(study_card, unsafe_allow_html=True)
             
             # Quick actions
@@ -1144,6 +5671,9 @@ def main():
                 if st.button("💾 Export Data", use_container_width=True):
                     st.session_state.selected_page = "Export Data"
             
+            # Cross-project summary from per-project rollups
+            render_workspace_overview()
+            
         else:
             # Welcome screen
             st.markdown("""
@@ -1162,11 +5692,107 @@ def main():
             with col2:
                 if st.button("🚀 Start Your First Assessment", type="primary", use_container_width=True):
                     st.session_state.selected_page = "Add New Study"
+            
+            render_workspace_overview()
     
     # Add New Study Page
     elif page == "📝 Add New Study":
         st.header("📝 Enhanced Study Assessment")
         
+        # Bibliographic import feeding the assessment queue
+        queue = st.session_state.assessment_queue
+        with st.expander(f"📥 Import & Assessment Queue ({len(queue)} waiting)", expanded=bool(queue)):
+            uploads = st.file_uploader("Bibliography files", accept_multiple_files=True,
+                                       type=["ris", "nbib", "txt", "bib", "xml"],
+                                       help="; ".join(IMPORT_FORMATS.values()))
+            skip_duplicates = st.checkbox("Skip records already in the portfolio or queue", value=True)
+            if uploads and st.button("Import into Queue"):
+                import_errors = []
+                added, skipped = enqueue_records(import_bibliographies(uploads, import_errors), skip_duplicates)
+                for import_error in import_errors:
+                    st.error(import_error)
+                st.success(f"Queued {added} records" + (f", skipped {skipped} duplicates" if skipped else ""))
+                st.rerun()
+            
+            # Once work is assigned, each reviewer (named in the sidebar) sees their own queue
+            visible_queue = queue
+            if any(record.get('assigned_to') for record in queue) and st.toggle(
+                    "Only my assignments", value=True, key="queue_mine",
+                    help=f"Records assigned to {current_assessor()} on the Review Assignments page"):
+                visible_queue = [record for record in queue if current_assessor() in record.get('assigned_to', ())]
+                st.caption(f"{len(visible_queue)} of {len(queue)} queued records are assigned to {current_assessor()}.")
+            if visible_queue:
+                queue_ids = [record['queue_id'] for record in visible_queue]
+                if st.session_state.get('queue_selection') not in queue_ids:
+                    st.session_state.queue_selection = queue_ids[0]
+                queue_labels = {record['queue_id']: f"{record['study_name']} — {record['title'][:70]}"
+                                for record in visible_queue[:1000]}
+                col1, col2 = st.columns([4, 1])
+                with col1:
+                    st.selectbox("Assess next", list(queue_labels), format_func=queue_labels.get, key="queue_selection")
+                with col2:
+                    if st.button("Remove from Queue"):
+                        dequeue(st.session_state.queue_selection)
+                        st.rerun()
+                if len(visible_queue) > 1000:
+                    st.caption(f"Showing the first 1000 of {len(visible_queue)} queued records.")
+        
+        queued = next((record for record in queue if record['queue_id'] == st.session_state.get('queue_selection')), {})
+        
+        # Full-text evidence from local PDFs
+        library = st.session_state.setdefault('pdf_library', {})
+        with st.expander(f"📄 Full-Text Evidence ({len(library)} papers)"):
+            if pdf_evidence.PdfReader is None:
+                st.info("Install `pypdf` to extract text from new PDFs; previously extracted papers are read from the cache.")
+            pdf_uploads = st.file_uploader("PDF full texts", type=["pdf"], accept_multiple_files=True,
+                                           key="pdf_uploads")
+            pdf_folder = ""
+            if PDF_ROOT:
+                pdf_folder = st.text_input("Or a folder of PDFs on the server", placeholder="e.g., my-review/full-texts",
+                                           help="Relative to the server's PDF directory (NOS_PDF_ROOT)")
+            if (pdf_uploads or pdf_folder) and st.button("Extract PDFs"):
+                extraction_started = time.perf_counter()
+                try:
+                    documents = extract_pdf_folder(pdf_folder) if pdf_folder else []
+                    documents = extract_pdf_uploads(pdf_uploads or []) + documents
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    for document in documents:
+                        if 'error' in document:
+                            st.warning(f"{document['file']}: {document['error']}")
+                        else:
+                            library[document['sha256']] = document
+                    st.success(f"Indexed {sum('error' not in d for d in documents)} of {len(documents)} PDFs "
+                               f"in {time.perf_counter() - extraction_started:.1f}s")
+            evidence_choices = [None] + sorted(library, key=lambda sha256: library[sha256]['file'])
+            evidence_sha = st.selectbox("Evidence paper for this assessment", evidence_choices,
+                                        format_func=lambda sha256: "None" if sha256 is None else library[sha256]['file'],
+                                        key="evidence_doc")
+        evidence = (library[evidence_sha], get_evidence_index(evidence_sha)) if evidence_sha else None
+        
+        study_type = st.selectbox("Study Type*", list(NOS_CRITERIA.keys()),
+                                  index=list(NOS_CRITERIA).index(queued['likely_study_type'])
+                                  if queued.get('likely_study_type') in NOS_CRITERIA else 0,
+                                  help="Select the appropriate study design")
+        
+        # Outcomes rated separately; only their outcome-domain answers are stored per outcome
+        col1, col2 = st.columns(2)
+        with col1:
+            primary_outcome = st.text_input("Primary Outcome", placeholder=PRIMARY_OUTCOME, key="primary_outcome_name")
+        with col2:
+            extra_outcomes_text = st.text_input("Additional Outcomes (comma-separated)", key="additional_outcomes",
+                                                placeholder="e.g., Readmission, Quality of life",
+                                                help="Each additional outcome gets its own outcome/exposure answers")
+        extra_outcomes = list(dict.fromkeys(
+            name.strip() for name in extra_outcomes_text.split(",")
+            if name.strip() and name.strip() != (primary_outcome.strip() or PRIMARY_OUTCOME)
+        ))
+        
+        # Criteria answered outside the form: each answer is timed as it is given and reruns
+        # only its own section, while the study details below are sent once on save
+        assessment, outcome_answers = show_timed_assessment(study_type, extra_outcomes, evidence)
+        
         # Study information form
         with st.form("enhanced_study_assessment"):
             # Basic study information
@@ -1174,21 +5800,20 @@ def main():
             
             col1, col2, col3 = st.columns(3)
             with col1:
-                study_name = st.text_input("Study Name/Identifier*", 
+                study_name = st.text_input("Study Name/Identifier*", value=queued.get('study_name', ""),
                                          placeholder="e.g., Smith et al. 2023",
                                          help="Unique identifier for this study")
-                study_type = st.selectbox("Study Type*", list(NOS_CRITERIA.keys()),
-                                        help="Select the appropriate study design")
             
             with col2:
-                authors = st.text_input("Authors*", 
+                authors = st.text_input("Authors*", value=queued.get('authors', ""),
                                       placeholder="Smith J, Brown K, Wilson L",
                                       help="List all authors (separate with commas)")
-                publication_year = st.number_input("Publication Year*", 
-                                                 min_value=1900, max_value=2024, value=2023)
+                latest_year = max(2024, datetime.now().year)
+                publication_year = st.number_input("Publication Year*", min_value=1900, max_value=latest_year,
+                                                 value=min(max(queued.get('publication_year') or 2023, 1900), latest_year))
             
             with col3:
-                journal = st.text_input("Journal*", 
+                journal = st.text_input("Journal*", value=queued.get('journal', ""),
                                        placeholder="Journal of Clinical Medicine")
                 sample_size = st.number_input("Sample Size", min_value=0, value=0,
                                             help="Total number of participants")
@@ -1198,22 +5823,39 @@ def main():
             col1, col2 = st.columns(2)
             
             with col1:
-                doi = st.text_input("DOI", placeholder="10.1000/xyz123")
+                doi = st.text_input("DOI", value=queued.get('doi', ""), placeholder="10.1000/xyz123")
                 country = st.text_input("Country/Region", placeholder="e.g., United States")
                 funding = st.text_input("Funding Source", placeholder="e.g., NIH, Industry")
             
             with col2:
-                pmid = st.text_input("PubMed ID", placeholder="12345678")
+                pmid = st.text_input("PubMed ID", value=queued.get('pmid', ""), placeholder="12345678")
                 follow_up = st.text_input("Follow-up Duration", placeholder="e.g., 5 years")
                 population = st.text_input("Study Population", placeholder="e.g., Adults >65 years")
             
-            # Assessment criteria
-            if study_type:
-                assessment = show_assessment_form(study_type)
+            # Effect sizes for meta-analysis, one per assessed outcome
+            st.subheader("📈 Effect Size (optional)")
+            effect_outcome = primary_outcome.strip() or PRIMARY_OUTCOME
+            effects = {}
+            for outcome in [effect_outcome] + extra_outcomes:
+                suffix = "" if outcome == effect_outcome else f"_{outcome}"
+                col1, col2, col3, col4 = st.columns(4)
                 
-                # Show progress
-                progress_html = create_assessment_progress_bar(assessment, study_type)
-                st.markdown(progress_html, unsafe_allow_html=True)
+                with col1:
+                    st.markdown(f"**Outcome**  \n{outcome}", help="Studies are pooled per outcome; name outcomes above the form")
+                with col2:
+                    measure = st.selectbox("Effect Measure", EFFECT_MEASURES, key=f"effect_measure{suffix}")
+                with col3:
+                    estimate = st.number_input("Effect Estimate", value=None, format="%.4f", key=f"effect_estimate{suffix}",
+                                               help="Ratios on their natural scale, e.g. OR = 1.35")
+                with col4:
+                    error = st.number_input("Standard Error", value=None, min_value=0.0, format="%.4f",
+                                            key=f"standard_error{suffix}",
+                                            help="For ratio measures, the standard error of the log ratio")
+                effects[outcome] = {'effect_measure': measure, 'effect_estimate': estimate, 'standard_error': error}
+            primary_effect = effects.pop(effect_outcome)
+            effect_measure = primary_effect['effect_measure']
+            effect_estimate = primary_effect['effect_estimate']
+            standard_error = primary_effect['standard_error']
             
             # Additional assessment details
             st.subheader("📝 Assessment Notes")
@@ -1231,9 +5873,15 @@ def main():
                 limitations = st.text_area("Study Limitations", 
                                          placeholder="Key methodological limitations...",
                                          height=80)
-                assessor_name = st.text_input("Assessor Name", 
+                assessor_name = st.text_input("Assessor Name", value=st.session_state.get('assessor_identity', ""),
                                             placeholder="Your name")
             
+            allow_duplicate = st.checkbox("Save even if a possible duplicate is found",
+                                          help="Studies are checked against the portfolio by DOI, PMID and title/first author")
+            record_as_review = st.checkbox("Record as an independent review of the matching study",
+                                           help="For dual review: your answers are stored beside the first reviewer's "
+                                                "and disagreements go to the Adjudication page")
+            
             # Form submission
             col1, col2, col3 = st.columns([1, 2, 1])
             with col2:
@@ -1242,9 +5890,37 @@ def main():
                                                 use_container_width=True)
             
             if submitted:
-                if study_name and authors and journal and study_type:
+                possible_duplicates = get_duplicate_index().match({
+                    'study_name': study_name, 'title': queued.get('title'), 'authors': authors,
+                    'publication_year': publication_year, 'doi': doi, 'pmid': pmid
+                })
+                reviewed_study = st.session_state.studies[possible_duplicates[0][0]] if possible_duplicates else None
+                if record_as_review and reviewed_study is None:
+                    st.error("No matching study found in the portfolio to record this review against")
+                elif record_as_review and reviewed_study['study_type'] != study_type:
+                    st.error(f"**{reviewed_study['study_name']}** was assessed as {reviewed_study['study_type']}")
+                elif record_as_review and current_assessor() == "Unknown":
+                    st.error("Enter your name as 👤 Reviewer in the sidebar to record an independent review")
+                elif record_as_review:
+                    finish_assessment_timer(study_type, current_assessor())
+                    add_reviewer_assessment(reviewed_study, current_assessor(), assessment)
+                    open_items = len(find_disagreements(
+                        next(s for s in st.session_state.studies if s['study_id'] == reviewed_study['study_id'])))
+                    st.success(f"✅ Independent review recorded for **{reviewed_study['study_name']}** "
+                               f"({open_items} reviewer disagreements to adjudicate)")
+                elif possible_duplicates and not allow_duplicate:
+                    st.warning("⚠️ This study may already be in the portfolio:\n\n" + "\n".join(
+                        f"- **{st.session_state.studies[position]['study_name']}** "
+                        f"({st.session_state.studies[position]['publication_year']}) — {reason}"
+                        for position, reason, _ in possible_duplicates[:5]
+                    ) + "\n\nTick *Save even if a possible duplicate is found* to save it anyway, "
+                        "or *Record as an independent review* if you are the second reviewer.")
+                elif study_name and authors and journal and study_type:
+                    scoring_started = time.perf_counter()
                     total_stars = calculate_total_stars(assessment, study_type)
-                    quality_rating, quality_color = get_quality_rating(total_stars, study_type)
+                    quality_rating, quality_color = rate_assessment_quality(assessment, study_type)
+                    get_metrics().observe("nos_scoring_seconds", "Time to score a saved assessment",
+                                          time.perf_counter() - scoring_started)
                     
                     study_data = {
                         "study_name": study_name,
@@ -1258,10 +5934,13 @@ def main():
                         "follow_up": follow_up,
                         "population": population,
                         "funding": funding,
+                        "effect_outcome": effect_outcome,
+                        "effect_measure": effect_measure,
+                        "effect_estimate": effect_estimate,
+                        "standard_error": standard_error,
                         "study_type": study_type,
                         "assessment": assessment,
                         "total_stars": total_stars,
-                        "quality_rating": quality_rating,
                         "notes": notes,
                         "strengths": strengths,
                         "limitations": limitations,
@@ -1269,8 +5948,26 @@ def main():
                         "assessment_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                         "assessment_version": "2.0"
                     }
+                    if primary_outcome.strip():
+                        study_data["primary_outcome"] = primary_outcome.strip()
+                    if outcome_answers:
+                        study_data["outcome_assessments"] = outcome_answers
+                    outcome_effects = {outcome: effect for outcome, effect in effects.items()
+                                       if effect['effect_estimate'] is not None}
+                    if outcome_effects:
+                        study_data["outcome_effects"] = outcome_effects
+                    if queued:
+                        study_data["title"] = queued['title']
+                        dequeue(queued['queue_id'])
+                    study_data["reviewer_assessments"] = {
+                        current_assessor(): {'assessment': assessment,
+                                                       'assessment_date': study_data["assessment_date"]}
+                    }
+                    active_seconds = finish_assessment_timer(study_type, current_assessor())
+                    if active_seconds is not None:
+                        study_data["assessment_seconds"] = round(active_seconds)
                     
-                    st.session_state.studies.append(study_data)
+                    add_study(study_data)
                     
                     st.success(f"✅ Assessment saved successfully!")
                     
@@ -1279,9 +5976,9 @@ def main():
                     with col1:
                         st.metric("Quality Rating", quality_rating)
                     with col2:
-                        st.metric("Total Stars", f"{total_stars}/9")
+                        st.metric("Total Stars", f"{total_stars}/{get_max_stars(study_type)}")
                     with col3:
-                        overall_percentage = (total_stars / 9) * 100
+                        overall_percentage = (total_stars / get_max_stars(study_type)) * 100
                         st.metric("Overall Score", f"{overall_percentage:.1f}%")
                     
                     # Show domain breakdown
@@ -1305,6 +6002,56 @@ def main():
         st.header("📚 Study Portfolio")
         
         if st.session_state.studies:
+            with st.expander("🕘 Audit Trail"):
+                audit_log = get_audit_log()
+                audit_assessors = audit_log.assessors()
+                if audit_assessors:
+                    audit_assessor = st.selectbox("Changes by", audit_assessors)
+                    st.dataframe(pd.DataFrame([{
+                        'When': event['timestamp'],
+                        'Study': event['study_name'],
+                        'Action': event['action'],
+                        'Changes': ", ".join(change['field'].replace("assessment.", "") for change in event['changes'][:6])
+                                   + (" …" if len(event['changes']) > 6 else "")
+                    } for event in audit_log.assessor_history(audit_assessor)]), use_container_width=True, hide_index=True)
+                else:
+                    st.caption("No changes recorded in this project yet.")
+            
+            with st.expander("🧬 Duplicate Scan"):
+                if st.button("Scan portfolio for duplicates"):
+                    scan_started = time.perf_counter()
+                    st.session_state.duplicate_scan = (st.session_state.portfolio_revision,
+                                                       find_duplicate_pairs(st.session_state.studies),
+                                                       time.perf_counter() - scan_started)
+                scan = st.session_state.get('duplicate_scan')
+                if scan and scan[0] != st.session_state.portfolio_revision:
+                    st.info("The portfolio changed since the last scan; scan again to refresh the candidates.")
+                elif scan:
+                    _, pairs, scan_seconds = scan
+                    dismissed = st.session_state.setdefault('duplicate_dismissed', set())
+                    studies = st.session_state.studies
+                    pairs = [pair for pair in pairs
+                             if (studies[pair['first']]['study_id'], studies[pair['second']]['study_id']) not in dismissed]
+                    st.caption(f"{len(pairs)} candidate pairs among {len(studies)} studies ({scan_seconds:.2f}s)")
+                    for pair_idx, pair in enumerate(pairs[:50]):
+                        first, second = studies[pair['first']], studies[pair['second']]
+                        col1, col2, col3 = st.columns([5, 1, 1])
+                        with col1:
+                            st.write(f"**{first['study_name']}** ({first['publication_year']}) ↔ "
+                                     f"**{second['study_name']}** ({second['publication_year']}) — "
+                                     f"{pair['reason']} ({pair['score'] * 100:.0f}%)")
+                        with col2:
+                            if st.button("Merge", key=f"merge_duplicate_{pair_idx}",
+                                         help="Keep the first study, fill its blanks from the second and remove the second"):
+                                merge_duplicate_studies(first, second)
+                                st.rerun()
+                        with col3:
+                            if st.button("Not a duplicate", key=f"dismiss_duplicate_{pair_idx}"):
+                                dismissed.add((first['study_id'], second['study_id']))
+                                st.rerun()
+                    if len(pairs) > 50:
+                        st.caption("Showing the first 50 pairs; merge or dismiss them to see more.")
+            
             # Search and filter options
             col1, col2, col3 = st.columns(3)
             
@@ -1330,8 +6077,9 @@ def main():
                                   search_term.lower() in s['authors'].lower() or
                                   search_term.lower() in s['journal'].lower()]
             
+            quality = portfolio_quality()
             if quality_filter:
-                filtered_studies = [s for s in filtered_studies if s['quality_rating'] in quality_filter]
+                filtered_studies = [s for s in filtered_studies if quality[s['study_id']] in quality_filter]
             
             if type_filter:
                 filtered_studies = [s for s in filtered_studies if s['study_type'] in type_filter]
@@ -1348,7 +6096,7 @@ def main():
                 filtered_studies = sorted(filtered_studies, key=lambda x: x['study_name'])
             elif sort_by == "Quality Rating":
                 quality_order = {"Good Quality": 3, "Fair Quality": 2, "Poor Quality": 1}
-                filtered_studies = sorted(filtered_studies, key=lambda x: quality_order[x['quality_rating']], reverse=True)
+                filtered_studies = sorted(filtered_studies, key=lambda x: quality_order[quality[x['study_id']]], reverse=True)
             elif sort_by == "Total Stars":
                 filtered_studies = sorted(filtered_studies, key=lambda x: x['total_stars'], reverse=True)
             elif sort_by == "Publication Year":
@@ -1356,12 +6104,19 @@ def main():
             
             # Display studies
             for idx, study in enumerate(filtered_studies):
-                with st.expander(f"{study['study_name']} - {study['quality_rating']}", expanded=False):
+                with st.expander(f"{study['study_name']} - {quality[study['study_id']]}", expanded=False):
                     
                     # Study summary card
-                    study_card = create_study_summary_card(study)
+                    study_card = get_study_card_html(study)
                     st.markdown(study_card, unsafe_allow_html=True)
                     
+                    if study.get('outcome_assessments'):
+                        st.dataframe(pd.DataFrame([
+                            {'Outcome': outcome,
+                             **{domain: f"{scores['stars']}/{scores['max_stars']}" for domain, scores in domain_scores.items()}}
+                            for outcome, domain_scores in score_outcomes(study).items()
+                        ]), use_container_width=True, hide_index=True)
+                    
                     # Action buttons
                     col1, col2, col3, col4 = st.columns(4)
                     
@@ -1369,9 +6124,10 @@ def main():
                         if st.button(f"📋 Duplicate", key=f"duplicate_{idx}"):
                             # Create a copy of the study
                             new_study = study.copy()
+                            new_study.pop('study_id', None)
                             new_study['study_name'] = f"{study['study_name']} (Copy)"
                             new_study['assessment_date'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                            st.session_state.studies.append(new_study)
+                            add_study(new_study, label=f"Duplicate {study['study_name']}")
                             st.success("Study duplicated successfully!")
                             st.rerun()
                     
@@ -1391,9 +6147,6 @@ def main():
                                         option_text = criterion['options'][selected_option]
                                         stars = criterion['stars'].get(selected_option, 0)
                                         
-                                        if criterion_name == "comparability" and selected_option == "additional_factor":
-                                            stars = 2
-                                        
                                         star_display = "★" * stars if stars > 0 else "☆"
                                         st.write(f"- {criterion['question']}: {option_text} {star_display}")
                     
@@ -1414,9 +6167,12 @@ def main():
                     with col4:
                         if st.button(f"🗑️ Delete", key=f"delete_{idx}", type="secondary"):
                             if st.checkbox(f"Confirm deletion of {study['study_name']}", key=f"confirm_{idx}"):
-                                st.session_state.studies.remove(study)
+                                remove_study(study)
                                 st.success("Study deleted successfully!")
                                 st.rerun()
+                    
+                    if st.toggle("🕘 Show history", key=f"history_{idx}"):
+                        render_study_history(study, idx)
         else:
             st.info("No studies assessed yet. Go to 'Add New Study' to start.")
 # Generate Report Page
@@ -1438,6 +6194,14 @@ def main():
                 include_recommendations = st.checkbox("Include Methodological Recommendations", value=True)
                 include_charts = st.checkbox("Include Statistical Charts", value=True)
             
+            report_outcomes = list_outcomes(st.session_state.studies)
+            report_studies = st.session_state.studies
+            if len(report_outcomes) > 1:
+                report_outcome = st.selectbox("Outcome for risk-of-bias figures and table",
+                                              ["All studies (primary assessment)"] + report_outcomes)
+                if report_outcome in report_outcomes:
+                    report_studies = get_outcome_views(report_outcome)
+            
             st.markdown("---")
             
             # Generate selected reports
@@ -1447,19 +6211,19 @@ def main():
             
             if include_robvis:
                 st.subheader("📈 Risk of Bias Summary")
-                robvis_html = create_robvis_visualization(st.session_state.studies)
+                robvis_html = create_robvis_visualization(report_studies)
                 if robvis_html:
                     st.markdown(robvis_html, unsafe_allow_html=True)
             
             if include_heatmap:
                 st.subheader("🔍 Domain Heatmap")
-                heatmap_html = create_domain_heatmap(st.session_state.studies)
+                heatmap_html = create_domain_heatmap(report_studies)
                 if heatmap_html:
                     st.markdown(heatmap_html, unsafe_allow_html=True)
             
             if include_table:
                 st.subheader("📋 Publication-Ready Table")
-                pub_table = create_publication_ready_table(st.session_state.studies)
+                pub_table = create_publication_ready_table(report_studies)
                 if pub_table is not None:
                     st.dataframe(pub_table, use_container_width=True)
                     
@@ -1476,7 +6240,7 @@ def main():
                 st.subheader("📊 Statistical Charts")
                 
                 # Quality distribution
-                stats = generate_summary_statistics(st.session_state.studies)
+                stats = get_portfolio_statistics()
                 
                 col1, col2 = st.columns(2)
                 
@@ -1515,97 +6279,162 @@ def main():
         st.header("📈 Advanced Analytics Dashboard")
         
         if st.session_state.studies:
-            stats = generate_summary_statistics(st.session_state.studies)
+            stats = get_portfolio_statistics()
             
             # Time trend analysis
             st.subheader("📅 Temporal Analysis")
             
-            # Create publication year distribution
-            pub_years = [study['publication_year'] for study in st.session_state.studies]
-            year_quality = {}
+            # Every view below is read from the cached score frame and cube, not the study dicts
+            score_frame = get_score_frame()
+            cube = get_analytics_cube()
+            year_df = quality_by_year(score_frame)
+            st.write("**Quality Trends by Publication Year**")
+            st.bar_chart(year_df[['Good', 'Fair', 'Poor']])
             
-            for study in st.session_state.studies:
-                year = study['publication_year']
-                if year not in year_quality:
-                    year_quality[year] = {'Good': 0, 'Fair': 0, 'Poor': 0, 'total': 0}
-                
-                quality = study['quality_rating'].split()[0]  # Get 'Good', 'Fair', or 'Poor'
-                year_quality[year][quality] += 1
-                year_quality[year]['total'] += 1
+            # Cumulative analysis
+            st.subheader("📚 Cumulative Evidence by Publication Year")
+            cumulative_df = cumulative_quality_trend(st.session_state.studies)
             
-            if year_quality:
-                year_df = pd.DataFrame.from_dict(year_quality, orient='index')
-                year_df = year_df.sort_index()
-                
-                st.write("**Quality Trends by Publication Year**")
-                st.bar_chart(year_df[['Good', 'Fair', 'Poor']])
+            col1, col2 = st.columns(2)
+            with col1:
+                st.write("**Running Pooled Quality Score (%)**")
+                st.line_chart(cumulative_df[['Pooled Quality Score %']])
+            with col2:
+                st.write("**Running Quality Mix (%)**")
+                st.area_chart(cumulative_df[['Good %', 'Fair %', 'Poor %']])
+            
+            effect_analyses = effect_analysis_keys(st.session_state.studies)
+            if effect_analyses:
+                cumulative_outcome, cumulative_measure = st.selectbox(
+                    "Cumulative meta-analysis outcome", effect_analyses, format_func=lambda key: f"{key[0]} ({key[1]})")
+                cumulative_ma = cumulative_meta_analysis(st.session_state.studies, cumulative_outcome,
+                                                         cumulative_measure)
+                if cumulative_ma is not None:
+                    st.write("**Running Pooled Estimate (fixed effect, 95% CI)**")
+                    st.line_chart(cumulative_ma[['Pooled Estimate (FE)', 'Lower 95% CI', 'Upper 95% CI']])
+                    st.dataframe(cumulative_ma.round(4), use_container_width=True)
             
             # Domain comparison
             st.subheader("🔄 Domain Performance Analysis")
             
-            domain_comparison = {}
-            for study in st.session_state.studies:
-                domain_scores = calculate_domain_scores(study)
-                for domain_name, scores in domain_scores.items():
-                    if domain_name not in domain_comparison:
-                        domain_comparison[domain_name] = []
-                    domain_comparison[domain_name].append(scores['percentage'])
+            domain_pct = domain_percentages(score_frame)
+            st.write("**Average Domain Performance**")
+            domain_means = pd.Series(summarise_cube_slice(cube)['domain_averages']).sort_values(ascending=False)
+            st.bar_chart(domain_means)
+            
+            # Domain statistics table
+            st.write("**Domain Statistics Summary**")
+            st.dataframe(domain_pct.describe().round(2), use_container_width=True)
+            
+            # Subgroup drill-down
+            st.subheader("🧊 Subgroup Drill-Down")
+            
+            filter_cols = st.columns(4)
+            cube_filters = {}
+            for idx, (dimension, label) in enumerate(CUBE_DIMENSIONS.items()):
+                with filter_cols[idx % 4]:
+                    cube_filters[dimension] = st.multiselect(label, sorted(cube[dimension].unique()),
+                                                             key=f"cube_filter_{dimension}")
             
-            if domain_comparison:
-                comparison_df = pd.DataFrame(dict([(k, pd.Series(v)) for k, v in domain_comparison.items()]))
+            cells = slice_cube(cube, cube_filters)
+            slice_summary = summarise_cube_slice(cells)
+            if slice_summary is None:
+                st.info("No studies match the selected subgroup.")
+            else:
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("Studies in Slice", slice_summary['studies'])
+                with col2:
+                    st.metric("Quality Score", f"{slice_summary['overall_quality_score']:.1f}%")
+                with col3:
+                    st.metric("Good Quality", slice_summary['quality_counts']['Good Quality'])
+                with col4:
+                    st.metric("Poor Quality", slice_summary['quality_counts']['Poor Quality'])
                 
-                st.write("**Average Domain Performance**")
-                domain_means = comparison_df.mean().sort_values(ascending=False)
-                st.bar_chart(domain_means)
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.write("**Domain Averages (%)**")
+                    st.bar_chart(pd.Series(slice_summary['domain_averages']))
+                with col2:
+                    st.write("**Star Distribution**")
+                    st.bar_chart(pd.Series(slice_summary['star_distribution']).sort_index())
                 
-                # Domain statistics table
-                st.write("**Domain Statistics Summary**")
-                domain_stats = comparison_df.describe().round(2)
-                st.dataframe(domain_stats, use_container_width=True)
+                drill_dimension = st.selectbox("Break down slice by", list(CUBE_DIMENSIONS),
+                                               format_func=lambda d: CUBE_DIMENSIONS[d])
+                st.dataframe(rollup_cube(cells, drill_dimension), use_container_width=True)
+            
+            # Criterion-level analysis
+            st.subheader("🧬 Criterion-Level Analysis")
+            criterion_types = [t for t in NOS_CRITERIA if any(s['study_type'] == t for s in st.session_state.studies)]
+            criterion_type = st.selectbox("Study type", criterion_types, key="criterion_study_type")
+            codes, layout, positions = get_encoded_assessments(criterion_type)
+            
+            type_frame = score_frame.iloc[positions]
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                criterion_quality = st.multiselect("Quality", sorted(type_frame['quality_rating'].unique()),
+                                                   key="criterion_quality")
+            with col2:
+                criterion_years = st.multiselect("Year Band", sorted(type_frame['year_band'].unique()),
+                                                 key="criterion_years")
+            with col3:
+                criterion_countries = st.multiselect("Country", sorted(type_frame['country'].unique()),
+                                                     key="criterion_countries")
+            
+            criterion_mask = np.ones(len(positions), dtype=bool)
+            for column, values in [('quality_rating', criterion_quality), ('year_band', criterion_years),
+                                   ('country', criterion_countries)]:
+                if values:
+                    criterion_mask &= type_frame[column].isin(values).to_numpy()
+            
+            counts, n_filtered = criterion_frequency_matrix(codes, layout, criterion_mask)
+            if n_filtered:
+                st.markdown(create_criterion_heatmap(counts, n_filtered, layout, criterion_type), unsafe_allow_html=True)
+                with st.expander("Criterion × response frequency table"):
+                    st.dataframe(criterion_frequency_table(counts, n_filtered, layout),
+                                 use_container_width=True, hide_index=True)
+            else:
+                st.info("No studies match the selected filters.")
             
             # Quality improvement analysis
             st.subheader("🎯 Quality Improvement Analysis")
             
-            low_scoring_studies = [s for s in st.session_state.studies if s['total_stars'] < 5]
-            if low_scoring_studies:
-                st.warning(f"⚠️ {len(low_scoring_studies)} studies scored below 5 stars")
+            # "Low quality" follows each rubric's thresholds under the active quality scheme
+            poor = (score_frame['quality_rating'] == "Poor Quality").to_numpy()
+            if poor.any():
+                st.warning(f"⚠️ {int(poor.sum())} studies are rated Poor Quality")
                 
                 # Analyze common issues
-                common_issues = {}
-                for study in low_scoring_studies:
-                    domain_scores = calculate_domain_scores(study)
-                    for domain_name, scores in domain_scores.items():
-                        if scores['percentage'] < 50:
-                            common_issues[domain_name] = common_issues.get(domain_name, 0) + 1
-                
-                if common_issues:
+                issues = (domain_pct[poor] < 50).sum().sort_values(ascending=False)
+                issues = issues[issues > 0]
+                if len(issues):
                     st.write("**Most Common Issues in Low-Quality Studies:**")
-                    for domain, count in sorted(common_issues.items(), key=lambda x: x[1], reverse=True):
-                        st.write(f"- {domain}: {count} studies ({count/len(low_scoring_studies)*100:.1f}%)")
+                    for domain, count in issues.items():
+                        st.write(f"- {domain}: {count} studies ({count/poor.sum()*100:.1f}%)")
             else:
-                st.success("✅ All studies scored 5 or more stars!")
+                st.success("✅ No study is rated Poor Quality!")
             
             # Advanced metrics
             st.subheader("📊 Advanced Quality Metrics")
             
             col1, col2, col3 = st.columns(3)
+            all_scores = (score_frame['total_stars'] / score_frame['max_stars'] * 100).to_numpy()
             
             with col1:
-                # Calculate median score
-                all_scores = [study['total_stars'] for study in st.session_state.studies]
-                median_score = np.median(all_scores)
-                st.metric("Median Score", f"{median_score:.1f}/9")
+                st.metric("Median Score", f"{np.median(all_scores):.1f}%")
             
             with col2:
-                # Calculate standard deviation
-                std_score = np.std(all_scores)
-                st.metric("Score Std Dev", f"{std_score:.2f}")
+                st.metric("Score Std Dev", f"{np.std(all_scores):.1f} pts")
             
             with col3:
                 # High quality percentage
                 high_quality_pct = (stats['quality_counts']['Good Quality'] / stats['total_studies']) * 100
                 st.metric("High Quality %", f"{high_quality_pct:.1f}%")
             
+            # Reviewer timing and throughput
+            st.subheader("⏱️ Assessment Time & Throughput")
+            render_timing_analytics()
+            
             # Study characteristics analysis
             st.subheader("🔬 Study Characteristics Analysis")
             
@@ -1626,93 +6455,134 @@ def main():
         else:
             st.info("No data available for analytics. Please assess some studies first.")
     
+    # Meta-Analysis Page
+    elif page == "🧮 Meta-Analysis":
+        render_meta_analysis_page()
+    
+    # Review Assignments Page
+    elif page == "👥 Review Assignments":
+        render_assignment_page()
+    
+    # Adjudication Page
+    elif page == "⚖️ Adjudication":
+        render_adjudication_page()
+    
     # Compare Studies Page
     elif page == "🔄 Compare Studies":
         st.header("🔄 Study Comparison")
         
         if len(st.session_state.studies) >= 2:
-            # Select studies to compare
-            study_names = [study['study_name'] for study in st.session_state.studies]
+            studies = st.session_state.studies
+            score_frame = get_score_frame()
+            similarity = get_similarity_data()
+            # Widgets hold study ids, so selections survive deletes and reordering
+            positions = {study['study_id']: idx for idx, study in enumerate(studies)}
+            study_ids = list(positions)
+            labels = {study['study_id']: f"{study['study_name']} ({study['publication_year']})" for study in studies}
+            study_label = labels.get
+            if 'compare_studies' in st.session_state:
+                st.session_state.compare_studies = [study_id for study_id in st.session_state.compare_studies
+                                                    if study_id in positions]
+            if st.session_state.get('similar_anchor') not in positions:
+                st.session_state.pop('similar_anchor', None)
             
-            col1, col2 = st.columns(2)
-            with col1:
-                study1_name = st.selectbox("Select First Study", study_names, key="compare1")
-            with col2:
-                study2_name = st.selectbox("Select Second Study", 
-                                         [name for name in study_names if name != study1_name], 
-                                         key="compare2")
+            # Select studies to compare
+            selected_ids = st.multiselect("Select Studies to Compare", study_ids,
+                                          default=study_ids[:2], format_func=study_label, key="compare_studies")
+            selected = [positions[study_id] for study_id in selected_ids]
             
-            if study1_name and study2_name:
-                study1 = next(s for s in st.session_state.studies if s['study_name'] == study1_name)
-                study2 = next(s for s in st.session_state.studies if s['study_name'] == study2_name)
+            if len(selected) >= 2:
+                names = [study_label(study_id)[:30] for study_id in selected_ids]
+                rows = score_frame.iloc[selected]
                 
                 # Comparison table
-                st.subheader("📊 Head-to-Head Comparison")
-                
-                comparison_data = {
-                    'Metric': ['Study Type', 'Publication Year', 'Total Stars', 'Quality Rating', 'Sample Size'],
-                    study1_name: [
-                        study1['study_type'],
-                        study1['publication_year'],
-                        f"{study1['total_stars']}/9",
-                        study1['quality_rating'],
-                        study1.get('sample_size', 'N/A')
-                    ],
-                    study2_name: [
-                        study2['study_type'],
-                        study2['publication_year'],
-                        f"{study2['total_stars']}/9",
-                        study2['quality_rating'],
-                        study2.get('sample_size', 'N/A')
+                st.subheader("📊 Side-by-Side Comparison")
+                comparison_data = {'Metric': ['Study Type', 'Publication Year', 'Total Stars', 'Quality Rating', 'Sample Size']}
+                for name, idx, (_, row) in zip(names, selected, rows.iterrows()):
+                    comparison_data[name] = [
+                        row['study_type'],
+                        row['publication_year'],
+                        f"{row['total_stars']}/{row['max_stars']}",
+                        row['quality_rating'],
+                        studies[idx].get('sample_size', 'N/A')
                     ]
-                }
-                
-                comparison_df = pd.DataFrame(comparison_data)
-                st.dataframe(comparison_df, use_container_width=True)
+                st.dataframe(pd.DataFrame(comparison_data).astype(str), use_container_width=True)
                 
                 # Domain comparison
                 st.subheader("🔍 Domain-wise Comparison")
-                
-                domain1 = calculate_domain_scores(study1)
-                domain2 = calculate_domain_scores(study2)
-                
-                all_domains = set(list(domain1.keys()) + list(domain2.keys()))
-                
                 domain_comp_data = []
-                for domain in all_domains:
+                for domain in CUBE_DOMAINS:
                     row = {'Domain': domain}
-                    
-                    if domain in domain1:
-                        row[f'{study1_name} Stars'] = f"{domain1[domain]['stars']}/{domain1[domain]['max_stars']}"
-                        row[f'{study1_name} %'] = f"{domain1[domain]['percentage']:.1f}%"
-                    else:
-                        row[f'{study1_name} Stars'] = 'N/A'
-                        row[f'{study1_name} %'] = 'N/A'
-                    
-                    if domain in domain2:
-                        row[f'{study2_name} Stars'] = f"{domain2[domain]['stars']}/{domain2[domain]['max_stars']}"
-                        row[f'{study2_name} %'] = f"{domain2[domain]['percentage']:.1f}%"
-                    else:
-                        row[f'{study2_name} Stars'] = 'N/A'
-                        row[f'{study2_name} %'] = 'N/A'
-                    
+                    for name, (_, study_row) in zip(names, rows.iterrows()):
+                        row[name] = f"{study_row[f'{domain}_stars']}/{study_row[f'{domain}_max']}"
                     domain_comp_data.append(row)
-                
-                domain_comp_df = pd.DataFrame(domain_comp_data)
-                st.dataframe(domain_comp_df, use_container_width=True)
+                st.dataframe(pd.DataFrame(domain_comp_data), use_container_width=True)
                 
                 # Visual comparison
                 st.subheader("📊 Visual Comparison")
+                chart_df = pd.DataFrame(similarity['profiles'][selected] * 100, index=names, columns=CUBE_DOMAINS)
+                st.bar_chart(chart_df)
                 
-                # Create comparison chart data
-                comparison_chart_data = {}
-                for domain in all_domains:
-                    if domain in domain1 and domain in domain2:
-                        comparison_chart_data[domain] = [domain1[domain]['percentage'], domain2[domain]['percentage']]
-                
-                if comparison_chart_data:
-                    chart_df = pd.DataFrame(comparison_chart_data, index=[study1_name[:20], study2_name[:20]])
-                    st.bar_chart(chart_df)
+                # Pairwise distances between the selected studies
+                st.subheader("📐 Pairwise Profile Distances")
+                if similarity['distances'] is not None:
+                    subset = similarity['distances'][np.ix_(selected, selected)]
+                else:
+                    subset = pairwise_distances(similarity['profiles'][selected])
+                st.dataframe(pd.DataFrame(subset, index=names, columns=names).round(3), use_container_width=True)
+                st.caption("Euclidean distance between per-domain star percentages (0 = identical bias profile).")
+            else:
+                st.info("Select at least two studies to compare.")
+            
+            # Most similar studies
+            st.subheader("🔗 Most Similar Studies")
+            col1, col2, col3 = st.columns([2, 2, 1])
+            with col1:
+                anchor_id = st.selectbox("Reference Study", study_ids, format_func=study_label, key="similar_anchor")
+            with col2:
+                similarity_metric = st.radio("Similarity Basis", ["euclidean", "hamming"], horizontal=True,
+                                             format_func=lambda x: {"euclidean": "Domain profile",
+                                                                    "hamming": "Criterion responses"}[x],
+                                             key="similar_metric")
+            with col3:
+                similar_limit = st.number_input("Show", min_value=1, max_value=50, value=5, key="similar_limit")
+            
+            similar = most_similar_studies(positions[anchor_id], int(similar_limit), similarity_metric)
+            if similar:
+                st.dataframe(pd.DataFrame([{
+                    'Study': studies[idx]['study_name'],
+                    'Year': studies[idx]['publication_year'],
+                    'Type': studies[idx]['study_type'],
+                    'Quality': score_frame['quality_rating'].iat[idx],
+                    'Distance': round(distance, 3)
+                } for idx, distance in similar]), use_container_width=True, hide_index=True)
+            else:
+                st.info("No other studies of the same type to compare against.")
+            
+            # Bias profile clusters
+            st.subheader("🧩 Bias Profile Clusters")
+            n_clusters = st.slider("Number of Clusters", 2, 8, 3, key="profile_clusters")
+            clusters = cluster_profiles(similarity['profiles'], n_clusters)
+            cluster_df = pd.DataFrame(similarity['profiles'] * 100, columns=CUBE_DOMAINS)
+            cluster_df['Cluster'] = clusters
+            cluster_df['Total Stars'] = score_frame['total_stars'].to_numpy()
+            cluster_summary = cluster_df.groupby('Cluster').agg(
+                Studies=('Total Stars', 'size'),
+                **{f"{domain} %": (domain, 'mean') for domain in CUBE_DOMAINS},
+                **{'Mean Stars': ('Total Stars', 'mean')}
+            ).round(1)
+            st.dataframe(cluster_summary, use_container_width=True)
+            
+            cluster_choice = st.selectbox("Show Studies in Cluster", cluster_summary.index.tolist(), key="cluster_choice")
+            members = np.flatnonzero(clusters == cluster_choice)
+            st.dataframe(pd.DataFrame([{
+                'Study': studies[idx]['study_name'],
+                'Year': studies[idx]['publication_year'],
+                'Type': studies[idx]['study_type'],
+                'Quality': score_frame['quality_rating'].iat[idx]
+            } for idx in members[:500]]), use_container_width=True, hide_index=True)
+            if len(members) > 500:
+                st.caption(f"Showing 500 of {len(members)} studies.")
         
         elif len(st.session_state.studies) == 1:
             st.info("You need at least 2 studies to perform comparisons.")
@@ -1730,7 +6600,9 @@ def main():
             col1, col2 = st.columns(2)
             with col1:
                 export_format = st.selectbox("Export Format", 
-                                           ["CSV (Detailed)", "CSV (Summary)", "JSON (Complete)"])
+                                           ["CSV (Detailed)", "CSV (Summary)", "CSV (Per Outcome)", "JSON (Complete)",
+                                            "Excel (Multi-Sheet Report)", "Parquet (Typed Dataset)",
+                                            "Arrow IPC (Typed Dataset)"])
                 include_metadata = st.checkbox("Include Metadata", value=True)
             
             with col2:
@@ -1738,6 +6610,7 @@ def main():
                 include_recommendations = st.checkbox("Include Assessment Notes", value=True)
             
             # Generate export data
+            export_started = time.perf_counter()
             if export_format == "CSV (Detailed)":
                 export_df = export_to_csv_enhanced(st.session_state.studies)
                 if export_df is not None:
@@ -1745,6 +6618,7 @@ def main():
                     st.dataframe(export_df.head(), use_container_width=True)
                     
                     csv_data = export_df.to_csv(index=False)
+                    record_export("csv_detailed", csv_data, export_started)
                     st.download_button(
                         label="📥 Download Detailed CSV",
                         data=csv_data,
@@ -1759,6 +6633,7 @@ def main():
                     st.dataframe(summary_df, use_container_width=True)
                     
                     csv_data = summary_df.to_csv(index=False)
+                    record_export("csv_summary", csv_data, export_started)
                     st.download_button(
                         label="📥 Download Summary CSV",
                         data=csv_data,
@@ -1766,6 +6641,20 @@ def main():
                         mime="text/csv"
                     )
             
+            elif export_format == "CSV (Per Outcome)":
+                outcome_df = export_outcome_assessments(st.session_state.studies)
+                st.subheader("📋 Export Preview")
+                st.dataframe(outcome_df.head(20), use_container_width=True)
+                
+                csv_data = outcome_df.to_csv(index=False)
+                record_export("csv_outcomes", csv_data, export_started)
+                st.download_button(
+                    label="📥 Download Per-Outcome CSV",
+                    data=csv_data,
+                    file_name=f"nos_outcome_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv"
+                )
+            
             elif export_format == "JSON (Complete)":
                 # Enhanced JSON export with metadata
                 export_data = {
@@ -1776,11 +6665,12 @@ def main():
                         "total_studies": len(st.session_state.studies),
                         "assessor": "Multiple" if len(set(s.get('assessor_name', 'Unknown') for s in st.session_state.studies)) > 1 else st.session_state.studies[0].get('assessor_name', 'Unknown')
                     },
-                    "summary_statistics": generate_summary_statistics(st.session_state.studies),
+                    "summary_statistics": get_portfolio_statistics(),
                     "studies": st.session_state.studies
                 }
                 
                 json_data = json.dumps(export_data, indent=2, default=str)
+                record_export("json_complete", json_data, export_started)
                 st.download_button(
                     label="📥 Download Complete JSON",
                     data=json_data,
@@ -1788,9 +6678,41 @@ def main():
                     mime="application/json"
                 )
             
+            elif export_format == "Excel (Multi-Sheet Report)":
+                if xlsxwriter is None:
+                    st.info("Excel export needs xlsxwriter: `pip install xlsxwriter`")
+                else:
+                    xlsx_data = export_excel_workbook(st.session_state.studies)
+                    record_export("xlsx", xlsx_data, export_started)
+                    st.caption("Sheets: " + ", ".join(EXCEL_SHEETS) + "; quality ratings keep the Good/Fair/Poor colours.")
+                    st.download_button(
+                        label="📥 Download Excel Report",
+                        data=xlsx_data,
+                        file_name=f"nos_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    )
+            
+            elif pa is None:
+                st.info("Typed dataset export needs pyarrow: `pip install pyarrow`")
+            
+            else:
+                dataset_format = export_format.split(" (")[0]
+                extension = DATASET_FORMATS[dataset_format]
+                dataset_data = export_assessment_dataset(st.session_state.studies, dataset_format)
+                record_export(extension.lstrip("."), dataset_data, export_started)
+                st.caption("One row per study with dictionary-encoded answers and integer star columns; "
+                           "open it with pandas, Polars, DuckDB or R `arrow`, or restore it below.")
+                st.download_button(
+                    label=f"📥 Download {dataset_format} Dataset",
+                    data=dataset_data,
+                    file_name=f"nos_dataset_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}",
+                    mime="application/vnd.apache.parquet" if dataset_format == "Parquet"
+                    else "application/vnd.apache.arrow.file"
+                )
+            
             # Statistics summary
             st.subheader("📈 Export Summary")
-            stats = generate_summary_statistics(st.session_state.studies)
+            stats = get_portfolio_statistics()
             
             col1, col2, col3, col4 = st.columns(4)
             with col1:
@@ -1808,12 +6730,14 @@ def main():
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("📤 Backup All Data", type="secondary", use_container_width=True):
+                    backup_started = time.perf_counter()
                     backup_data = {
                         "studies": st.session_state.studies,
                         "backup_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     }
                     
                     backup_json = json.dumps(backup_data, indent=2, default=str)
+                    record_export("json_backup", backup_json, backup_started)
                     st.download_button(
                         label="💾 Download Backup File",
                         data=backup_json,
@@ -1824,12 +6748,36 @@ def main():
             with col2:
                 if st.button("🗑️ Clear All Data", type="secondary", use_container_width=True):
                     if st.checkbox("⚠️ I understand this will permanently delete all assessments"):
-                        st.session_state.studies = []
+                        clear_studies()
                         st.success("All data cleared successfully!")
                         st.rerun()
         
         else:
             st.info("No data to export. Please assess some studies first.")
+        
+        with st.expander("♻️ Restore from Backup"):
+            backup_file = st.file_uploader("Backup file", type=["json", "parquet", "arrow"], key="backup_restore",
+                                           help="A file from 'Backup All Data' or a typed dataset export; "
+                                                "studies already in this project are skipped")
+            is_dataset = backup_file is not None and not backup_file.name.lower().endswith(".json")
+            if is_dataset and pa is None:
+                st.info("Restoring a typed dataset needs pyarrow: `pip install pyarrow`")
+            elif backup_file is not None and st.button("Restore Studies", key="restore_backup"):
+                try:
+                    if not is_dataset:
+                        backup_studies = json.load(backup_file).get('studies', [])
+                    else:
+                        backup_studies = studies_from_table(read_assessment_dataset(backup_file.getvalue(),
+                                                                                    backup_file.name))
+                except (ValueError, AttributeError, KeyError, OSError):
+                    st.error("This file is not an NOS backup or dataset")
+                else:
+                    valid, corrected = rescore_restored_studies(backup_studies)
+                    restored = add_studies(valid, f"Restore {len(valid)} studies from {backup_file.name}")
+                    st.success(f"Restored {restored} of {len(backup_studies)} studies; this can be undone from the sidebar.")
+                    if corrected:
+                        st.info(f"{corrected} studies had stored star totals that did not match their answers "
+                                "and were rescored.")
 # Assessment Guide Page
     elif page == "📖 Assessment Guide":
         st.header("📖 Newcastle-Ottawa Scale Assessment Guide")
@@ -1838,22 +6786,27 @@ def main():
         st.subheader("🎯 Quick Reference")
         
         guide_tabs = st.tabs(["Overview", "Cohort Studies", "Case-Control Studies", "Cross-Sectional Studies", "Interpretation"])
+        # Maxima and thresholds come from the rubric definitions, including rubric files
+        bands = describe_rubric_bands()
+        cohort_max = describe_domain_max("Cohort Studies")
+        case_control_max = describe_domain_max("Case-Control Studies")
+        cross_sectional_max = describe_domain_max("Cross-Sectional Studies")
         
         with guide_tabs[0]:
-            st.markdown("""
+            st.markdown(f"""
             ### 📋 Newcastle-Ottawa Scale Overview
             
             The Newcastle-Ottawa Scale (NOS) is a quality assessment tool for non-randomized studies in meta-analyses.
             
             **Key Features:**
-            - ⭐ **Star-based scoring system** (maximum 9 stars for cohort/case-control, 8 for cross-sectional)
+            - ⭐ **Star-based scoring system** (maximum {bands['max']})
             - 🏗️ **Three domains:** Selection, Comparability, Outcome/Exposure
             - 📊 **Standardized criteria** for consistent assessment
             
             **Quality Interpretation:**
-            - 🟢 **Good Quality:** ≥7 stars (cohort/case-control), ≥6 stars (cross-sectional)
-            - 🟡 **Fair Quality:** 5-6 stars (cohort/case-control), 4-5 stars (cross-sectional)
-            - 🔴 **Poor Quality:** <5 stars (cohort/case-control), <4 stars (cross-sectional)
+            - 🟢 **Good Quality:** {bands['good']}
+            - 🟡 **Fair Quality:** {bands['fair']}
+            - 🔴 **Poor Quality:** {bands['poor']}
             
             **Assessment Tips:**
             - 📖 Read the full paper carefully before assessment
@@ -1863,21 +6816,21 @@ def main():
             """)
         
         with guide_tabs[1]:
-            st.markdown("""
+            st.markdown(f"""
             ### 🔄 Cohort Studies Assessment
             
-            **Selection Domain (4 stars maximum):**
+            **Selection Domain ({cohort_max['Selection']} stars maximum):**
             1. **Representativeness of exposed cohort** - Is the sample representative?
             2. **Selection of non-exposed cohort** - Drawn from same community?
             3. **Ascertainment of exposure** - How reliable is exposure measurement?
             4. **Outcome not present at start** - Temporal relationship established?
             
-            **Comparability Domain (2 stars maximum):**
+            **Comparability Domain ({cohort_max['Comparability']} stars maximum):**
             5. **Comparability of cohorts** - Are confounders controlled?
                - 1 star: Most important factor controlled
                - 2 stars: Additional factors controlled
             
-            **Outcome Domain (3 stars maximum):**
+            **Outcome Domain ({cohort_max['Outcome']} stars maximum):**
             6. **Assessment of outcome** - How reliable is outcome measurement?
             7. **Follow-up length** - Adequate time for outcomes to occur?
             8. **Adequacy of follow-up** - Complete follow-up achieved?
@@ -1890,21 +6843,21 @@ def main():
             """)
         
         with guide_tabs[2]:
-            st.markdown("""
+            st.markdown(f"""
             ### 🎯 Case-Control Studies Assessment
             
-            **Selection Domain (4 stars maximum):**
+            **Selection Domain ({case_control_max['Selection']} stars maximum):**
             1. **Case definition adequate** - Clear, validated case definition?
             2. **Representativeness of cases** - Consecutive or representative series?
             3. **Selection of controls** - Community vs hospital controls?
             4. **Definition of controls** - No history of outcome?
             
-            **Comparability Domain (2 stars maximum):**
+            **Comparability Domain ({case_control_max['Comparability']} stars maximum):**
             5. **Comparability** - Are confounders controlled?
                - 1 star: Most important factor controlled
                - 2 stars: Additional factors controlled
             
-            **Exposure Domain (3 stars maximum):**
+            **Exposure Domain ({case_control_max['Exposure']} stars maximum):**
             6. **Ascertainment of exposure** - Reliable exposure measurement?
             7. **Same method for cases/controls** - Consistent assessment methods?
             8. **Non-response rate** - Similar response rates?
@@ -1917,21 +6870,21 @@ def main():
             """)
         
         with guide_tabs[3]:
-            st.markdown("""
+            st.markdown(f"""
             ### 📊 Cross-Sectional Studies Assessment
             
-            **Selection Domain (4 stars maximum):**
+            **Selection Domain ({cross_sectional_max['Selection']} stars maximum):**
             1. **Representativeness** - Representative sample of target population?
             2. **Sample size** - Justified and adequate sample size?
             3. **Non-respondents** - Response rate adequate or non-respondents described?
             4. **Ascertainment of exposure** - Validated measurement tools used?
             
-            **Comparability Domain (2 stars maximum):**
+            **Comparability Domain ({cross_sectional_max['Comparability']} stars maximum):**
             5. **Comparability** - Are confounders controlled?
                - 1 star: Most important factor controlled
                - 2 stars: Additional factors controlled
             
-            **Outcome Domain (2 stars maximum):**
+            **Outcome Domain ({cross_sectional_max['Outcome']} stars maximum):**
             6. **Assessment of outcome** - Reliable outcome measurement?
             7. **Statistical test** - Appropriate statistical methods used?
             
@@ -1943,13 +6896,13 @@ def main():
             """)
         
         with guide_tabs[4]:
-            st.markdown("""
+            st.markdown(f"""
             ### 📈 Interpretation Guidelines
             
             **Overall Quality Assessment:**
-            - 🟢 **7-9 stars (Good):** High-quality study with minimal bias risk
-            - 🟡 **5-6 stars (Fair):** Moderate quality with some limitations
-            - 🔴 **<5 stars (Poor):** Significant methodological concerns
+            - 🟢 **Good ({bands['good_range']}):** High-quality study with minimal bias risk
+            - 🟡 **Fair ({bands['fair']}):** Moderate quality with some limitations
+            - 🔴 **Poor ({bands['poor']}):** Significant methodological concerns
             
             **Domain-Specific Interpretation:**
             - **Selection:** Foundation of study validity
@@ -1982,10 +6935,15 @@ def main():
         
         if selected_study_type:
             criteria = NOS_CRITERIA[selected_study_type]
+            rubric = compile_rubric(selected_study_type)
+            st.caption(f"Maximum {rubric['max_stars']} stars · Good ≥ {rubric['thresholds']['good']} · "
+                       f"Fair ≥ {rubric['thresholds']['fair']}"
+                       + (f" · defined in rubrics/{RUBRIC_FILES[selected_study_type]['source']}"
+                          if selected_study_type in RUBRIC_FILES else ""))
             
             for domain_name, domain in criteria.items():
                 with st.expander(f"{domain_name} Domain Details"):
-                    st.write(f"**Maximum Stars:** {2 if domain_name == 'Comparability' else len(domain)}")
+                    st.write(f"**Maximum Stars:** {sum(_criterion_max_stars(criterion) for criterion in domain.values())}")
                     
                     for criterion_name, criterion in domain.items():
                         st.write(f"**{criterion['question']}**")
@@ -1993,8 +6951,6 @@ def main():
                         # Show scoring options
                         for option_key, option_text in criterion['options'].items():
                             stars = criterion['stars'].get(option_key, 0)
-                            if criterion_name == "comparability" and option_key == "additional_factor":
-                                stars = 2
                             star_display = "★" * stars if stars > 0 else "☆"
                             st.write(f"  - {option_text} {star_display}")
                         
@@ -2025,9 +6981,10 @@ def main():
             - 📖 Follow PRISMA guidelines
             """)
     
+def render_footer():
     # Footer with enhanced information
     st.markdown("---")
-    st.markdown("""
+    st.markdown(f"""
     <div style="text-align: center; color: #666; padding: 2rem; background: #f8f9fa; border-radius: 10px; margin-top: 2rem;">
         <h4 style="color: #2c3e50; margin-bottom: 15px;">Newcastle-Ottawa Scale Assessment Tool v2.0</h4>
         <p style="margin-bottom: 10px;"><strong>Developed for systematic review and meta-analysis research</strong></p>
@@ -2056,10 +7013,10 @@ def main():
                     <strong>Studies Assessed:</strong><br>
                     <span style="color: #3498db; font-size: 18px; font-weight: bold;">{len(st.session_state.studies)}</span>
                 </div>
-    """.format(len=len), unsafe_allow_html=True)
+    """, unsafe_allow_html=True)
     
     if st.session_state.studies:
-        stats = generate_summary_statistics(st.session_state.studies)
+        stats = get_portfolio_statistics()
         st.markdown(f"""
                 <div>
                     <strong>Good Quality:</strong><br>
@@ -0,0 +1,204 @@
+"""Benchmark suite for the NOS scoring, statistics and rendering functions.
+
+Usage:
+    python benchmarks/benchmark_nos.py                      # run and print results
+    python benchmarks/benchmark_nos.py --save-baseline      # store results as the new baseline
+    python benchmarks/benchmark_nos.py --check              # fail if slower than the baseline
+
+Studies are generated from a seeded random source, so every run benchmarks
+exactly the same portfolio at each scale.
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(BENCHMARK_DIR, os.pardir, "NOS Advanced.py")
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_SCALES = [10, 1000, 10000, 100000]
+
+
+def load_app():
+    """Import the Streamlit script as a module without starting the app"""
+    # Streamlit puts the script's folder on sys.path; sibling modules are imported from there
+    sys.path.insert(0, os.path.dirname(os.path.abspath(APP_PATH)))
+    spec = importlib.util.spec_from_file_location("nos_app", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    # Streamlit warns about the missing script run context on every call in bare mode
+    logging.disable(logging.WARNING)
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        logging.disable(logging.NOTSET)
+    return module
+
+
+def generate_synthetic_portfolio(app, n_studies, seed=42):
+    """Generate valid random studies covering every study type in NOS_CRITERIA"""
+    rng = random.Random(seed)
+    study_types = list(app.NOS_CRITERIA.keys())
+    countries = ["United States", "United Kingdom", "Pakistan", "China", "Brazil", "Germany"]
+    funders = ["", "NIH", "Industry", "Wellcome Trust", "Government"]
+    populations = ["Adults", "Children", "Adults >65 years", "Pregnant women"]
+    studies = []
+    
+    for idx in range(n_studies):
+        study_type = study_types[idx % len(study_types)]
+        assessment = {}
+        for domain in app.NOS_CRITERIA[study_type].values():
+            for criterion_name, criterion in domain.items():
+                assessment[criterion_name] = rng.choice(list(criterion["options"].keys()))
+        
+        total_stars = app.calculate_total_stars(assessment, study_type)
+        year = rng.randint(1980, 2024)
+        first_author = f"Author{rng.randint(1, n_studies)}"
+        studies.append({
+            "study_id": f"synthetic-{idx}",
+            "study_name": f"{first_author} et al. {year} ({idx})",
+            "authors": f"{first_author} A, Coauthor B, Coauthor C",
+            "publication_year": year,
+            "journal": f"Journal {rng.randint(1, 50)}",
+            "doi": f"10.1000/synthetic.{idx}",
+            "pmid": str(10000000 + idx),
+            "country": rng.choice(countries),
+            "sample_size": rng.randint(20, 20000),
+            "follow_up": f"{rng.randint(1, 10)} years",
+            "population": rng.choice(populations),
+            "funding": rng.choice(funders),
+            "study_type": study_type,
+            "assessment": assessment,
+            "total_stars": total_stars,
+            "notes": "",
+            "strengths": "",
+            "limitations": "",
+            "assessor_name": f"Reviewer {rng.randint(1, 5)}",
+            "assessment_date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 10:00:00",
+            "assessment_version": "2.0"
+        })
+    
+    return studies
+
+
+def benchmark_targets(app):
+    """Functions to benchmark, each taking the full portfolio"""
+    return {
+        "calculate_total_stars": lambda studies: [
+            app.calculate_total_stars(s["assessment"], s["study_type"]) for s in studies],
+        "calculate_domain_scores": lambda studies: [
+            app.calculate_domain_scores(s) for s in studies],
+        "generate_summary_statistics": app.generate_summary_statistics,
+        "create_domain_heatmap": app.create_domain_heatmap,
+        "create_robvis_visualization": app.create_robvis_visualization,
+        "create_publication_ready_table": app.create_publication_ready_table,
+        "export_to_csv_enhanced": app.export_to_csv_enhanced,
+    }
+
+
+def measure(func, studies, repeats):
+    """Return best wall time over `repeats` runs and the peak traced memory of one run"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(studies)
+        timings.append(time.perf_counter() - start)
+    
+    tracemalloc.start()
+    func(studies)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {"seconds": min(timings), "peak_memory_bytes": peak}
+
+
+def run_benchmarks(app, scales, seed, repeats, only=None):
+    results = {}
+    targets = benchmark_targets(app)
+    for scale in scales:
+        studies = generate_synthetic_portfolio(app, scale, seed)
+        scale_repeats = repeats if scale <= 10000 else 1
+        results[str(scale)] = {}
+        for name, func in targets.items():
+            if only and name not in only:
+                continue
+            results[str(scale)][name] = measure(func, studies, scale_repeats)
+            print(f"{scale:>7} studies  {name:<32} "
+                  f"{results[str(scale)][name]['seconds'] * 1000:10.2f} ms  "
+                  f"{results[str(scale)][name]['peak_memory_bytes'] / 1e6:8.2f} MB peak")
+    return results
+
+
+def check_regressions(results, baseline, tolerance):
+    """Return a list of (scale, function, current, baseline) that exceed the tolerance"""
+    regressions = []
+    for scale, functions in results.items():
+        for name, current in functions.items():
+            reference = baseline.get("results", {}).get(scale, {}).get(name)
+            if reference is None:
+                continue
+            if current["seconds"] > reference["seconds"] * tolerance:
+                regressions.append((scale, name, current["seconds"], reference["seconds"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="Portfolio sizes to benchmark")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the synthetic generator")
+    parser.add_argument("--repeats", type=int, default=3, help="Timing repeats (best is kept)")
+    parser.add_argument("--only", nargs="+", help="Benchmark only these functions")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results to the baseline file")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero on regressions against the baseline")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="Allowed slowdown factor before a result counts as a regression")
+    parser.add_argument("--output", help="Also write results to this JSON file")
+    args = parser.parse_args(argv)
+    
+    app = load_app()
+    results = run_benchmarks(app, args.scales, args.seed, args.repeats, args.only)
+    report = {
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": args.seed,
+        "results": results
+    }
+    
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+    
+    if args.save_baseline:
+        with open(args.baseline, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline found at {args.baseline}; run with --save-baseline first")
+            return 1
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        regressions = check_regressions(results, baseline, args.tolerance)
+        for scale, name, current, reference in regressions:
+            print(f"REGRESSION {name} at {scale} studies: "
+                  f"{current * 1000:.2f} ms vs baseline {reference * 1000:.2f} ms")
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""PDF full-text extraction for the evidence prefill in NOS Advanced.py.
+
+This lives in its own module so ProcessPoolExecutor workers can import it; functions
+defined inside the Streamlit script cannot be pickled.  pypdf is optional.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+PASSAGE_WORDS = 80
+PASSAGE_STRIDE = 60
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def split_passages(pages):
+    """Overlapping word windows per page, so a statement is never split across passages"""
+    passages = []
+    for page_number, text in enumerate(pages, 1):
+        words = re.sub(r"-\s*\n\s*", "", text).split()
+        for start in range(0, max(len(words) - PASSAGE_WORDS + PASSAGE_STRIDE, 1), PASSAGE_STRIDE):
+            window = words[start:start + PASSAGE_WORDS]
+            if window:
+                passages.append({'page': page_number, 'text': " ".join(window)})
+    return passages
+
+
+def extract_passages(path, cache_dir):
+    """Passages of one PDF, read from the hash-keyed cache when the file was seen before"""
+    try:
+        sha256 = file_sha256(path)
+        cache_path = os.path.join(cache_dir, f"{sha256}.json")
+        if os.path.exists(cache_path):
+            with open(cache_path, encoding="utf-8") as handle:
+                document = json.load(handle)
+            document['file'] = os.path.basename(path)
+            return document
+        if PdfReader is None:
+            return {'file': os.path.basename(path), 'error': "pypdf is not installed"}
+
+        pages = [page.extract_text() or "" for page in PdfReader(path).pages]
+        document = {
+            'sha256': sha256,
+            'file': os.path.basename(path),
+            'pages': len(pages),
+            'passages': split_passages(pages)
+        }
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(document, handle)
+        os.replace(tmp_path, cache_path)
+        return document
+    except Exception as exc:  # a damaged PDF must not take down the whole batch
+        return {'file': os.path.basename(path), 'error': f"{type(exc).__name__}: {exc}"}
@@ -0,0 +1,69 @@
+"""Shared fixtures: the Streamlit script imported as a module, with its servers disabled.
+
+The workspace and scratch directories point at a temporary folder, so the tests never
+touch a reviewer's data and can run in any order.
+"""
+
+import importlib.util
+import logging
+import os
+import random
+import sys
+import uuid
+
+import pytest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "NOS Advanced.py")
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """Import the app once per test run, as the benchmark suite does"""
+    os.environ["NOS_WORKSPACE_DIR"] = str(tmp_path_factory.mktemp("workspace"))
+    os.environ["NOS_METRICS_PORT"] = "0"
+    os.environ["NOS_CDC_PORT"] = "0"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(APP_PATH)))
+    spec = importlib.util.spec_from_file_location("nos_app", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    # Streamlit warns about the missing script run context on every call in bare mode
+    logging.disable(logging.WARNING)
+    spec.loader.exec_module(module)
+    yield module
+    logging.disable(logging.NOTSET)
+
+
+@pytest.fixture
+def make_study(app):
+    """Factory of valid studies with seeded random answers"""
+    rng = random.Random(7)
+
+    def make(study_type="Cohort Studies", **fields):
+        assessment = {name: rng.choice(list(criterion["options"]))
+                      for domain in app.NOS_CRITERIA[study_type].values()
+                      for name, criterion in domain.items()}
+        study = {
+            "study_id": uuid.uuid4().hex,
+            "study_name": f"Study {rng.randint(1, 10 ** 6)}",
+            "authors": "Smith J, Doe A",
+            "publication_year": 2020,
+            "journal": "BMJ",
+            "study_type": study_type,
+            "assessment": assessment,
+            "total_stars": app.calculate_total_stars(assessment, study_type),
+            "assessment_date": "2024-01-15 10:00:00",
+        }
+        study.update(fields)
+        return study
+
+    return make
+
+
+@pytest.fixture
+def portfolio(app):
+    """An empty scratch portfolio with a fresh undo history"""
+    state = app.st.session_state
+    state.studies[:] = []
+    state.undo_history.clear()
+    yield state
+    state.studies[:] = []
+    state.undo_history.clear()
@@ -0,0 +1,62 @@
+"""Dual-review disagreements and the adjudication work list"""
+
+
+def _reviewed(app, make_study, answers_b, name):
+    study = make_study(study_name=name)
+    second = dict(study['assessment'], **answers_b)
+    study['reviewer_assessments'] = {"Ann": {'assessment': study['assessment']}, "Bob": {'assessment': second}}
+    return study
+
+
+def _worst_and_best(app, criterion):
+    stars = app.NOS_CRITERIA["Cohort Studies"]["Selection"][criterion]['stars']
+    options = list(app.NOS_CRITERIA["Cohort Studies"]["Selection"][criterion]['options'])
+    return min(options, key=lambda option: stars.get(option, 0)), max(options, key=lambda option: stars.get(option, 0))
+
+
+def test_disagreements_per_pair_and_criterion(app, make_study):
+    study = make_study()
+    answers = study['assessment']
+    other = next(option for option in app.NOS_CRITERIA["Cohort Studies"]["Selection"]["representativeness"]['options']
+                 if option != answers['representativeness'])
+    study['reviewer_assessments'] = {
+        "Ann": {'assessment': answers},
+        "Bob": {'assessment': dict(answers, representativeness=other)},
+        "Cat": {'assessment': answers}
+    }
+    found = app.find_disagreements(study)
+    assert [(pair, criterion) for pair, criterion, _ in found] == [
+        (("Ann", "Bob"), "representativeness"), (("Bob", "Cat"), "representativeness")]
+
+    study['consensus'] = {'representativeness': {'option': other, 'answers': found[0][2]}}
+    assert app.find_disagreements(study) == []
+
+
+def test_worklist_ranks_and_filters(app, make_study):
+    worst, best = _worst_and_best(app, "representativeness")
+    one = _reviewed(app, make_study, {'representativeness': "__other__"}, "One criterion")
+    two = _reviewed(app, make_study, {'representativeness': "__other__", 'selection_nonexposed': "__other__"},
+                    "Two criteria")
+    agreed = _reviewed(app, make_study, {}, "Agreed")
+    queue = app.AdjudicationQueue("standard")
+    queue.refresh([one, two, agreed])
+
+    assert [entry[4] for entry in queue.worklist()] == [two['study_id'], one['study_id']]
+    assert [entry[4] for entry in queue.worklist(criterion="selection_nonexposed")] == [two['study_id']]
+    assert [entry[4] for entry in queue.worklist(pair=("Ann", "Bob"), limit=1)] == [two['study_id']]
+    assert len(queue.worklist()) == 2
+
+
+def test_refresh_reindexes_only_dirty_studies(app, make_study):
+    study = _reviewed(app, make_study, {'representativeness': "__other__"}, "Study")
+    queue = app.AdjudicationQueue("standard")
+    queue.refresh([study])
+    assert len(queue.items) == 1
+
+    resolved = dict(study, reviewer_assessments={name: {'assessment': study['assessment']}
+                                                 for name in study['reviewer_assessments']})
+    queue.refresh([resolved])
+    assert len(queue.items) == 1
+    queue.mark_dirty([study['study_id']])
+    queue.refresh([resolved])
+    assert queue.items == {} and queue.worklist() == []
@@ -0,0 +1,62 @@
+"""Longest-processing-time-first reviewer assignment"""
+
+EFFORTS = {None: 30.0, "Cohort Studies": 60.0, "Case-Control Studies": 20.0}
+
+
+def _records(count):
+    return [{'study_name': f"Study {n}", 'authors': f"Author{n} A",
+             'likely_study_type': "Cohort Studies" if n % 3 == 0 else "Case-Control Studies",
+             'assigned_to': []} for n in range(count)]
+
+
+def _roster(**capacities):
+    return {name: {'capacity': capacity, 'conflicts': set()} for name, capacity in capacities.items()}
+
+
+def test_every_record_gets_distinct_reviewers(app):
+    records = _records(12)
+    result = app.assign_reviewers(records, _roster(ann=1, bob=1, cat=1), 2, EFFORTS)
+
+    assert result['unfilled'] == 0
+    assert result['assigned'] == 24
+    for record in records:
+        assert len(record['assigned_to']) == 2
+        assert len(set(record['assigned_to'])) == 2
+
+
+def test_load_follows_capacity(app):
+    records = _records(30)
+    result = app.assign_reviewers(records, _roster(ann=2, bob=1), 1, EFFORTS)
+
+    load = result['load']
+    assert abs(load['ann'] / 2 - load['bob']) <= max(EFFORTS.values())
+
+
+def test_conflicted_reviewer_is_skipped(app):
+    records = _records(4)
+    records[0]['authors'] = "Smith J, Doe A"
+    roster = _roster(ann=1, bob=1)
+    roster['ann']['conflicts'] = {"smith"}
+    app.assign_reviewers(records, roster, 1, EFFORTS)
+
+    assert records[0]['assigned_to'] == ["bob"]
+
+
+def test_existing_assignments_are_kept_and_slots_left_unfilled(app):
+    records = _records(6)
+    records[0]['assigned_to'] = ["bob"]
+    result = app.assign_reviewers(records, _roster(ann=1, bob=1), 3, EFFORTS)
+
+    assert "bob" in records[0]['assigned_to']
+    assert result['unfilled'] == 6
+    assert all(sorted(record['assigned_to']) == ["ann", "bob"] for record in records)
+
+
+def test_departed_reviewer_work_moves_to_the_roster(app):
+    records = _records(4)
+    for record in records:
+        record['assigned_to'] = ["dan"]
+    result = app.assign_reviewers(records, _roster(ann=1), 1, EFFORTS)
+
+    assert result['moved'] == 4
+    assert all(record['assigned_to'] == ["ann"] for record in records)
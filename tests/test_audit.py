@@ -0,0 +1,42 @@
+"""Audit log segments and their study/assessor offset indexes"""
+
+import os
+
+
+def _events(count):
+    return [{'study_id': f"s{n % 3}", 'assessor': "Ann" if n % 2 else "Bob", 'action': "update", 'n': n}
+            for n in range(count)]
+
+
+def test_histories_follow_the_offset_index(app, tmp_path):
+    log = app.AuditLog(str(tmp_path), segment_events=2)
+    written = log.append(_events(7))
+
+    assert [event['seq'] for event in written] == list(range(1, 8))
+    assert [event['n'] for event in log.study_history("s1")] == [1, 4]
+    assert [event['n'] for event in log.assessor_history("Ann")] == [5, 3, 1]
+    assert [event['n'] for event in log.assessor_history("Bob", limit=2)] == [6, 4]
+    assert log.assessors() == ["Ann", "Bob"]
+
+
+def test_sealed_segments_write_an_index(app, tmp_path):
+    log = app.AuditLog(str(tmp_path), segment_events=2)
+    log.append(_events(5))
+
+    names = sorted(os.listdir(tmp_path))
+    assert [name for name in names if name.endswith(".ndjson")] == [
+        "segment-000001.ndjson", "segment-000002.ndjson", "segment-000003.ndjson"]
+    assert [name for name in names if name.endswith(".idx")] == [
+        "segment-000001.ndjson.idx", "segment-000002.ndjson.idx"]
+
+
+def test_reopened_log_matches_and_continues(app, tmp_path):
+    log = app.AuditLog(str(tmp_path), segment_events=2)
+    log.append(_events(5))
+
+    reopened = app.AuditLog(str(tmp_path), segment_events=2)
+    assert reopened.seq == 5
+    for study_id in ("s0", "s1", "s2"):
+        assert reopened.study_history(study_id) == log.study_history(study_id)
+    assert reopened.append(_events(1))[0]['seq'] == 6
+    assert [event['seq'] for event in reopened.study_history("s0")] == [1, 4, 6]
@@ -0,0 +1,52 @@
+"""Change-data-capture feed: sequence numbers, batching, rotation and resuming from a cursor"""
+
+
+def test_pull_resumes_after_cursor(app, tmp_path):
+    feed = app.ChangeFeed(str(tmp_path), batch_size=1)
+    feed.append([{'op': 'create', 'study_id': str(n)} for n in range(5)])
+
+    records, cursor = feed.read_since(0)
+    assert [record['seq'] for record in records] == [1, 2, 3, 4, 5]
+    assert cursor == 5
+
+    records, cursor = feed.read_since(3)
+    assert [record['study_id'] for record in records] == ["3", "4"]
+    assert cursor == 5
+    assert feed.read_since(5) == ([], 5)
+
+
+def test_limit_returns_cursor_of_last_record(app, tmp_path):
+    feed = app.ChangeFeed(str(tmp_path), batch_size=1)
+    feed.append([{'op': 'create', 'study_id': str(n)} for n in range(10)])
+
+    records, cursor = feed.read_since(2, limit=3)
+    assert [record['seq'] for record in records] == [3, 4, 5]
+    assert cursor == 5
+
+
+def test_buffered_records_are_not_served_until_flushed(app, tmp_path):
+    feed = app.ChangeFeed(str(tmp_path), batch_size=10)
+    assert feed.append([{'op': 'create', 'study_id': "a"}, {'op': 'delete', 'study_id': "b"}]) == 2
+    assert feed.read_since(0) == ([], 0)
+
+    feed.flush()
+    records, cursor = feed.read_since(0)
+    assert [record['op'] for record in records] == ["create", "delete"]
+    assert cursor == 2
+
+
+def test_rotated_segments_resume_across_restarts(app, tmp_path):
+    feed = app.ChangeFeed(str(tmp_path), batch_size=2, segment_bytes=100)
+    for n in range(9):
+        feed.append([{'op': 'update', 'study_id': str(n)}])
+    feed.flush()
+    assert len(feed.segments) > 1
+
+    reopened = app.ChangeFeed(str(tmp_path), batch_size=1)
+    assert reopened.seq == 9
+    assert reopened.append([{'op': 'create', 'study_id': "new"}]) == 10
+
+    for after in range(10):
+        records, cursor = reopened.read_since(after)
+        assert [record['seq'] for record in records] == list(range(after + 1, 11))
+        assert cursor == 10
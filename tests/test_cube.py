@@ -0,0 +1,45 @@
+"""Pre-aggregated analytics cube: slices and roll-ups agree with the studies they summarise"""
+
+import numpy as np
+
+
+def _frame(app, make_study):
+    studies = []
+    for n in range(30):
+        study_type = list(app.NOS_CRITERIA)[n % 3]
+        studies.append(make_study(study_type, publication_year=2000 + n % 12, country=["UK", "US", ""][n % 3],
+                                  sample_size=[0, 50, 500, 5000][n % 4]))
+    frame = app.build_score_frame(studies)
+    return studies, frame.assign(quality_rating=app.classify_quality(frame, "standard"))
+
+
+def test_cube_keeps_every_study(app, make_study):
+    studies, frame = _frame(app, make_study)
+    cube = app.build_analytics_cube(frame)
+
+    assert cube['studies'].sum() == len(studies)
+    assert cube['total_stars'].sum() == sum(study['total_stars'] for study in studies)
+    assert set(cube['country']) == {"UK", "US", "Not reported"}
+
+
+def test_slice_summary_matches_the_selected_studies(app, make_study):
+    studies, frame = _frame(app, make_study)
+    cube = app.build_analytics_cube(frame)
+    summary = app.summarise_cube_slice(app.slice_cube(cube, {'study_type': ["Cohort Studies"], 'country': []}))
+
+    selected = frame[frame['study_type'] == "Cohort Studies"]
+    assert summary['studies'] == len(selected)
+    assert np.isclose(summary['overall_quality_score'], selected['total_stars'].sum() / selected['max_stars'].sum() * 100)
+    assert summary['quality_counts'] == {quality: int((selected['quality_rating'] == quality).sum())
+                                         for quality in ("Good Quality", "Fair Quality", "Poor Quality")}
+    assert summary['star_distribution'] == selected['total_stars'].value_counts().to_dict()
+    assert app.summarise_cube_slice(app.slice_cube(cube, {'country': ["Nowhere"]})) is None
+
+
+def test_rollup_by_dimension(app, make_study):
+    studies, frame = _frame(app, make_study)
+    table = app.rollup_cube(app.build_analytics_cube(frame), 'sample_size_band')
+
+    counts = frame['sample_size_band'].value_counts()
+    assert table['Studies'].to_dict() == counts.to_dict()
+    assert table['Studies'].is_monotonic_decreasing
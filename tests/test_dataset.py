@@ -0,0 +1,40 @@
+"""Parquet and Arrow IPC dataset export and import"""
+
+import pytest
+
+FORMATS = [("Parquet", "backup.parquet"), ("Arrow IPC", "backup.arrow")]
+
+
+def _portfolio(app, make_study):
+    studies = [make_study(study_type, country="UK", sample_size=120 * n, publication_year=2000 + n,
+                          effect_measure="Odds Ratio", effect_estimate=1.1 + n / 10, standard_error=0.2)
+               for n, study_type in enumerate(list(app.NOS_CRITERIA) * 2)]
+    studies[0].update(effect_estimate=None, standard_error=None, notes="line one\nline two",
+                      outcome_assessments={"Readmission": {'assessment_outcome': "record_linkage"}})
+    return studies
+
+
+@pytest.mark.parametrize("dataset_format, filename", FORMATS)
+def test_round_trip_keeps_every_field(app, make_study, dataset_format, filename):
+    studies = _portfolio(app, make_study)
+    data = app.export_assessment_dataset(studies, dataset_format)
+    restored = app.studies_from_table(app.read_assessment_dataset(data, filename))
+
+    by_id = {study['study_id']: study for study in restored}
+    assert len(by_id) == len(studies)
+    for study in studies:
+        copy = by_id[study['study_id']]
+        for field, value in study.items():
+            assert copy.get(field) == value, field
+
+
+def test_restore_rescores_tampered_totals(app, make_study):
+    studies = _portfolio(app, make_study)
+    expected = studies[1]['total_stars']
+    studies[1]['total_stars'] = expected + 3
+    data = app.export_assessment_dataset(studies, "Parquet")
+    records = app.studies_from_table(app.read_assessment_dataset(data, "backup.parquet"))
+
+    restored, corrected = app.rescore_restored_studies(records)
+    assert corrected == 1
+    assert {study['study_id']: study['total_stars'] for study in restored}[studies[1]['study_id']] == expected
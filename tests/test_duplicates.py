@@ -0,0 +1,35 @@
+"""Duplicate detection by DOI, PMID and blocked fuzzy titles"""
+
+
+def _record(**fields):
+    record = {'study_name': "Statin use and incident dementia in older adults", 'authors': "Smith J, Doe A",
+              'publication_year': 2019, 'doi': "", 'pmid': ""}
+    record.update(fields)
+    return record
+
+
+def test_identifiers_are_normalised(app):
+    index = app.DuplicateIndex()
+    index.add(_record(doi="10.1136/BMJ.L123", pmid="0031234567"))
+
+    assert index.match(_record(study_name="Other", doi="https://doi.org/10.1136/bmj.l123")) == [(0, "Same DOI", 1.0)]
+    assert index.match(_record(study_name="Other", pmid="31234567")) == [(0, "Same PMID", 1.0)]
+
+
+def test_similar_title_needs_the_same_first_author_or_a_near_copy(app):
+    index = app.DuplicateIndex()
+    index.add(_record())
+
+    [(position, reason, score)] = index.match(_record(study_name="Statin use and incident dementia in older adults.",
+                                                      publication_year=2020))
+    assert (position, reason) == (0, "Similar title and first author") and score > 0.9
+    assert index.match(_record(study_name="Statin use and incident dementia among older adult", authors="Brown K")) == []
+    assert index.match(_record(publication_year=2015)) == []
+    assert index.match(_record(study_name="Aspirin and gastrointestinal bleeding")) == []
+
+
+def test_batch_scan_reports_each_pair_once(app):
+    records = [_record(), _record(study_name="Unrelated cohort of asthma outcomes"), _record(doi="10.1/x"),
+               _record(study_name="Another paper", doi="10.1/X")]
+    pairs = app.find_duplicate_pairs(records)
+    assert [(pair['first'], pair['second']) for pair in pairs] == [(0, 2), (2, 3)]
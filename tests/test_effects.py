@@ -0,0 +1,59 @@
+"""Effect sizes grouped by assessed outcome and measure"""
+
+import numpy as np
+import pytest
+
+
+def test_top_level_effect_belongs_to_the_primary_outcome(app):
+    study = {'primary_outcome': "Mortality", 'effect_measure': "Odds Ratio", 'effect_estimate': 1.5,
+             'standard_error': 0.2,
+             'outcome_effects': {"Readmission": {'effect_measure': "Risk Ratio", 'effect_estimate': 0.8,
+                                                 'standard_error': 0.1},
+                                 "Pain": {'effect_measure': "Mean Difference", 'effect_estimate': None,
+                                          'standard_error': 0.3}}}
+    assert list(app.study_effects(study)) == [("Mortality", "Odds Ratio", 1.5, 0.2),
+                                              ("Readmission", "Risk Ratio", 0.8, 0.1)]
+    assert list(app.study_effects({'effect_estimate': 0.3, 'standard_error': 0.1})) == [
+        (app.PRIMARY_OUTCOME, "Other", 0.3, 0.1)]
+    assert list(app.study_effects({'effect_outcome': "Falls", 'effect_estimate': 0.3, 'standard_error': 0.1,
+                                   'effect_measure': "Mean Difference"})) == [("Falls", "Mean Difference", 0.3, 0.1)]
+
+
+def _studies():
+    return [
+        {'primary_outcome': "Mortality", 'effect_measure': "Odds Ratio", 'effect_estimate': 2.0,
+         'standard_error': 0.2,
+         'outcome_effects': {"Readmission": {'effect_measure': "Mean Difference", 'effect_estimate': 0.5,
+                                             'standard_error': 0.1}}},
+        {'primary_outcome': "Mortality", 'effect_measure': "Odds Ratio", 'effect_estimate': -1.0,
+         'standard_error': 0.3},
+        {'primary_outcome': "Readmission", 'effect_measure': "Mean Difference", 'effect_estimate': 0.7,
+         'standard_error': 0.2},
+        {'primary_outcome': "Mortality", 'effect_measure': "Hazard Ratio", 'effect_estimate': 1.2,
+         'standard_error': 0.1},
+    ]
+
+
+def test_analysis_keys(app):
+    assert app.effect_analysis_keys(_studies()) == [("Mortality", "Hazard Ratio"), ("Mortality", "Odds Ratio"),
+                                                    ("Readmission", "Mean Difference")]
+
+
+def test_arrays_of_one_outcome_and_measure(app):
+    arrays = app.extract_effect_arrays(_studies(), outcome="Readmission")
+    assert arrays['measure'] == "Mean Difference"
+    assert arrays['indices'].tolist() == [0, 2]
+    assert arrays['yi'].tolist() == [0.5, 0.7]
+    assert np.allclose(arrays['vi'], [0.01, 0.04])
+
+
+def test_ratios_are_pooled_on_the_log_scale(app):
+    arrays = app.extract_effect_arrays(_studies(), outcome="Mortality", measure="Odds Ratio")
+    assert arrays['indices'].tolist() == [0]
+    assert np.allclose(arrays['yi'], [np.log(2.0)])
+    assert arrays['excluded'] == 1
+
+
+def test_mixed_measures_are_refused(app):
+    with pytest.raises(ValueError, match="Cannot pool different effect measures"):
+        app.extract_effect_arrays(_studies(), outcome="Mortality")
@@ -0,0 +1,25 @@
+"""Constant-memory Excel report export"""
+
+import io
+import re
+import zipfile
+
+
+def _sheets(data):
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    workbook = archive.read("xl/workbook.xml").decode("utf-8")
+    names = re.findall(r'<sheet name="([^"]+)"', workbook)
+    # constant_memory mode writes strings inline, so cell text is in the sheet XML itself
+    sheets = [archive.read(f"xl/worksheets/sheet{n}.xml").decode("utf-8") for n in range(1, len(names) + 1)]
+    return {name: len(re.findall(r"<row ", sheet)) for name, sheet in zip(names, sheets)}, "".join(sheets)
+
+
+def test_workbook_has_every_sheet_and_one_row_per_study(app, make_study):
+    studies = [make_study(study_type) for study_type in app.NOS_CRITERIA for _ in range(4)]
+    sheets, strings = _sheets(app.export_excel_workbook(studies))
+
+    assert list(sheets) == list(app.EXCEL_SHEETS)
+    assert sheets["Publication Table"] == len(studies) + 1
+    assert sheets["Detailed Data"] == len(studies) + 1
+    for study in studies:
+        assert study['study_name'] in strings
@@ -0,0 +1,149 @@
+"""Bibliography parsers and format detection"""
+
+import io
+
+RIS = b"""TY  - JOUR
+TI  - Statins and dementia
+  in older adults
+AU  - Smith, John A.
+AU  - Doe, Anne
+JO  - BMJ
+PY  - 2019///
+DO  - 10.1136/BMJ.L123
+AN  - 31234567
+ER  - 
+TY  - JOUR
+TI  - Second study
+AU  - Brown, K
+PY  - 2020
+ER  - 
+"""
+
+MEDLINE = b"""PMID- 31234567
+TI  - Statins and dementia in a very long title that continues
+      on the next line.
+AU  - Smith JA
+AU  - Doe A
+JT  - BMJ (Clinical research ed.)
+DP  - 2019 Mar 5
+AID - 10.1136/bmj.l123 [doi]
+AID - bmj.l123 [pii]
+
+PMID- 31234568
+TI  - Second study
+AU  - Brown K
+TA  - Lancet
+DP  - 2020
+LID - 10.1016/S0140-6736(20)00001-1 [doi]
+"""
+
+BIBTEX = b"""@comment{ignored}
+@article{smith2019,
+  title = {Statins and {Dementia}},
+  author = {Smith, John A. and Doe, Anne},
+  journal = "BMJ",
+  year = 2019,
+  doi = {10.1136/bmj.l123}
+}
+"""
+
+PUBMED_XML = b"""<?xml version="1.0"?>
+<PubmedArticleSet><PubmedArticle><MedlineCitation><PMID>31234567</PMID><Article>
+<Journal><Title>BMJ</Title><JournalIssue><PubDate><Year>2019</Year></PubDate></JournalIssue></Journal>
+<ArticleTitle>Statins and <i>dementia</i></ArticleTitle>
+<AuthorList><Author><LastName>Smith</LastName><Initials>JA</Initials></Author>
+<Author><CollectiveName>NOS Group</CollectiveName></Author></AuthorList>
+</Article></MedlineCitation>
+<PubmedData><ArticleIdList><ArticleId IdType="doi">10.1136/bmj.l123</ArticleId></ArticleIdList></PubmedData>
+</PubmedArticle></PubmedArticleSet>
+"""
+
+ENDNOTE_XML = b"""<xml><records><record>
+<contributors><authors><author>Smith, John A.</author></authors></contributors>
+<titles><title>Statins and dementia</title><secondary-title>BMJ</secondary-title></titles>
+<dates><year>2019</year></dates><electronic-resource-num>10.1136/bmj.l123</electronic-resource-num>
+</record></records></xml>
+"""
+
+
+class Upload(io.BytesIO):
+    """Stands in for a Streamlit UploadedFile"""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+
+
+def test_ris(app):
+    records = list(app.parse_ris(io.BytesIO(RIS), source="a.ris"))
+    assert len(records) == 2
+    assert records[0]['title'] == "Statins and dementia in older adults"
+    assert records[0]['authors'] == "Smith JA, Doe A"
+    assert records[0]['publication_year'] == 2019
+    assert records[0]['doi'] == "10.1136/bmj.l123"
+    assert records[0]['pmid'] == "31234567"
+    assert records[0]['study_name'] == "Smith et al. 2019"
+    assert records[1]['study_name'] == "Brown 2020"
+
+
+def test_label_leaves_out_a_missing_year(app):
+    undated = b"TY  - JOUR\nTI  - Undated\nAU  - Smith, J\nAU  - Doe, A\nER  - \nTY  - JOUR\nAU  - Brown, K\nER  - \n"
+    records = list(app.parse_ris(io.BytesIO(undated), source="a.ris"))
+    assert [record['study_name'] for record in records] == ["Smith et al.", "Brown"]
+    assert [record['publication_year'] for record in records] == [None, None]
+
+
+def test_medline(app):
+    records = list(app.parse_medline(io.BytesIO(MEDLINE), source="a.nbib"))
+    assert len(records) == 2
+    assert records[0]['title'] == "Statins and dementia in a very long title that continues on the next line."
+    assert records[0]['authors'] == "Smith JA, Doe A"
+    assert records[0]['journal'] == "BMJ (Clinical research ed.)"
+    assert records[0]['publication_year'] == 2019
+    assert records[0]['doi'] == "10.1136/bmj.l123"
+    assert records[0]['pmid'] == "31234567"
+    assert records[1]['journal'] == "Lancet"
+    assert records[1]['doi'] == "10.1016/s0140-6736(20)00001-1"
+
+
+def test_bibtex(app):
+    records = list(app.parse_bibtex(io.BytesIO(BIBTEX)))
+    assert len(records) == 1
+    assert records[0]['title'] == "Statins and Dementia"
+    assert records[0]['authors'] == "Smith JA, Doe A"
+    assert records[0]['journal'] == "BMJ"
+    assert records[0]['publication_year'] == 2019
+
+
+def test_pubmed_xml(app):
+    records = list(app.parse_pubmed_xml(io.BytesIO(PUBMED_XML)))
+    assert len(records) == 1
+    assert records[0]['title'] == "Statins and dementia"
+    assert records[0]['authors'] == "Smith JA, NOS Group"
+    assert records[0]['pmid'] == "31234567"
+    assert records[0]['doi'] == "10.1136/bmj.l123"
+
+
+def test_endnote_xml(app):
+    records = list(app.parse_endnote_xml(io.BytesIO(ENDNOTE_XML)))
+    assert [(record['title'], record['journal'], record['publication_year']) for record in records] == [
+        ("Statins and dementia", "BMJ", 2019)]
+
+
+def test_format_detection(app):
+    assert app.detect_import_format("refs.bib", b"") == "bibtex"
+    assert app.detect_import_format("refs.nbib", b"") == "medline"
+    assert app.detect_import_format("export.txt", MEDLINE[:200]) == "medline"
+    assert app.detect_import_format("export.txt", RIS[:200]) == "ris"
+    assert app.detect_import_format("pubmed.xml", PUBMED_XML[:4096]) == "pubmed_xml"
+    assert app.detect_import_format("library.xml", ENDNOTE_XML[:4096]) == "endnote_xml"
+    assert app.detect_import_format("notes.txt", b"hello") is None
+
+
+def test_import_reports_bad_files_and_keeps_going(app):
+    errors = []
+    uploads = [Upload("a.ris", RIS), Upload("notes.txt", b"hello"), Upload("empty.bib", b"% nothing"),
+               Upload("b.nbib", MEDLINE)]
+    records = list(app.import_bibliographies(uploads, errors))
+    assert [record['source'] for record in records] == ["a.ris", "a.ris", "b.nbib", "b.nbib"]
+    assert errors == ["notes.txt: unrecognised bibliography format", "empty.bib: no records found"]
@@ -0,0 +1,41 @@
+"""Random-effects pooling and the closed-form leave-one-out analysis"""
+
+import numpy as np
+
+
+def _effects(k, seed=3):
+    rng = np.random.default_rng(seed)
+    vi = rng.uniform(0.01, 0.2, k)
+    yi = rng.normal(0.3, 0.4, k)
+    return yi, vi
+
+
+def test_homogeneous_effects_have_no_heterogeneity(app):
+    result = app.pool_effects(np.full(5, 0.4), np.full(5, 0.05))
+    assert result['k'] == 5
+    assert result['tau2'] == 0.0 and result['i2'] == 0.0
+    assert np.isclose(result['fixed'], 0.4) and np.isclose(result['random'], 0.4)
+    assert np.isclose(result['fixed_se'], np.sqrt(0.05 / 5))
+
+
+def test_leave_one_out_matches_recomputing_without_each_study(app):
+    yi, vi = _effects(40)
+    loo = app.leave_one_out(yi, vi, block_size=7)
+
+    for i in range(len(yi)):
+        keep = np.arange(len(yi)) != i
+        expected = app.pool_effects(yi[keep], vi[keep])
+        for field in ('fixed', 'fixed_se', 'random', 'random_se', 'tau2', 'i2'):
+            assert np.isclose(loo[field][i], expected[field], rtol=1e-9, atol=1e-12), (field, i)
+
+
+def test_leave_one_out_does_not_depend_on_block_size(app):
+    yi, vi = _effects(25)
+    small, large = app.leave_one_out(yi, vi, block_size=4), app.leave_one_out(yi, vi)
+    for field in small:
+        assert np.allclose(small[field], large[field])
+
+
+def test_leave_one_out_needs_three_studies(app):
+    yi, vi = _effects(2)
+    assert app.leave_one_out(yi, vi) is None
@@ -0,0 +1,55 @@
+"""Quality schemes: labels derived from the stars, never stored"""
+
+import numpy as np
+
+
+def _columns(app, study_type, totals, **domains):
+    max_stars = app.get_max_stars(study_type)
+    columns = {'study_type': np.array([study_type] * len(totals)), 'total_stars': np.array(totals),
+               'max_stars': np.full(len(totals), max_stars)}
+    columns.update({name: np.array(values) for name, values in domains.items()})
+    return columns
+
+
+def test_standard_scheme_uses_rubric_cut_offs(app):
+    study_type = "Cohort Studies"
+    thresholds = app.compile_rubric(study_type)['thresholds']
+    totals = [thresholds['good'], thresholds['good'] - 1, thresholds['fair'], thresholds['fair'] - 1]
+    labels = app.classify_quality(_columns(app, study_type, totals), "standard")
+
+    assert labels.tolist() == ["Good Quality", "Fair Quality", "Fair Quality", "Poor Quality"]
+    assert labels.tolist() == [app.get_quality_rating(total, study_type)[0] for total in totals]
+
+
+def test_strict_scheme_uses_share_of_maximum(app):
+    # 85% and 65% of 9 stars round up to 8 and 6
+    labels = app.classify_quality(_columns(app, "Cohort Studies", [8, 7, 6, 5]), "strict")
+    assert labels.tolist() == ["Good Quality", "Fair Quality", "Fair Quality", "Poor Quality"]
+
+
+def test_ahrq_scheme_reads_domain_stars(app):
+    columns = _columns(app, "Cohort Studies", [9, 7, 7, 8],
+                       Selection_stars=[4, 2, 3, 4], Selection_max=[4, 4, 4, 4],
+                       Comparability_stars=[2, 2, 1, 0], Comparability_max=[2, 2, 2, 2],
+                       **{'Outcome/Exposure_stars': [3, 3, 3, 3], 'Outcome/Exposure_max': [3, 3, 3, 3]})
+    labels = app.classify_quality(columns, "ahrq")
+    assert labels.tolist() == ["Good Quality", "Fair Quality", "Good Quality", "Poor Quality"]
+
+
+def test_labels_follow_answers_without_touching_studies(app, make_study):
+    studies = [make_study(study_type) for study_type in app.NOS_CRITERIA for _ in range(5)]
+    before = [dict(study) for study in studies]
+
+    for scheme in app.QUALITY_SCHEMES:
+        labels = app.quality_labels(studies, scheme)
+        assert len(labels) == len(studies)
+        assert set(labels) <= set(app.QUALITY_COLORS)
+    assert app.quality_labels(studies, "standard") == [
+        app.get_quality_rating(study['total_stars'], study['study_type'])[0] for study in studies]
+    assert studies == before
+    assert all('quality_rating' not in study for study in studies)
+
+
+def test_single_study_matches_batch(app, make_study):
+    studies = [make_study("Case-Control Studies") for _ in range(4)]
+    assert [app.study_quality(study, "strict") for study in studies] == app.quality_labels(studies, "strict")
@@ -0,0 +1,51 @@
+"""Rubric file validation"""
+
+import copy
+import json
+
+import pytest
+
+RUBRIC = {
+    'name': "Tiny Rubric",
+    'thresholds': {'good': 2, 'fair': 1},
+    'domains': {"Selection": {
+        'representativeness': {'question': "Representative?", 'options': {'yes': "Yes (★)", 'no': "No"},
+                               'stars': {'yes': 1}},
+        'exposure': {'question': "Exposure?", 'options': {'record': "Record (★)", 'self': "Self report"},
+                     'stars': {'record': 1}},
+    }},
+}
+
+
+def _with(change):
+    definition = copy.deepcopy(RUBRIC)
+    change(definition)
+    return definition
+
+
+def test_valid_rubric_is_normalised(app):
+    name, domains, thresholds = app.validate_rubric(RUBRIC, "tiny.json")
+    assert name == "Tiny Rubric"
+    assert domains["Selection"]['exposure']['stars'] == {'record': 1, 'self': 0}
+    assert thresholds == {'good': 2, 'fair': 1}
+
+
+@pytest.mark.parametrize("change, message", [
+    (lambda d: d['domains']["Selection"]['exposure'].update(stars=["record"]), "'stars' as a mapping"),
+    (lambda d: d['domains']["Selection"]['exposure'].update(max_stars="1"), "max_stars must be an integer"),
+    (lambda d: d.update(thresholds=[2, 1]), "'thresholds' must be a mapping"),
+    (lambda d: d.update(thresholds={'good': 5, 'fair': 1}), "0 <= fair <= good <= 2"),
+])
+def test_malformed_rubric_raises_value_error(app, change, message):
+    with pytest.raises(ValueError, match=message):
+        app.validate_rubric(_with(change), "tiny.json")
+
+
+def test_bad_files_are_reported_not_raised(app, tmp_path):
+    (tmp_path / "good.json").write_text(json.dumps(RUBRIC), encoding="utf-8")
+    (tmp_path / "bad.json").write_text(json.dumps(_with(lambda d: d.update(thresholds="7/5"))), encoding="utf-8")
+    signature = app._rubric_signature(str(tmp_path))
+
+    rubrics, errors = app.load_rubric_definitions(str(tmp_path), signature)
+    assert list(rubrics) == ["Tiny Rubric"]
+    assert errors == ["bad.json: 'thresholds' must be a mapping with 'good' and 'fair'"]
@@ -0,0 +1,26 @@
+"""Blocked pairwise distances and average-linkage clustering of domain profiles"""
+
+import numpy as np
+
+
+def test_blocked_distances_match_the_full_matrix(app):
+    rows = np.random.default_rng(5).random((23, 3))
+    expected = np.sqrt(((rows[:, None, :] - rows[None, :, :]) ** 2).sum(axis=2))
+    assert np.allclose(app.pairwise_distances(rows, block_size=4), expected, atol=1e-6)
+    assert np.allclose(app.pairwise_distances(rows[:5], rows, block_size=2), expected[:5], atol=1e-6)
+
+
+def test_hamming_is_the_share_of_differing_answers(app):
+    codes = np.array([[0, 1, 2, 0], [0, 1, 0, 1], [0, 1, 2, 0]])
+    distances = app.pairwise_distances(codes, metric="hamming", block_size=1)
+    assert np.allclose(distances, [[0, 0.5, 0], [0.5, 0, 0.5], [0, 0.5, 0]])
+
+
+def test_clusters_separate_distant_profiles_largest_first(app):
+    low = np.array([[0.1, 0.0, 0.2], [0.15, 0.0, 0.2], [0.1, 0.05, 0.25]])
+    high = np.array([[1.0, 1.0, 0.9], [0.95, 1.0, 1.0]])
+    profiles = np.vstack([high, low, low[:1]])
+
+    labels = app.cluster_profiles(profiles, 2)
+    assert labels.tolist() == [2, 2, 1, 1, 1, 1]
+    assert app.cluster_profiles(profiles, 10).max() == 5
@@ -0,0 +1,49 @@
+"""Assessment timing store and the grouped timing summaries"""
+
+import numpy as np
+
+
+def test_store_appends_fixed_size_records_and_reopens(app, tmp_path):
+    store = app.AssessmentTimingStore(str(tmp_path))
+    store.append(0.0, 600.0, 540.0, "Ann", "Cohort Studies", 2, {'representativeness': 40.0, 'comparability': 95.5})
+    store.append(600.0, 900.0, 300.0, "Bob", "Case-Control Studies", 0)
+
+    timings, labels = store.load()
+    assert timings['active_seconds'].tolist() == [540.0, 300.0]
+    assert timings['tab_switches'].tolist() == [2, 0]
+    assert [labels['reviewer'][code] for code in timings['reviewer']] == ["Ann", "Bob"]
+    assert store.load()[0] is timings
+
+    criteria, labels = app.AssessmentTimingStore(str(tmp_path)).load_criteria()
+    assert [labels['criterion'][code] for code in criteria['criterion']] == ["representativeness", "comparability"]
+    assert criteria['seconds'].tolist() == [40.0, 95.5]
+    assert set(criteria['finished']) == {600.0}
+
+
+def test_grouped_median_matches_numpy(app):
+    rng = np.random.default_rng(2)
+    values, groups = rng.random(101), rng.integers(0, 4, 101)
+    medians = app.grouped_median(values, groups, 5)
+    assert np.allclose(medians[:4], [np.median(values[groups == group]) for group in range(4)])
+    assert np.isnan(medians[4])
+
+
+def test_summaries(app, tmp_path):
+    store = app.AssessmentTimingStore(str(tmp_path))
+    january, february = 1704067200.0, 1706745600.0
+    store.append(january, january + 600, 600.0, "Ann", "Cohort Studies", 1, {'representativeness': 30.0})
+    store.append(january, january + 1200, 1200.0, "Ann", "Cohort Studies", 3, {'representativeness': 90.0})
+    store.append(february, february + 300, 300.0, "Bob", "Cohort Studies", 0, {'comparability': 10.0})
+    store.append(february, february + 10 ** 5, 10 ** 5, "Bob", "Cohort Studies", 0, {'comparability': 10 ** 5})
+
+    timings, labels = store.load()
+    summary = app.summarise_timings(timings, labels)
+    assert summary['months'] == ["2024-01", "2024-02"]
+    assert summary['throughput'].loc["Ann"].tolist() == [2, 0]
+    assert summary['by_type']['Median Minutes'].tolist() == [10.0]
+    assert summary['by_reviewer']['Tab Switches per Assessment'].tolist() == [2.0, 0.0]
+
+    criteria, labels = store.load_criteria()
+    table = app.summarise_criterion_timings(criteria, labels)
+    assert table['Median Seconds'].tolist() == [60.0, 10.0]
+    assert table['Timed Answers'].tolist() == [2, 2]
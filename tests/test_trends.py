@@ -0,0 +1,49 @@
+"""Cumulative quality and meta-analysis trends by publication year"""
+
+import numpy as np
+
+
+def _studies(app, make_study):
+    studies = []
+    for n, year in enumerate([2005, 2001, 2005, 2010, 2001, 2008, 2010, 2003]):
+        study_type = list(app.NOS_CRITERIA)[n % 3]
+        studies.append(make_study(study_type, publication_year=year, effect_measure="Mean Difference",
+                                  effect_estimate=0.1 * n, standard_error=0.1 + 0.02 * n))
+    return studies
+
+
+def test_quality_trend_matches_each_prefix(app, make_study):
+    studies = _studies(app, make_study)
+    trend = app.cumulative_quality_trend(studies)
+
+    assert trend.index.tolist() == [2001, 2003, 2005, 2008, 2010]
+    for year, row in trend.iterrows():
+        included = [study for study in studies if study['publication_year'] <= year]
+        stars = sum(study['total_stars'] for study in included)
+        max_stars = sum(scores['max_stars'] for study in included
+                        for scores in app.calculate_domain_scores(study).values())
+        good = sum(app.get_quality_rating(study['total_stars'], study['study_type'])[0] == "Good Quality"
+                   for study in included)
+        assert row['Studies'] == len(included)
+        assert np.isclose(row['Pooled Quality Score %'], stars / max_stars * 100)
+        assert np.isclose(row['Good %'], good / len(included) * 100)
+        assert np.isclose(row['Good %'] + row['Fair %'] + row['Poor %'], 100)
+
+
+def test_cumulative_meta_analysis_matches_each_prefix(app, make_study):
+    studies = _studies(app, make_study)
+    trend = app.cumulative_meta_analysis(studies)
+
+    for year, row in trend.iterrows():
+        included = [study for study in studies if study['publication_year'] <= year]
+        yi = np.array([study['effect_estimate'] for study in included])
+        vi = np.array([study['standard_error'] for study in included]) ** 2
+        expected = app.pool_effects(yi, vi)
+        assert row['Studies'] == len(included)
+        assert np.isclose(row['Pooled Estimate (FE)'], expected['fixed'])
+        assert np.isclose(row['tau²'], expected['tau2'])
+        assert np.isclose(row['I² (%)'], expected['i2'])
+
+
+def test_empty_portfolio(app):
+    assert app.cumulative_quality_trend([]) is None
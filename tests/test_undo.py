@@ -0,0 +1,79 @@
+"""Undo and redo of portfolio edits"""
+
+import time
+
+
+def _ids(portfolio):
+    return [study['study_id'] for study in portfolio.studies]
+
+
+def test_add_undo_redo(app, portfolio, make_study):
+    first, second = make_study(), make_study()
+    app.add_study(first)
+    app.add_study(second)
+
+    assert app.undo_last_change() == f"Add {second['study_name']}"
+    assert _ids(portfolio) == [first['study_id']]
+    assert app.redo_last_change() == f"Add {second['study_name']}"
+    assert _ids(portfolio) == [first['study_id'], second['study_id']]
+    assert app.redo_last_change() is None
+
+
+def test_undo_edit_restores_the_previous_version(app, portfolio, make_study):
+    study = make_study()
+    app.add_study(study)
+    app.update_study(dict(study, notes="revised"))
+
+    app.undo_last_change()
+    assert portfolio.studies[0] is study
+    app.redo_last_change()
+    assert portfolio.studies[0]['notes'] == "revised"
+
+
+def test_undo_delete_puts_the_study_back_in_place(app, portfolio, make_study):
+    studies = [make_study() for _ in range(3)]
+    for study in studies:
+        app.add_study(study)
+    app.remove_study(studies[1])
+    assert _ids(portfolio) == [studies[0]['study_id'], studies[2]['study_id']]
+
+    app.undo_last_change()
+    assert _ids(portfolio) == [study['study_id'] for study in studies]
+
+
+def test_clear_is_undone_in_one_step(app, portfolio, make_study):
+    studies = [make_study() for _ in range(4)]
+    for study in studies:
+        app.add_study(study)
+    app.clear_studies()
+    assert not portfolio.studies
+
+    app.undo_last_change()
+    assert [id(study) for study in portfolio.studies] == [id(study) for study in studies]
+
+
+def test_grouped_step_and_new_edit_clears_redo(app, portfolio, make_study):
+    with app.undo_step("Import"):
+        for _ in range(3):
+            app.add_study(make_study())
+    assert len(portfolio.undo_history.undo) == 1
+
+    assert app.undo_last_change() == "Import"
+    assert not portfolio.studies
+    app.add_study(make_study())
+    assert app.redo_last_change() is None
+
+
+def test_idle_spill_keeps_the_history(app, portfolio, make_study, tmp_path):
+    manager = app.SessionMemoryManager(app.get_metrics(), spill_dir=str(tmp_path))
+    study = make_study()
+    app.add_study(study)
+    app.clear_studies()
+    manager.activate("idle", portfolio.studies)
+    manager.release("idle")
+
+    assert manager.sweep(now=time.time() + 10 ** 6) == 1
+    assert not portfolio.undo_history.undo
+    manager.activate("idle", portfolio.studies)
+    app.undo_last_change()
+    assert _ids(portfolio) == [study['study_id']]
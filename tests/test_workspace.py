@@ -0,0 +1,71 @@
+"""Workspace projects: journal commits, conflicts, compaction and the assessment queue"""
+
+
+def test_commit_appends_to_the_journal(app, tmp_path, make_study):
+    workspace = app.Workspace(str(tmp_path))
+    first = make_study()
+    workspace.create("Review", [first])
+    second = make_study()
+    edited = dict(first, notes="revised")
+
+    result = workspace.commit("Review", [(None, second), (first, edited)], 0)
+    assert result['saved'] and result['version'] == 2 and result['remote'] == []
+
+    studies, version = app.Workspace(str(tmp_path)).load("Review")
+    assert version == 2
+    assert studies == [edited, second]
+    assert workspace.projects()["Review"]['studies'] == 2
+
+
+def test_stale_writes_merge_or_conflict(app, tmp_path, make_study):
+    workspace = app.Workspace(str(tmp_path))
+    study, other = make_study(), make_study()
+    workspace.create("Review", [study, other])
+    workspace.commit("Review", [(study, dict(study, notes="theirs"))], 0)
+
+    # A different study changed since version 0: saved, and the other session's record comes back
+    result = workspace.commit("Review", [(other, dict(other, notes="mine"))], 0)
+    assert result['saved']
+    assert [record['study_id'] for record in result['remote']] == [study['study_id']]
+
+    # The same study changed since version 0: rejected
+    result = workspace.commit("Review", [(study, dict(study, notes="mine"))], 0)
+    assert not result['saved']
+    assert result['conflicts'] == {study['study_id']}
+    assert workspace.load("Review")[0][0]['notes'] == "theirs"
+
+
+def test_compaction_rewrites_the_snapshot(app, tmp_path, make_study):
+    workspace = app.Workspace(str(tmp_path), compact_records=2)
+    studies = [make_study() for _ in range(2)]
+    workspace.create("Review", studies)
+    version = 0
+    for n in range(3):
+        new = dict(studies[0], notes=f"edit {n}")
+        version = workspace.commit("Review", [(studies[0], new)], version)['version']
+        studies[0] = new
+
+    entry = workspace._index["Review"]
+    assert entry['snapshot_version'] == 3 and entry['journal'] == 0
+    assert workspace.load("Review") == (studies, 3)
+
+    # A session that last saw a compacted version must reload instead of replaying records
+    result = workspace.commit("Review", [(None, make_study())], 1)
+    assert result['saved'] and result['remote'] is None
+
+
+def test_queue_changes_are_versioned_and_shared(app, tmp_path):
+    workspace = app.Workspace(str(tmp_path))
+    workspace.create("Review")
+    assert workspace.load_queue("Review") == ([], [], 0)
+
+    result, queue, roster, version = workspace.update_queue(
+        "Review", lambda queue, roster: queue.extend([{'queue_id': "a"}, {'queue_id': "b"}]) or len(queue))
+    assert (result, version) == (2, 1)
+
+    other = app.Workspace(str(tmp_path))
+    other.update_queue("Review", lambda queue, roster: roster.append({'Reviewer': "Ann", 'Capacity': 1.0}))
+    other.update_queue("Review", lambda queue, roster: queue.pop(0))
+    assert other.load_queue("Review") == ([{'queue_id': "b"}], [{'Reviewer': "Ann", 'Capacity': 1.0}], 3)
+    assert other.queue_version("Review") == 3
+    assert other.queue_version("Missing") == 0